@@ -3,28 +3,47 @@ Flask API pour exposer des services de prédiction de pandémie.
 
 Ce serveur fournit des routes pour :
 - `/predict` : prédictions de cas COVID-19 pour un pays donné
+- `/predict/batch` : plusieurs prédictions avec un seul chargement des données
 - `/countries` : liste des pays disponibles
 - `/models` : liste des modèles ML disponibles
+- `/health` (vivant) et `/ready` (warmup terminé)
+- `/metrics` : métriques Prometheus (latences, jobs Spark, caches, mémoire)
+
+Les prévisions pré-calculées par le batch nocturne (`forecast_store.py`) sont
+servies sans Spark ; seules les combinaisons absentes sont calculées en direct.
 
 La logique de prédiction utilise Apache Spark avec des modèles optimisés
 par pays, notamment pour le Sénégal.
 """
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from spark_model import (
     predict_cases,
     get_available_countries,
     COUNTRY_CONFIGS,
     predict_all_configured_countries,
+    iter_configured_countries,
+    configured_countries_summary,
+    predict_batch,
     get_configured_countries,
     warmup_spark,
 )
+from backtesting import MODEL_TYPES, STRATEGIES, backtest_country, load_results
+from cleaning import CLEANING_PROFILES
+from forecast_store import USE_PRECOMPUTED, get_forecast_store
+from jobs import JobQueueFull, get_job_manager
+from metrics import HTTP_LATENCY, PREDICTION_LATENCY, READY, render_metrics
+from model_registry import get_model_registry
+from response_cache import get_response_cache, make_response_key
+import json
 import logging
+import os
 import threading
+import time
 import traceback
 import uuid
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # ---------------------------------------------------------------------------
 # Lightweight i18n helpers (previously missing caused NameError on first call)
@@ -87,18 +106,8 @@ def get_models_translated(lang: str = 'fr'):
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-# Unified CORS via Flask-CORS (safer & less boilerplate)
-CORS(
-    app,
-    resources={r"/*": {"origins": "*"}},
-    supports_credentials=False,
-    allow_headers=["*"],  # Accept any header (simplifies dev; tighten later if needed)
-    expose_headers=["Content-Type"],
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    max_age=3600,
-)
+# Les routes sont déclarées sur un blueprint et montées par `create_app`
+api = Blueprint('api', __name__)
 
 # Configuration des modèles disponibles
 AVAILABLE_MODELS = {
@@ -120,7 +129,190 @@ AVAILABLE_MODELS = {
 }
 
 
-@app.route('/predict', methods=['GET'])
+CLEANING_LEVELS = list(CLEANING_PROFILES)
+
+# Nombre maximal de prédictions dans une requête /predict/batch
+BATCH_MAX_ITEMS = int(os.environ.get("SEN_BATCH_MAX_ITEMS", "50"))
+
+
+def _validate_predict_params(country: Optional[str], model: str, horizon: int,
+                             cleaning_level: str, lang: str) -> Optional[Dict]:
+    """Retourne le corps de l'erreur 400 si un paramètre est invalide, sinon None."""
+    if not country:
+        return {
+            'error': t('api.errors.country_required', lang=lang),
+            'available_countries_sample': ['Senegal', 'Nigeria', 'South Africa', 'Kenya', 'Morocco', 'France', 'Germany', 'United Kingdom', 'United States', 'Canada']
+        }
+
+    if model not in AVAILABLE_MODELS:
+        return {
+            'error': t('api.errors.model_not_supported', model=model, lang=lang),
+            'available_models': list(AVAILABLE_MODELS.keys())
+        }
+
+    if not (1 <= horizon <= 30):
+        return {
+            'error': t('api.errors.horizon_range', lang=lang)
+        }
+
+    if cleaning_level not in CLEANING_LEVELS:
+        return {
+            'error': t('api.errors.cleaning_level_invalid', lang=lang),
+            'available_levels': CLEANING_LEVELS
+        }
+    return None
+
+
+def run_prediction(country: str, model: str, horizon: int, cleaning_level: str, data_path: str,
+                   lang: str, debug: bool = False, use_cache: bool = True) -> Tuple[Dict, str]:
+    """Exécute `predict_cases` derrière le cache des réponses et les prévisions pré-calculées.
+
+    Returns:
+        (réponse JSON, 'HIT', 'PRECOMPUTED' ou 'MISS')
+    """
+    # Les requêtes debug mesurent les jobs Spark : elles ne passent pas par le cache
+    started = time.perf_counter()
+    cache = get_response_cache()
+    cache_key = None if debug else make_response_key(country, model, horizon, cleaning_level, data_path)
+    result = cache.get(cache_key) if cache_key is not None and use_cache else None
+    cache_status = 'HIT' if result is not None else 'MISS'
+    if result is None and use_cache and not debug and USE_PRECOMPUTED:
+        result = get_forecast_store().get(country, model, horizon, cleaning_level, data_path)
+        if result is not None:
+            cache_status = 'PRECOMPUTED'
+    if result is None:
+        result = predict_cases(
+            country=country,
+            model_type=model,
+            horizon=horizon,
+            data_path=data_path,
+            lang=lang,
+            cleaning_level=cleaning_level,
+            debug=debug
+        )
+        # Les prédictions simulées (fallback) ne sont jamais mises en cache
+        if cache_key is not None and not result.get('fallback_mode'):
+            cache.put(cache_key, result)
+    else:
+        # Les étapes stockées sont celles du calcul d'origine
+        stage = 'cache' if cache_status == 'HIT' else 'precomputed'
+        result['timings'] = {stage: round(time.perf_counter() - started, 4)}
+        result['timings']['total'] = result['timings'][stage]
+    PREDICTION_LATENCY.observe(time.perf_counter() - started, model=model, country=country, cache=cache_status)
+    return _enrich_result(result, country, model, horizon, cleaning_level, lang), cache_status
+
+
+def _enrich_result(result: Dict, country: str, model: str, horizon: int, cleaning_level: str,
+                   lang: str) -> Dict:
+    """Enrichit la réponse avec des informations sur le modèle et les paramètres de la requête."""
+    result['model_info'] = get_models_translated(lang)[model]
+    result['request_params'] = {
+        'country': country,
+        'model': model,
+        'horizon': horizon,
+        'cleaning_level': cleaning_level,
+        'lang': lang
+    }
+    return result
+
+
+def _parse_batch_items(items, lang: str) -> Tuple[List[Tuple[Optional[Dict], Optional[str]]], Optional[Dict]]:
+    """Valide les éléments d'un lot ; retourne ([(spec, erreur) par élément], erreur globale)."""
+    if not isinstance(items, list) or not items:
+        return [], {'error': 'Le corps doit contenir une liste "items" non vide'}
+    if len(items) > BATCH_MAX_ITEMS:
+        return [], {'error': f'Au plus {BATCH_MAX_ITEMS} prédictions par lot (reçu {len(items)})'}
+
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            parsed.append((None, 'Élément invalide : objet JSON attendu'))
+            continue
+        try:
+            horizon = int(item.get('horizon', 14))
+        except (TypeError, ValueError):
+            parsed.append((None, t('api.errors.horizon_range', lang=lang)))
+            continue
+        spec = {
+            'country': item.get('country'),
+            'model': item.get('model', 'linear'),
+            'horizon': horizon,
+            'cleaning_level': item.get('cleaning_level', 'standard'),
+        }
+        error = _validate_predict_params(spec['country'], spec['model'], horizon, spec['cleaning_level'], lang)
+        parsed.append((spec, error['error'] if error is not None else None))
+    return parsed, None
+
+
+def run_batch(parsed: List[Tuple[Optional[Dict], Optional[str]]], data_path: str, lang: str,
+              use_cache: bool = True) -> Dict:
+    """Sert un lot validé : cache des réponses et prévisions pré-calculées d'abord, puis
+    `predict_batch` pour les éléments manquants.
+
+    Chaque élément porte son statut ('ok', 'invalid' ou 'error') : un échec
+    n'interrompt pas le reste du lot.
+    """
+    cache = get_response_cache()
+    items: List[Optional[Dict]] = [None] * len(parsed)
+    pending = []
+    for index, (spec, error) in enumerate(parsed):
+        if error is not None:
+            items[index] = {'index': index, **(spec or {}), 'status': 'invalid', 'error': error}
+            continue
+        cache_key = make_response_key(spec['country'], spec['model'], spec['horizon'], spec['cleaning_level'],
+                                      data_path)
+        started = time.perf_counter()
+        result = cache.get(cache_key) if cache_key is not None and use_cache else None
+        cache_status = 'HIT'
+        if result is None and use_cache and USE_PRECOMPUTED:
+            result = get_forecast_store().get(spec['country'], spec['model'], spec['horizon'],
+                                              spec['cleaning_level'], data_path)
+            if result is not None:
+                cache_status = 'PRECOMPUTED'
+        if result is None:
+            pending.append((index, spec))
+            continue
+        elapsed = round(time.perf_counter() - started, 4)
+        stage = 'cache' if cache_status == 'HIT' else 'precomputed'
+        result['timings'] = {stage: elapsed, 'total': elapsed}
+        items[index] = {'index': index, **spec, 'status': 'ok', 'cache': cache_status,
+                        'result': _enrich_result(result, lang=lang, **spec)}
+
+    if pending:
+        batch = predict_batch([spec for _, spec in pending], data_path=data_path, lang=lang)
+        for (index, spec), item in zip(pending, batch['items']):
+            if item['status'] != 'ok':
+                items[index] = {'index': index, **spec, 'status': 'error', 'error': item['error']}
+                continue
+            result = item['result']
+            # Les prédictions simulées (fallback) ne sont jamais mises en cache ; la clé est recalculée
+            # car l'empreinte par pays n'existe qu'une fois le cache Parquet construit par le lot
+            cache_key = make_response_key(spec['country'], spec['model'], spec['horizon'],
+                                          spec['cleaning_level'], data_path)
+            if cache_key is not None and not result.get('fallback_mode'):
+                cache.put(cache_key, result)
+            PREDICTION_LATENCY.observe(result.get('timings', {}).get('total', 0.0), model=spec['model'],
+                                       country=spec['country'], cache='MISS')
+            items[index] = {'index': index, **spec, 'status': 'ok', 'cache': 'MISS',
+                            'result': _enrich_result(result, lang=lang, **spec)}
+
+    failed = [{'index': item['index'], 'country': item.get('country'), 'status': item['status'],
+               'error': item['error']} for item in items if item['status'] != 'ok']
+    return {
+        'summary': {
+            'requested': len(items),
+            'succeeded': len(items) - len(failed),
+            'failed': len(failed),
+            'cache_hits': sum(1 for item in items if item.get('cache') == 'HIT'),
+            'precomputed': sum(1 for item in items if item.get('cache') == 'PRECOMPUTED'),
+            'computed': len(pending)
+        },
+        'items': items,
+        'failed': failed
+    }
+
+
+@api.route('/predict', methods=['GET'])
 def predict():
     """Endpoint HTTP pour générer des prévisions avec validation complète.
 
@@ -128,9 +320,14 @@ def predict():
       - country : nom du pays (ex. "Senegal", "France")
       - model : type de modèle ("linear", "random_forest", "gradient_boost")
       - horizon : nombre de jours à prédire (1-30, défaut: 14)
-      - cleaning_level : niveau de nettoyage ("minimal", "standard", "strict")
+      - cleaning_level : niveau de nettoyage ("minimal", "standard", "strict", "mad", "hampel")
       - lang : langue ("fr", "en")
       - data_path : chemin vers les données (optionnel)
+      - debug : "true" pour inclure le nombre de jobs/stages Spark (optionnel)
+      - no_cache : "true" pour ignorer le cache des réponses (optionnel)
+
+    Les réponses sont mises en cache par (paramètres, version du dataset) ;
+    l'en-tête `X-Cache` indique HIT, PRECOMPUTED (batch nocturne) ou MISS.
 
     Retour : JSON avec prédictions et métriques du modèle
     """
@@ -142,56 +339,25 @@ def predict():
     horizon = request.args.get('horizon', 14, type=int)
     cleaning_level = request.args.get('cleaning_level', default='standard')
     data_path = request.args.get('data_path', 'owid-covid-data.csv')
+    debug = request.args.get('debug', 'false').lower() in ('1', 'true', 'yes')
+    no_cache = request.args.get('no_cache', 'false').lower() in ('1', 'true', 'yes')
 
     # Validation des paramètres
-    if not country:
-        return jsonify({
-            'error': t('api.errors.country_required', lang=lang),
-            'available_countries_sample': ['Senegal', 'Nigeria', 'South Africa', 'Kenya', 'Morocco', 'France', 'Germany', 'United Kingdom', 'United States', 'Canada']
-        }), 400
-
-    if model not in AVAILABLE_MODELS:
-        return jsonify({
-            'error': t('api.errors.model_not_supported', model=model, lang=lang),
-            'available_models': list(AVAILABLE_MODELS.keys())
-        }), 400
-
-    if not (1 <= horizon <= 30):
-        return jsonify({
-            'error': t('api.errors.horizon_range', lang=lang)
-        }), 400
-
-    if cleaning_level not in ['minimal', 'standard', 'strict']:
-        return jsonify({
-            'error': t('api.errors.cleaning_level_invalid', lang=lang),
-            'available_levels': ['minimal', 'standard', 'strict']
-        }), 400
+    error = _validate_predict_params(country, model, horizon, cleaning_level, lang)
+    if error is not None:
+        return jsonify(error), 400
 
     try:
         request_id = uuid.uuid4().hex[:8]
         logger.info(f"[{request_id}] " + t('api.messages.prediction_start', country=country, model=model, horizon=horizon, lang=lang))
 
-        result = predict_cases(
-            country=country,
-            model_type=model,
-            horizon=horizon,
-            data_path=data_path,
-            lang=lang,
-            cleaning_level=cleaning_level
-        )
-        
-        # Enrichir la réponse avec des informations sur le modèle
-        result['model_info'] = get_models_translated(lang)[model]
-        result['request_params'] = {
-            'country': country,
-            'model': model,
-            'horizon': horizon,
-            'cleaning_level': cleaning_level,
-            'lang': lang
-        }
-        
-        logger.info(f"Prédiction réussie - RMSE: {result['metrics']['rmse']:.2f}")
-        return jsonify(result)
+        result, cache_status = run_prediction(country, model, horizon, cleaning_level, data_path, lang,
+                                              debug=debug, use_cache=not no_cache)
+
+        logger.info(f"Prédiction réussie ({cache_status}) - RMSE: {result['metrics']['rmse']:.2f}")
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        return response
         
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
@@ -206,7 +372,46 @@ def predict():
         }), 500
 
 
-@app.route('/countries', methods=['GET'])
+@api.route('/predict/batch', methods=['POST'])
+def predict_batch_route():
+    """Plusieurs prédictions en une requête, avec un seul chargement des données.
+
+    Corps JSON :
+      - items : liste de {country, model, horizon, cleaning_level} (mêmes valeurs par défaut que /predict)
+      - data_path : chemin vers les données (optionnel, commun au lot)
+      - lang : langue ("fr", "en")
+      - no_cache : true pour ignorer le cache des réponses
+
+    Les éléments en cache ou pré-calculés sont servis directement ; les autres partagent
+    un chargement des features par niveau de nettoyage et sont entraînés en
+    parallèle. Retour : 200 avec un élément par spec (dans l'ordre), chacun
+    avec son statut ('ok', 'invalid' ou 'error'), un résumé et la liste
+    `failed` ; 400 seulement si le lot lui-même est invalide.
+    """
+    body = request.get_json(silent=True) or {}
+    lang = body.get('lang') or get_lang_from_request()
+    parsed, error = _parse_batch_items(body.get('items'), lang)
+    if error is not None:
+        return jsonify(dict(error, max_items=BATCH_MAX_ITEMS)), 400
+
+    try:
+        logger.info(f"Prédiction groupée de {len(parsed)} éléments")
+        result = run_batch(parsed, body.get('data_path', 'owid-covid-data.csv'), lang,
+                           use_cache=not body.get('no_cache', False))
+        logger.info(f"Lot terminé : {result['summary']['succeeded']}/{result['summary']['requested']} réussis "
+                    f"({result['summary']['cache_hits']} depuis le cache)")
+        return jsonify(result)
+    except Exception as exc:
+        err_id = uuid.uuid4().hex[:8]
+        logger.error(f"[ERROR {err_id}] Batch prediction failure: {exc}\n{traceback.format_exc()}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'error_id': err_id,
+            'details': str(exc)
+        }), 500
+
+
+@api.route('/countries', methods=['GET'])
 def countries():
     """Retourne la liste des pays disponibles dans le dataset."""
     try:
@@ -240,15 +445,19 @@ def countries():
         return jsonify({'error': str(exc)}), 500
 
 
-@app.route('/predict_all', methods=['GET'])
+@api.route('/predict_all', methods=['GET'])
 def predict_all():
     """Endpoint pour générer des prédictions pour tous les pays configurés.
 
     Paramètres de requête :
       - model : type de modèle ("linear", "random_forest", "gradient_boost")
       - horizon : nombre de jours à prédire (1-30, défaut: 7)
+      - stream : "ndjson" ou "sse" pour recevoir chaque pays dès que son modèle
+        est prêt (aussi choisi par l'en-tête Accept application/x-ndjson ou
+        text/event-stream)
 
-    Retour : JSON avec prédictions pour tous les pays configurés
+    Retour : JSON avec prédictions pour tous les pays configurés ; en streaming,
+    un enregistrement par pays ("prediction" ou "error") puis un "summary" final
     """
     model = request.args.get('model', default='linear')
     horizon = request.args.get('horizon', 7, type=int)
@@ -265,6 +474,11 @@ def predict_all():
             'error': 'Horizon doit être entre 1 et 30 jours'
         }), 400
     
+    stream_format = _stream_format()
+    if stream_format is not None:
+        logger.info(f"Prédiction en streaming ({stream_format}) pour tous les pays configurés, horizon {horizon} jours")
+        return _stream_response(_predict_all_records(model, horizon, 'owid-covid-data-sample.csv'), stream_format)
+
     try:
         logger.info(f"Prédiction pour tous les pays configurés avec modèle {model}, horizon {horizon} jours")
         
@@ -285,7 +499,62 @@ def predict_all():
         }), 500
 
 
-@app.route('/models', methods=['GET'])
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+
+def _stream_format() -> Optional[str]:
+    """Format de streaming demandé (paramètre `stream`, sinon en-tête Accept), ou None."""
+    requested = request.args.get('stream', '').lower()
+    if requested in STREAM_FORMATS:
+        return requested
+    best = request.accept_mimetypes.best_match(['application/json'] + list(STREAM_FORMATS.values()))
+    for name, mimetype in STREAM_FORMATS.items():
+        if best == mimetype:
+            return name
+    return None
+
+
+def _predict_all_records(model: str, horizon: int, data_path: str) -> Iterator[Dict]:
+    """Un enregistrement par pays dès que son modèle est prêt, puis le résumé."""
+    started = time.perf_counter()
+    succeeded, failed = [], []
+    try:
+        for country, result, error in iter_configured_countries(model_type=model, horizon=horizon,
+                                                                data_path=data_path):
+            elapsed = round(time.perf_counter() - started, 3)
+            if error is None:
+                succeeded.append(country)
+                yield {'type': 'prediction', 'country': country, 'elapsed_seconds': elapsed, 'result': result}
+            else:
+                failed.append({'country': country, 'error': error})
+                yield {'type': 'error', 'country': country, 'elapsed_seconds': elapsed, 'error': error}
+    except Exception as exc:
+        # Échec global (session Spark, données) : signalé dans le flux déjà commencé
+        logger.error(f"Erreur lors de la prédiction groupée en streaming: {exc}\n{traceback.format_exc()}")
+        yield {'type': 'error', 'country': None, 'error': str(exc)}
+    summary = configured_countries_summary(model, horizon)
+    summary.update(succeeded=len(succeeded), failed=len(failed),
+                   elapsed_seconds=round(time.perf_counter() - started, 3))
+    yield {'type': 'summary', 'summary': summary, 'countries': succeeded, 'failed_countries': failed}
+
+
+def _stream_response(records: Iterator[Dict], stream_format: str) -> Response:
+    """Sérialise les enregistrements en NDJSON (une ligne par enregistrement) ou en Server-Sent Events."""
+    def generate():
+        for record in records:
+            payload = json.dumps(record, default=str)
+            if stream_format == 'sse':
+                yield f"event: {record['type']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype=STREAM_FORMATS[stream_format])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/models', methods=['GET'])
 def models():
     """Retourne la liste des modèles ML disponibles avec leurs descriptions."""
     return jsonify({
@@ -308,7 +577,203 @@ def models():
     })
 
 
-@app.route('/health', methods=['GET'])
+def _backtest_params(args, lang: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Lit et valide les paramètres de backtest ; retourne (params, erreur)."""
+    models = args.get('models') or ','.join(MODEL_TYPES)
+    if isinstance(models, str):
+        models = [m for m in models.split(',') if m]
+    try:
+        params = {
+            'country': args.get('country'),
+            'model_types': list(models),
+            'cleaning_level': args.get('cleaning_level', 'standard'),
+            'data_path': args.get('data_path', 'owid-covid-data.csv'),
+            'n_origins': int(args.get('origins', 5)),
+            'horizon': int(args.get('horizon', 14)),
+            'strategy': args.get('strategy', 'expanding'),
+        }
+    except (TypeError, ValueError):
+        return None, {'error': 'Paramètres numériques invalides (origins, horizon)'}
+
+    error = _validate_predict_params(params['country'], 'linear', params['horizon'],
+                                     params['cleaning_level'], lang)
+    if error is not None:
+        return None, error
+    unknown = [m for m in params['model_types'] if m not in AVAILABLE_MODELS]
+    if unknown:
+        return None, {'error': t('api.errors.model_not_supported', model=','.join(unknown), lang=lang),
+                      'available_models': list(AVAILABLE_MODELS.keys())}
+    if params['strategy'] not in STRATEGIES or not (1 <= params['n_origins'] <= 20):
+        return None, {'error': 'strategy doit être "expanding" ou "sliding" et origins entre 1 et 20'}
+    return params, None
+
+
+def _run_backtest(params: Dict, refresh: bool = False) -> Dict:
+    """Retourne le backtest enregistré s'il correspond aux paramètres, sinon le relance."""
+    if not refresh:
+        stored = load_results(params['country'], params['cleaning_level'], params['data_path'])
+        if stored is not None and all(
+                stored['params'].get(name) == params[name]
+                for name in ('model_types', 'n_origins', 'horizon', 'strategy')):
+            return stored
+    return backtest_country(
+        params['country'], tuple(params['model_types']), params['data_path'], params['cleaning_level'],
+        params['n_origins'], params['horizon'], params['strategy']
+    )
+
+
+@api.route('/backtest', methods=['GET'])
+def backtest():
+    """Backtesting rolling-origin d'un pays : compare les modèles sur plusieurs origines.
+
+    Paramètres de requête :
+      - country : nom du pays (requis)
+      - models : modèles séparés par des virgules (défaut: tous)
+      - origins : nombre d'origines (1-20, défaut: 5)
+      - horizon : jours évalués après chaque origine (1-30, défaut: 14)
+      - strategy : "expanding" (défaut) ou "sliding"
+      - cleaning_level, data_path : comme pour /predict
+      - refresh : "true" pour ignorer le dernier résultat enregistré
+
+    Le calcul peut être long : utiliser `POST /jobs` avec `"type": "backtest"`
+    pour l'exécuter en arrière-plan.
+    """
+    lang = get_lang_from_request()
+    params, error = _backtest_params(request.args, lang)
+    if error is not None:
+        return jsonify(error), 400
+    refresh = request.args.get('refresh', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        return jsonify(_run_backtest(params, refresh))
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as exc:
+        logger.error(f"Backtest failure for {params['country']}: {exc}\n{traceback.format_exc()}")
+        return jsonify({'error': 'Erreur interne du serveur', 'details': str(exc)}), 500
+
+
+@api.route('/jobs', methods=['POST'])
+def create_job():
+    """Lance une prédiction en arrière-plan et retourne immédiatement l'identifiant du job.
+
+    Corps JSON :
+      - type : "predict" (défaut), "predict_all", "predict_batch" ou "backtest"
+      - predict : country, model, horizon, cleaning_level, data_path, lang
+      - predict_all : model, horizon
+      - predict_batch : items, data_path (comme POST /predict/batch)
+      - backtest : mêmes paramètres que GET /backtest
+
+    Retour : 202 avec `job_id` et les URLs de suivi (`/jobs/<id>`, `/jobs/<id>/events`).
+    Une requête identique déjà en cours retourne le même job (`deduplicated: true`).
+    """
+    body = request.get_json(silent=True) or {}
+    lang = body.get('lang') or get_lang_from_request()
+    kind = body.get('type', 'predict')
+    model = body.get('model', 'linear')
+
+    try:
+        horizon = int(body.get('horizon', 14 if kind == 'predict' else 7))
+    except (TypeError, ValueError):
+        return jsonify({'error': t('api.errors.horizon_range', lang=lang)}), 400
+
+    if kind == 'predict':
+        params = {
+            'country': body.get('country'),
+            'model': model,
+            'horizon': horizon,
+            'cleaning_level': body.get('cleaning_level', 'standard'),
+            'data_path': body.get('data_path', 'owid-covid-data.csv'),
+            'lang': lang,
+        }
+        error = _validate_predict_params(params['country'], model, horizon, params['cleaning_level'], lang)
+        if error is not None:
+            return jsonify(error), 400
+
+        def work():
+            return run_prediction(params['country'], model, horizon, params['cleaning_level'],
+                                  params['data_path'], lang)[0]
+    elif kind == 'predict_all':
+        params = {'model': model, 'horizon': horizon}
+        if model not in AVAILABLE_MODELS:
+            return jsonify({
+                'error': t('api.errors.model_not_supported', model=model, lang=lang),
+                'available_models': list(AVAILABLE_MODELS.keys())
+            }), 400
+        if not (1 <= horizon <= 30):
+            return jsonify({'error': t('api.errors.horizon_range', lang=lang)}), 400
+
+        def work():
+            return predict_all_configured_countries(model_type=model, horizon=horizon,
+                                                    data_path='owid-covid-data-sample.csv')
+    elif kind == 'predict_batch':
+        parsed, error = _parse_batch_items(body.get('items'), lang)
+        if error is not None:
+            return jsonify(dict(error, max_items=BATCH_MAX_ITEMS)), 400
+        params = {'items': body.get('items'),
+                  'data_path': body.get('data_path', 'owid-covid-data.csv'), 'lang': lang}
+
+        def work():
+            return run_batch(parsed, params['data_path'], lang)
+    elif kind == 'backtest':
+        params, error = _backtest_params(body, lang)
+        if error is not None:
+            return jsonify(error), 400
+        refresh = bool(body.get('refresh', False))
+
+        def work():
+            return _run_backtest(params, refresh)
+    else:
+        return jsonify({
+            'error': f'Type de job non supporté: {kind}',
+            'available_types': ['predict', 'predict_all', 'predict_batch', 'backtest']
+        }), 400
+
+    try:
+        job, deduplicated = get_job_manager().submit(kind, params, work)
+    except JobQueueFull as exc:
+        return jsonify({'error': str(exc)}), 503
+
+    payload = job.to_dict(include_result=False)
+    payload['deduplicated'] = deduplicated
+    payload['status_url'] = f'/jobs/{job.id}'
+    payload['events_url'] = f'/jobs/{job.id}/events'
+    return jsonify(payload), 202
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Statut d'un job, avec le résultat (ou l'erreur) une fois terminé."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job inconnu: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+
+@api.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id: str):
+    """Flux Server-Sent Events des changements d'état d'un job (fermé à la fin du job)."""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job inconnu: {job_id}'}), 404
+    response = Response(stream_with_context(manager.events(job)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Compteurs du cache des réponses, des prévisions pré-calculées et du registre des modèles."""
+    return jsonify({
+        'responses': get_response_cache().stats(),
+        'precomputed': get_forecast_store().stats(),
+        'models': get_model_registry().stats(),
+        'jobs': get_job_manager().stats()
+    })
+
+
+@api.route('/health', methods=['GET'])
 def health():
     """Endpoint de santé pour vérifier le statut du service."""
     lang = get_lang_from_request()
@@ -331,7 +796,30 @@ def health():
     })
 
 
-@app.route('/', methods=['GET'])
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format d'exposition texte Prometheus."""
+    READY.set(1.0 if _WARMUP_DONE.is_set() else 0.0)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api.route('/ready', methods=['GET'])
+def ready():
+    """Disponibilité : 503 tant que le warmup du processus n'est pas terminé.
+
+    `/health` indique seulement que le processus répond ; les équilibreurs de
+    charge doivent router le trafic sur `/ready`.
+    """
+    state = warmup_state()
+    if not state['ready']:
+        response = jsonify(state)
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    return jsonify(state)
+
+
+@api.route('/', methods=['GET'])
 def home():
     """Page d'accueil avec documentation de l'API."""
     lang = get_lang_from_request()
@@ -356,19 +844,127 @@ def home():
         'message': home_msg,
         'endpoints': {
             '/predict': endpoints_trans.get('predict', 'GET - Générer des prédictions pour un pays'),
-            '/predict_all': endpoints_trans.get('predict_all', 'GET - Générer des prédictions pour tous les pays configurés'),
+            '/predict/batch': endpoints_trans.get('predict_batch', 'POST - Plusieurs prédictions avec un seul chargement des données'),
+            '/predict_all': endpoints_trans.get('predict_all', 'GET - Générer des prédictions pour tous les pays configurés (stream=ndjson|sse pour les recevoir au fil de l\'eau)'),
             '/countries': endpoints_trans.get('countries', 'GET - Liste des pays disponibles'),
             '/models': endpoints_trans.get('models', 'GET - Liste des modèles ML disponibles'),
-            '/health': endpoints_trans.get('health', 'GET - Statut du service')
+            '/backtest': endpoints_trans.get('backtest', 'GET - Backtesting rolling-origin des modèles pour un pays'),
+            '/jobs': endpoints_trans.get('jobs', 'POST - Lancer une prédiction asynchrone (suivi via /jobs/<id>)'),
+            '/cache/stats': endpoints_trans.get('cache_stats', 'GET - Statistiques des caches'),
+            '/metrics': endpoints_trans.get('metrics', 'GET - Métriques Prometheus (latences, jobs Spark, caches, mémoire)'),
+            '/health': endpoints_trans.get('health', 'GET - Statut du service'),
+            '/ready': endpoints_trans.get('ready', 'GET - Service prêt (warmup terminé)')
         },
         'example_request': example_req,
         'documentation': doc_url
     })
 
 
+# ---------------------------------------------------------------------------
+# Warmup (une fois par processus) et fabrique de l'application
+# ---------------------------------------------------------------------------
+# 'background' (défaut) : warmup dans un thread, `/ready` passe à 200 à la fin
+# 'sync' : warmup bloquant dans create_app ; 'off' : aucun warmup
+WARMUP_MODE = os.environ.get("SEN_WARMUP", "background").lower()
+WARMUP_DATA_PATH = os.environ.get("SEN_WARMUP_DATA", "owid-covid-data-sample.csv")
+
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_DONE = threading.Event()
+_WARMUP_THREAD: Optional[threading.Thread] = None
+_WARMUP_STATE: Dict = {"status": "pending", "started_at": None, "duration_seconds": None, "error": None}
+
+
+def _warmup():
+    """Démarre Spark, prépare les caches disque et entraîne (ou recharge) un modèle de référence."""
+    started = time.time()
+    _WARMUP_STATE.update(status="running", started_at=started)
+    logger.info("[Warmup] Initialisation de Spark et des caches...")
+    try:
+        warmup_spark(WARMUP_DATA_PATH)
+        result = predict_cases(country='Senegal', model_type='random_forest', horizon=1,
+                               data_path=WARMUP_DATA_PATH)
+        if result.get('fallback_mode'):
+            _WARMUP_STATE.update(status="degraded", error="Spark indisponible : prédictions simulées")
+        else:
+            _WARMUP_STATE.update(status="ok", engine=result.get('engine'))
+    except Exception as e:
+        logger.error(f"[Warmup] Échec : {e}")
+        _WARMUP_STATE.update(status="degraded", error=str(e))
+    finally:
+        _WARMUP_STATE["duration_seconds"] = round(time.time() - started, 2)
+        _WARMUP_DONE.set()
+        logger.info(f"[Warmup] Terminé ({_WARMUP_STATE['status']}) en {_WARMUP_STATE['duration_seconds']}s")
+
+
+def start_warmup() -> threading.Event:
+    """Lance le warmup en arrière-plan s'il n'a pas encore été lancé dans ce processus."""
+    global _WARMUP_THREAD
+    with _WARMUP_LOCK:
+        if _WARMUP_THREAD is None and not _WARMUP_DONE.is_set():
+            _WARMUP_THREAD = threading.Thread(target=_warmup, name="sen-warmup", daemon=True)
+            _WARMUP_THREAD.start()
+    return _WARMUP_DONE
+
+
+def run_warmup(timeout: Optional[float] = None) -> Dict:
+    """Warmup bloquant ; attend le warmup déjà en cours le cas échéant."""
+    start_warmup().wait(timeout)
+    return warmup_state()
+
+
+def warmup_state() -> Dict:
+    return dict(_WARMUP_STATE, ready=_WARMUP_DONE.is_set())
+
+
+def create_app(warmup: Optional[str] = None) -> Flask:
+    """Construit l'application Flask.
+
+    Args:
+        warmup: 'background', 'sync' ou 'off' (défaut : SEN_WARMUP)
+    """
+    application = Flask(__name__)
+
+    # Unified CORS via Flask-CORS (safer & less boilerplate)
+    CORS(
+        application,
+        resources={r"/*": {"origins": "*"}},
+        supports_credentials=False,
+        allow_headers=["*"],  # Accept any header (simplifies dev; tighten later if needed)
+        expose_headers=["Content-Type", "X-Cache"],
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        max_age=3600,
+    )
+    application.register_blueprint(api)
+
+    @application.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @application.after_request
+    def _observe_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint,
+                                 method=request.method, status=str(response.status_code))
+        return response
+
+    mode = (warmup or WARMUP_MODE).lower()
+    if mode == 'sync':
+        run_warmup()
+    elif mode == 'off':
+        _WARMUP_STATE["status"] = "skipped"
+        _WARMUP_DONE.set()
+    else:
+        start_warmup()
+    return application
+
+
+# L'application n'est pas construite à l'import (warmup, threads) : le point
+# d'entrée WSGI est `wsgi:app`, le serveur de développement `python app.py`
 if __name__ == '__main__':
     # Lancer le serveur en mode développement
-    # En production, utiliser un serveur WSGI (gunicorn, uwsgi, etc.)
+    # En production : gunicorn -c gunicorn.conf.py wsgi:app
     logger.info("Démarrage du serveur SEN Prediction...")
     logger.info("=" * 60)
     logger.info("WARMUP EN COURS - Veuillez patienter...")
@@ -376,20 +972,10 @@ if __name__ == '__main__':
     logger.info("=" * 60)
 
     # WARMUP SYNCHRONE - Bloquer jusqu'à ce que Spark soit prêt
-    try:
-        logger.info("[1/3] Initialisation de Spark...")
-        warmup_spark()
-        logger.info("[2/3] Chargement des données de test...")
-        logger.info("[3/3] Test de prédiction avec le Sénégal...")
-        predict_cases(country='Senegal', model_type='random_forest', horizon=1, data_path='owid-covid-data-sample.csv')
-        logger.info("=" * 60)
-        logger.info("✓ WARMUP TERMINÉ - Service prêt à accepter les requêtes")
-        logger.info("=" * 60)
-    except Exception as e:
-        logger.error("=" * 60)
-        logger.error(f"✗ ÉCHEC DU WARMUP: {e}")
+    app = create_app(warmup='sync')
+    if warmup_state()["status"] == "degraded":
         logger.warning("Le service continuera mais les premières requêtes peuvent échouer")
-        logger.error("=" * 60)
 
     logger.info("Démarrage du serveur Flask sur http://0.0.0.0:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000,
+            debug=os.environ.get("SEN_FLASK_DEBUG", "false").lower() in ("1", "true", "yes"))
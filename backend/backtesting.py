@@ -0,0 +1,315 @@
+"""
+Backtesting à origine glissante (rolling-origin).
+
+Pour un pays et plusieurs types de modèles, le modèle est ré-entraîné à N
+origines successives puis évalué sur les `horizon` jours suivant chaque
+origine : erreurs à un pas (RMSE, MAE, MAPE, biais) et erreurs de la
+prévision récursive par tranche d'horizon.
+
+- `expanding` : l'entraînement couvre toutes les lignes jusqu'à l'origine ;
+- `sliding` : seulement les `window` dernières lignes avant l'origine.
+
+Les folds (origine x modèle) tournent en parallèle sur un pool de threads,
+à partir de la matrice de features du feature store (moteur Spark) ou du
+moteur local. Les résultats sont écrits dans
+`.sen_cache/backtests/<pays>-<nettoyage>-<empreinte>.json` et comparés au
+`recommended_model` de `COUNTRY_CONFIGS`.
+
+Usage :
+    python backtesting.py --countries Senegal,France --models linear,random_forest
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cleaning import CLEANING_LEVELS
+from evaluation import evaluate_recursive, regression_metrics
+from forecasting import HISTORY_COLUMNS, MAX_LAG, compile_pipeline, history_from_rows
+from sources import CACHE_DIR, dataset_fingerprint
+from tuning import tuned_params
+
+BACKTESTS_DIR = os.path.join(CACHE_DIR, "backtests")
+BACKTEST_WORKERS = int(os.environ.get("SEN_BACKTEST_WORKERS", "2"))
+
+MODEL_TYPES = ("linear", "random_forest", "gradient_boost")
+STRATEGIES = ("expanding", "sliding")
+SUMMARY_METRICS = ("rmse", "mae", "mape", "bias")
+
+
+def make_origins(total: int, n_origins: int, horizon: int, min_train: int) -> List[int]:
+    """Positions des origines (nombre de lignes d'entraînement), espacées de `horizon`.
+
+    La dernière origine laisse exactement `horizon` lignes de test.
+    """
+    origins = [total - horizon * (n_origins - i) for i in range(n_origins)]
+    origins = [origin for origin in origins if origin >= min_train]
+    if not origins:
+        raise ValueError(f"Pas assez de données pour le backtesting ({total} lignes, "
+                         f"minimum {min_train + horizon})")
+    return origins
+
+
+def _country_features(country: str, data_path: str, cleaning_level: str):
+    """Retourne (frame Spark indexé ou None, frame pandas sur le driver, colonnes de features)."""
+    from spark_model import PREDICTION_ENGINE, _country_window, get_spark
+
+    spark = None if PREDICTION_ENGINE == 'local' else get_spark()
+    if spark is None:
+        from local_model import build_lag_features, clean_country_frame, load_local_dataset
+
+        frames = load_local_dataset(data_path)
+        if country not in frames:
+            raise ValueError(f"Pays '{country}' non trouvé")
+        pdf, feature_cols = build_lag_features(clean_country_frame(frames[country], cleaning_level), country)
+        return None, pdf.reset_index(drop=True), feature_cols
+
+    from pyspark import StorageLevel
+    from pyspark.sql.functions import row_number
+
+    from data_store import get_country_index
+    from feature_store import country_feature_columns, load_features
+
+    if country not in get_country_index(spark, data_path):
+        raise ValueError(f"Pays '{country}' non trouvé")
+    sdf, feature_cols = load_features(spark, data_path, cleaning_level, countries=[country])
+    feature_cols = country_feature_columns(feature_cols, country)
+    sdf = sdf.withColumn("row_number", row_number().over(_country_window()))
+    sdf = sdf.persist(StorageLevel.MEMORY_AND_DISK)
+    columns = ["date"] + [name for name in HISTORY_COLUMNS if name in sdf.columns] + feature_cols
+    pdf = pd.DataFrame.from_records([row.asDict() for row in sdf.select(*columns).collect()],
+                                    columns=columns)
+    return sdf, pdf.sort_values("date").reset_index(drop=True), feature_cols
+
+
+def _fit_fold_spark(sdf, feature_cols: List[str], model_type: str,
+                    start: int, end: int, params: Optional[Dict] = None) -> Callable[[np.ndarray], np.ndarray]:
+    """Ajuste assembleur + scaler + régresseur sur les lignes ]start, end] et le compile en NumPy."""
+    from pyspark.ml import Pipeline
+    from pyspark.ml.feature import StandardScaler, VectorAssembler
+    from pyspark.sql.functions import col
+
+    from spark_model import _build_regressor
+
+    train_df = sdf.filter((col("row_number") > start) & (col("row_number") <= end))
+    pipeline = Pipeline(stages=[
+        VectorAssembler(inputCols=feature_cols, outputCol="features_raw"),
+        StandardScaler(inputCol="features_raw", outputCol="features", withStd=True, withMean=True),
+        _build_regressor(model_type, params),
+    ])
+    return compile_pipeline(pipeline.fit(train_df)).predict
+
+
+def _fit_fold_local(pdf: pd.DataFrame, feature_cols: List[str], model_type: str,
+                    start: int, end: int, params: Optional[Dict] = None) -> Callable[[np.ndarray], np.ndarray]:
+    from local_model import _build_estimator, _scale, _standardize
+
+    X = pdf[feature_cols].to_numpy(dtype=float)[start:end]
+    y = pdf["new_cases"].to_numpy(dtype=float)[start:end]
+    mean, std = _standardize(X)
+    estimator = _build_estimator(model_type, params).fit(_scale(X, mean, std), y)
+    return lambda X_new: estimator.predict(_scale(X_new, mean, std))
+
+
+def _run_fold(sdf, pdf: pd.DataFrame, feature_cols: List[str], model_type: str, fold: int,
+              origin: int, horizon: int, window: Optional[int], params: Optional[Dict] = None) -> Dict:
+    start = max(0, origin - window) if window else 0
+    began = time.time()
+    if sdf is None:
+        predict = _fit_fold_local(pdf, feature_cols, model_type, start, origin, params)
+    else:
+        predict = _fit_fold_spark(sdf, feature_cols, model_type, start, origin, params)
+    fit_seconds = time.time() - began
+
+    test = pdf.iloc[origin:origin + horizon]
+    actual = test["new_cases"].to_numpy(dtype=float)
+    one_step = regression_metrics(actual, predict(test[feature_cols].to_numpy(dtype=float)))
+    recursive = evaluate_recursive(
+        history_from_rows(pdf.iloc[max(0, origin - MAX_LAG):origin].to_dict("records")),
+        actual, feature_cols, predict, max_horizon=horizon
+    )
+    return {
+        "model_type": model_type,
+        "fold": fold,
+        "origin_date": str(pdf["date"].iloc[origin - 1])[:10],
+        "train_start_date": str(pdf["date"].iloc[start])[:10],
+        "train_size": origin - start,
+        "test_size": len(actual),
+        "metrics": one_step,
+        "horizon_metrics": recursive,
+        "fit_seconds": round(fit_seconds, 3),
+    }
+
+
+def _summarize(folds: List[Dict], model_types: List[str]) -> Dict[str, Dict]:
+    summary = {}
+    for model_type in model_types:
+        model_folds = [fold for fold in folds if fold["model_type"] == model_type and "error" not in fold]
+        entry = {"folds": len(model_folds)}
+        for name in SUMMARY_METRICS:
+            values = [fold["metrics"][name] for fold in model_folds if fold["metrics"].get(name) is not None]
+            entry[f"mean_{name}"] = float(np.mean(values)) if values else None
+        summary[model_type] = entry
+    return summary
+
+
+def results_path(country: str, cleaning_level: str, data_path: str) -> str:
+    slug = "".join(c if c.isalnum() else "_" for c in country)
+    return os.path.join(BACKTESTS_DIR, f"{slug}-{cleaning_level}-{dataset_fingerprint(data_path)}.json")
+
+
+def load_results(country: str, cleaning_level: str = 'standard',
+                 data_path: str = "owid-covid-data.csv") -> Optional[Dict]:
+    """Relit le dernier backtest écrit pour ce pays et cette version du dataset.
+
+    None si les hyperparamètres réglés ont changé depuis : le backtest ne
+    décrirait plus les modèles servis par `/predict`.
+    """
+    try:
+        with open(results_path(country, cleaning_level, data_path), "r", encoding="utf-8") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    hyperparameters = results["params"].get("hyperparameters") or {}
+    for model_type in results["params"]["model_types"]:
+        if hyperparameters.get(model_type) != tuned_params(country, model_type, cleaning_level):
+            return None
+    return results
+
+
+def _write_results(path: str, results: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def backtest_country(country: str, model_types: Tuple[str, ...] = MODEL_TYPES,
+                     data_path: str = "owid-covid-data.csv", cleaning_level: str = 'standard',
+                     n_origins: int = 5, horizon: int = 14, strategy: str = 'expanding',
+                     window: Optional[int] = None, max_workers: Optional[int] = None) -> Dict:
+    """Backtest d'un pays pour plusieurs modèles ; écrit et retourne les résultats.
+
+    Args:
+        country: Nom du pays
+        model_types: Modèles à comparer
+        n_origins: Nombre d'origines (folds par modèle)
+        horizon: Jours évalués après chaque origine (1-30)
+        strategy: 'expanding' ou 'sliding'
+        window: Taille de la fenêtre glissante (défaut: lignes avant la première origine)
+        max_workers: Folds exécutés en parallèle (défaut: SEN_BACKTEST_WORKERS)
+
+    Returns:
+        Dict avec les folds, le résumé par modèle, le meilleur modèle et la
+        comparaison avec `recommended_model`
+    """
+    from spark_model import COUNTRY_CONFIGS, get_spark, run_in_scheduler_pool
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Stratégie inconnue: {strategy}. Utiliser {STRATEGIES}")
+    unknown = [m for m in model_types if m not in MODEL_TYPES]
+    if unknown:
+        raise ValueError(f"Modèles non supportés: {unknown}")
+    if not (1 <= horizon <= 30) or n_origins < 1:
+        raise ValueError("horizon doit être entre 1 et 30 et n_origins >= 1")
+
+    started = time.time()
+    # Mêmes hyperparamètres que `predict_cases` (réglés par `tuning.py`, sinon par défaut)
+    hyperparameters = {model_type: tuned_params(country, model_type, cleaning_level) for model_type in model_types}
+    sdf, pdf, feature_cols = _country_features(country, data_path, cleaning_level)
+    spark = get_spark() if sdf is not None else None
+    try:
+        origins = make_origins(len(pdf), n_origins, horizon, min_train=max(2 * MAX_LAG, 60))
+        if strategy == 'sliding' and not window:
+            window = origins[0]
+        elif strategy == 'expanding':
+            window = None
+
+        tasks = [(model_type, fold, origin)
+                 for model_type in model_types for fold, origin in enumerate(origins)]
+        workers = max(1, max_workers or BACKTEST_WORKERS)
+        logging.info(f"[Backtest] {country}: {len(tasks)} folds ({strategy}), {workers} workers")
+
+        def run(task):
+            model_type, fold, origin = task
+            try:
+                return run_in_scheduler_pool(spark, f"backtest_{country}", _run_fold, sdf, pdf,
+                                             feature_cols, model_type, fold, origin, horizon, window,
+                                             hyperparameters[model_type])
+            except Exception as e:
+                logging.error(f"[Backtest] {country}/{model_type} fold {fold} failed: {e}")
+                return {"model_type": model_type, "fold": fold, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            folds = list(executor.map(run, tasks))
+    finally:
+        if sdf is not None:
+            sdf.unpersist()
+
+    summary = _summarize(folds, list(model_types))
+    ranked = sorted((entry["mean_rmse"], model_type) for model_type, entry in summary.items()
+                    if entry["mean_rmse"] is not None)
+    best_model = ranked[0][1] if ranked else None
+    recommended = COUNTRY_CONFIGS.get(country, {}).get('recommended_model')
+
+    results = {
+        "country": country,
+        "cleaning_level": cleaning_level,
+        "dataset_fingerprint": dataset_fingerprint(data_path),
+        "params": {
+            "model_types": list(model_types),
+            "n_origins": n_origins,
+            "horizon": horizon,
+            "strategy": strategy,
+            "window": window,
+            "hyperparameters": hyperparameters,
+        },
+        "folds": folds,
+        "summary": summary,
+        "best_model": best_model,
+        "recommended_model": recommended,
+        "recommendation_confirmed": None if recommended is None or best_model is None else recommended == best_model,
+        "elapsed_seconds": round(time.time() - started, 2),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    _write_results(results_path(country, cleaning_level, data_path), results)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backtesting rolling-origin des modèles par pays")
+    parser.add_argument("--countries", help="Pays séparés par des virgules (défaut: pays configurés)")
+    parser.add_argument("--models", default=",".join(MODEL_TYPES), help="Modèles à comparer")
+    parser.add_argument("--data", default="owid-covid-data.csv", help="Chemin du CSV OWID")
+    parser.add_argument("--cleaning-level", default="standard", choices=CLEANING_LEVELS)
+    parser.add_argument("--origins", type=int, default=5, help="Nombre d'origines")
+    parser.add_argument("--horizon", type=int, default=14, help="Jours évalués par origine")
+    parser.add_argument("--strategy", default="expanding", choices=STRATEGIES)
+    parser.add_argument("--window", type=int, help="Taille de la fenêtre glissante (sliding)")
+    parser.add_argument("--workers", type=int, help="Folds en parallèle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from spark_model import get_configured_countries
+
+    countries = args.countries.split(",") if args.countries else get_configured_countries()
+    print(f"{'Pays':<16} {'Recommandé':<16} {'Meilleur':<16} " +
+          " ".join(f"{m:>16}" for m in args.models.split(",")))
+    for name in countries:
+        res = backtest_country(name, tuple(args.models.split(",")), args.data, args.cleaning_level,
+                               args.origins, args.horizon, args.strategy, args.window, args.workers)
+        rmse = " ".join(f"{(res['summary'][m]['mean_rmse'] or float('nan')):>16.2f}"
+                        for m in args.models.split(","))
+        flag = "" if res["recommendation_confirmed"] in (None, True) else "  <- à revoir"
+        print(f"{name:<16} {str(res['recommended_model']):<16} {str(res['best_model']):<16} {rmse}{flag}")
@@ -0,0 +1,6 @@
+"""
+Benchmarks du pipeline de prédiction (jeux synthétiques, temps, mémoire, jobs Spark).
+
+    cd backend
+    python -m benchmarks.run --scales small
+"""
@@ -0,0 +1,93 @@
+"""
+Jeux de données synthétiques au format OWID.
+
+Les séries sont déterministes (graine fixe) et imitent les données réelles :
+vagues saisonnières, bruit, quelques valeurs négatives et pics aberrants
+(pour exercer le nettoyage), vaccinations et indice de rigueur partiels.
+Les pays configurés sont toujours présents en tête, pour que
+`predict_all_configured_countries` fonctionne à toutes les échelles.
+"""
+
+import os
+import uuid
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"locations": 10, "days": 1000},
+    "medium": {"locations": 200, "days": 1000},
+    "large": {"locations": 10000, "days": 1000},
+    "long": {"locations": 10, "days": 100000},
+}
+
+START_DATE = np.datetime64("2020-01-01")
+# Lignes écrites par bloc : borne la mémoire pour les grandes échelles
+_ROWS_PER_CHUNK = 500_000
+
+
+def location_names(count: int) -> List[str]:
+    from spark_model import COUNTRY_CONFIGS
+
+    names = list(COUNTRY_CONFIGS)[:count]
+    names += [f"Synthetic {i:05d}" for i in range(count - len(names))]
+    return names
+
+
+def _location_frame(name: str, index: int, days: int, rng: np.random.Generator) -> pd.DataFrame:
+    t = np.arange(days)
+    scale = 20.0 + 480.0 * rng.random()
+    period = rng.uniform(30.0, 90.0)
+    trend = 1.0 + 0.5 * np.sin(t / (period * 4.0) + rng.uniform(0, np.pi))
+    new_cases = np.maximum(0.0, scale * trend * (1.0 + np.sin(t / period)) + rng.normal(0, scale * 0.1, days)).round()
+    new_cases[rng.integers(0, days, max(1, days // 200))] = -3.0
+    new_cases[rng.integers(0, days, max(1, days // 300))] *= 30.0
+    new_deaths = np.floor(np.maximum(new_cases, 0.0) / 50.0)
+    vaccination_start = days // 3
+    return pd.DataFrame({
+        "iso_code": f"S{index:05d}",
+        "continent": "Africa" if index % 2 == 0 else "Europe",
+        "location": name,
+        "date": np.datetime_as_string(START_DATE + t.astype("timedelta64[D]"), unit="D"),
+        "total_cases": np.cumsum(np.maximum(new_cases, 0.0)),
+        "new_cases": new_cases,
+        "total_deaths": np.cumsum(new_deaths),
+        "new_deaths": new_deaths,
+        "new_vaccinations": np.where(t > vaccination_start, (t - vaccination_start) * 10.0, np.nan),
+        "stringency_index": np.where(t < days // 2, rng.uniform(30.0, 80.0), np.nan),
+        "population": float(rng.integers(1_000_000, 100_000_000)),
+    })
+
+
+def generate_dataset(path: str, locations: int, days: int, seed: int = 0) -> str:
+    """Écrit un CSV OWID synthétique (écriture atomique) et retourne son chemin."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}"
+    try:
+        chunk: List[pd.DataFrame] = []
+        rows, header = 0, True
+        for index, name in enumerate(location_names(locations)):
+            chunk.append(_location_frame(name, index, days, rng))
+            rows += days
+            if rows >= _ROWS_PER_CHUNK:
+                pd.concat(chunk).to_csv(tmp_path, mode="a", header=header, index=False)
+                chunk, rows, header = [], 0, False
+        if chunk:
+            pd.concat(chunk).to_csv(tmp_path, mode="a", header=header, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def ensure_scale_dataset(scale: str, data_dir: str, seed: int = 0) -> str:
+    """CSV de l'échelle `scale`, généré une seule fois par graine."""
+    spec = SCALES[scale]
+    path = os.path.join(data_dir, f"owid-{scale}-{spec['locations']}x{spec['days']}-s{seed}.csv")
+    if not os.path.exists(path):
+        generate_dataset(path, spec["locations"], spec["days"], seed)
+    return path
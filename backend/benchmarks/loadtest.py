@@ -0,0 +1,248 @@
+"""
+Générateur de charge pour l'API Flask.
+
+Des clients concurrents (boucle fermée : chaque client renvoie une requête dès
+la réponse reçue) tirent les endpoints selon un mélange pondéré ; les
+paramètres de `/predict` sont tirés de `COUNTRY_CONFIGS` (pays et modèle
+recommandé). Pour chaque palier de concurrence, le rapport donne le débit,
+les latences p50/p95/p99 et le taux d'erreurs par endpoint.
+
+    cd backend
+    # serveur déjà lancé (local ou distant)
+    python -m benchmarks.loadtest --url http://localhost:5000 --concurrency 1,4,16 --duration 30
+    # démarrer l'application le temps du test (app ou simple_app, gunicorn si disponible)
+    python -m benchmarks.loadtest --serve app --gunicorn --mix predict=8,health=2
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_MIX = "predict=70,countries=10,health=15,predict_all=5"
+HORIZONS = (7, 14, 30)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"predict", "predict_all", "countries", "health"}
+    if unknown:
+        raise ValueError(f"Endpoints inconnus dans le mélange: {sorted(unknown)}")
+    return mix
+
+
+def _country_configs() -> Dict[str, Dict]:
+    try:
+        from spark_model import COUNTRY_CONFIGS
+        return COUNTRY_CONFIGS
+    except ImportError:
+        return {"Senegal": {"recommended_model": "random_forest"}}
+
+
+def build_request(endpoint: str, rng: random.Random, configs: Dict[str, Dict], data_path: Optional[str]) -> str:
+    """Chemin (avec paramètres) d'une requête de l'endpoint `endpoint`."""
+    if endpoint == "predict":
+        country = rng.choice(list(configs))
+        params = {"country": country, "model": configs[country].get("recommended_model", "linear"),
+                  "horizon": rng.choice(HORIZONS), "cleaning_level": "standard"}
+        if data_path:
+            params["data_path"] = data_path
+        return "/predict?" + urllib.parse.urlencode(params)
+    if endpoint == "predict_all":
+        return "/predict_all?" + urllib.parse.urlencode({"model": "linear", "horizon": rng.choice(HORIZONS)})
+    if endpoint == "countries":
+        return "/countries" + (f"?{urllib.parse.urlencode({'data_path': data_path})}" if data_path else "")
+    return "/health"
+
+
+def _send(base_url: str, path: str, timeout: float) -> Tuple[Optional[int], float, Optional[str]]:
+    """(statut HTTP ou None, latence en secondes, en-tête X-Cache)."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+            response.read()
+            return response.status, time.perf_counter() - started, response.headers.get("X-Cache")
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - started, None
+    except Exception:
+        # Connexion refusée / réinitialisée, timeout...
+        return None, time.perf_counter() - started, None
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentile au rang le plus proche sur une liste triée."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _summarize(samples: List[Tuple[str, Optional[int], float, Optional[str]]], elapsed: float) -> Dict:
+    def stats(rows) -> Dict:
+        latencies = sorted(row[2] for row in rows)
+        statuses = Counter("error" if row[1] is None else str(row[1]) for row in rows)
+        errors = sum(count for status, count in statuses.items() if status == "error" or not status.startswith("2"))
+        cached = [row[3] for row in rows if row[3]]
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed > 0 else None,
+            "error_rate": round(errors / len(rows), 4) if rows else None,
+            "statuses": dict(statuses),
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+            "cache_hit_ratio": round(cached.count("HIT") / len(cached), 4) if cached else None,
+        }
+
+    by_endpoint = {}
+    for endpoint in sorted({row[0] for row in samples}):
+        by_endpoint[endpoint] = stats([row for row in samples if row[0] == endpoint])
+    return {"elapsed_seconds": round(elapsed, 2), "overall": stats(samples), "endpoints": by_endpoint}
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000.0, 1) if seconds is not None else None
+
+
+def run_load(base_url: str, concurrency: int, mix: Dict[str, float], duration: Optional[float] = 30.0,
+             requests: Optional[int] = None, timeout: float = 60.0, seed: int = 0,
+             data_path: Optional[str] = None) -> Dict:
+    """Un palier de charge : `concurrency` clients pendant `duration` secondes (ou `requests` requêtes)."""
+    configs = _country_configs()
+    endpoints, weights = zip(*mix.items())
+    samples: List[Tuple[str, Optional[int], float, Optional[str]]] = []
+    lock = threading.Lock()
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            with lock:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            endpoint = rng.choices(endpoints, weights)[0]
+            status, latency, cache = _send(base_url, build_request(endpoint, rng, configs, data_path), timeout)
+            with lock:
+                samples.append((endpoint, status, latency, cache))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        for future in [pool.submit(client, i) for i in range(concurrency)]:
+            future.result()
+    report = _summarize(samples, time.perf_counter() - started)
+    report["concurrency"] = concurrency
+    return report
+
+
+def _wait_ready(base_url: str, timeout: float, process: Optional[subprocess.Popen] = None) -> bool:
+    """Attend `/ready` (ou `/health` pour simple_app, qui n'a pas de `/ready`)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        status, _, _ = _send(base_url, "/ready", 5.0)
+        if status == 200 or (status in (404, 405) and _send(base_url, "/health", 5.0)[0] == 200):
+            return True
+        time.sleep(1.0)
+    return False
+
+
+def start_server(module: str, port: int, use_gunicorn: bool) -> subprocess.Popen:
+    """Démarre `module`:app sur localhost (gunicorn avec gunicorn.conf.py, sinon serveur Flask threadé)."""
+    env = dict(os.environ, PORT=str(port))
+    if use_gunicorn:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", f"{module}:app",
+                   "--bind", f"127.0.0.1:{port}"]
+    else:
+        command = [sys.executable, "-c",
+                   f"import {module}; {module}.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def _print_report(report: Dict):
+    print(f"\n== concurrence {report['concurrency']} ({report['elapsed_seconds']}s) ==")
+    print(f"{'endpoint':<12} {'req':>6} {'rps':>8} {'err %':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in list(report["endpoints"].items()) + [("TOTAL", report["overall"])]:
+        print(f"{name:<12} {stats['requests']:>6} {stats['throughput_rps'] or 0:>8.2f} "
+              f"{100 * (stats['error_rate'] or 0):>7.2f} {stats['p50_ms'] or 0:>9.1f} {stats['p95_ms'] or 0:>9.1f} "
+              f"{stats['p99_ms'] or 0:>9.1f} {stats['max_ms'] or 0:>9.1f}")
+    errors = {status: count for status, count in report["overall"]["statuses"].items() if not status.startswith("2")}
+    if errors:
+        print(f"erreurs: {errors}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API SEN Prediction")
+    parser.add_argument("--url", default="http://localhost:5000", help="URL de base (ignorée avec --serve)")
+    parser.add_argument("--serve", choices=["app", "simple_app"], help="Démarrer ce module sur localhost")
+    parser.add_argument("--gunicorn", action="store_true", help="Avec --serve : gunicorn -c gunicorn.conf.py")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--concurrency", default="1,4,16", help="Paliers de clients simultanés")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée de chaque palier (s)")
+    parser.add_argument("--requests", type=int, help="Nombre de requêtes par palier (au lieu de --duration)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Poids des endpoints")
+    parser.add_argument("--data-path", help="Paramètre data_path transmis à /predict et /countries")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--warmup-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Écrire le rapport complet dans ce fichier")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    server = None
+    base_url = args.url.rstrip("/")
+    if args.serve:
+        if args.serve == "simple_app" and "predict_all" in mix:
+            mix.pop("predict_all")  # simple_app n'expose pas /predict_all
+        server = start_server(args.serve, args.port, args.gunicorn)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not _wait_ready(base_url, args.warmup_timeout, server):
+            print(f"{base_url} n'est pas prêt après {args.warmup_timeout}s")
+            return 1
+        reports = []
+        for level in (int(value) for value in args.concurrency.split(",")):
+            report = run_load(base_url, level, mix, duration=None if args.requests else args.duration,
+                              requests=args.requests, timeout=args.timeout, seed=args.seed,
+                              data_path=args.data_path)
+            _print_report(report)
+            reports.append(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"url": base_url, "mix": mix, "reports": reports}, f, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Banc d'essai reproductible du pipeline de prédiction.
+
+Pour chaque échelle de données synthétiques, mesure `get_available_countries`,
+`predict_cases` (chaque modèle x niveau de nettoyage, sans réutiliser le
+registre) et `predict_all_configured_countries` (chaque modèle) :
+
+- temps mural du premier appel (caches froids : ingestion Parquet, features)
+  et médiane des appels suivants ;
+- pic de RSS du processus Python et de ses enfants (JVM Spark) ;
+- nombre de jobs Spark.
+
+Chaque exécution est ajoutée à un historique JSON et comparée à une base de
+référence : un cas est signalé en régression si sa médiane (ou son pic de RSS)
+dépasse la référence de plus de `--threshold`.
+
+Fonctionne hors ligne avec Spark en mode local :
+    cd backend
+    python -m benchmarks.run --scales small,medium --models linear,random_forest
+    python -m benchmarks.run --update-baseline          # fixer la référence
+    python -m benchmarks.run --fail-on-regression       # code de sortie 1 si régression
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# `cleaning` ne lit pas SEN_CACHE_DIR : il peut être importé avant que `main` ne le fixe
+from cleaning import CLEANING_LEVELS  # noqa: E402
+
+# Résultats locaux, hors du dépôt (`--cache-dir` est vidé à chaque run, d'où un répertoire à part)
+RESULTS_DIR = ".sen_bench_results"
+DEFAULT_HISTORY = os.path.join(RESULTS_DIR, "history.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+MODEL_TYPES = ("linear", "random_forest", "gradient_boost")
+# Écart absolu en dessous duquel une variation de temps est du bruit
+NOISE_FLOOR_SECONDS = 0.05
+
+
+class PeakRSSSampler:
+    """Échantillonne la RSS du processus et de ses descendants (la JVM est un enfant)."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _rss(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    @staticmethod
+    def _children(pid: int) -> List[int]:
+        children = []
+        try:
+            for tid in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{tid}/children", "r") as f:
+                    children.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            pass
+        return children
+
+    def tree_rss(self) -> int:
+        total, pending = 0, [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            total += self._rss(pid)
+            pending.extend(self._children(pid))
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.tree_rss())
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self.peak = self.tree_rss()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.tree_rss())
+
+
+def _measure(label: str, fn: Callable[[], object], repeat: int) -> Dict:
+    """Exécute `fn` `repeat` fois ; jobs Spark du groupe de la mesure + ceux comptés par predict_cases."""
+    from metrics import SPARK_JOBS
+    from spark_model import PREDICTION_ENGINE, begin_job_group, end_job_group, get_spark, spark_job_stats
+
+    spark = None if PREDICTION_ENGINE == 'local' else get_spark()
+    walls, jobs, error = [], [], None
+    with PeakRSSSampler() as sampler:
+        for _ in range(max(1, repeat)):
+            counted = SPARK_JOBS.total()
+            token = begin_job_group(spark, f"bench:{label}")
+            started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                error = str(e)
+                break
+            finally:
+                walls.append(time.perf_counter() - started)
+                jobs.append(spark_job_stats(spark, token)["jobs"] + int(SPARK_JOBS.total() - counted))
+                end_job_group(spark, token)
+    warm = walls[1:] or walls
+    return {
+        "wall_first": round(walls[0], 4),
+        "wall_median": round(statistics.median(warm), 4),
+        "wall_min": round(min(walls), 4),
+        "runs": len(walls),
+        "peak_rss_mb": round(sampler.peak / 2 ** 20, 1),
+        "spark_jobs_first": jobs[0],
+        "spark_jobs_warm": jobs[-1],
+        "error": error,
+    }
+
+
+def _cases(args, data_path: str) -> List[Dict]:
+    from spark_model import get_available_countries, predict_all_configured_countries, predict_cases
+
+    cases = [{"case": "get_available_countries", "fn": lambda: get_available_countries(data_path)}]
+    for model in args.models:
+        for level in args.cleaning_levels:
+            cases.append({
+                "case": "predict_cases", "model": model, "cleaning_level": level,
+                "fn": lambda model=model, level=level: predict_cases(
+                    args.country, model, args.horizon, data_path=data_path,
+                    cleaning_level=level, reuse_model=False),
+            })
+    if not args.skip_predict_all:
+        for model in args.models:
+            cases.append({
+                "case": "predict_all_configured_countries", "model": model,
+                "fn": lambda model=model: predict_all_configured_countries(model, args.horizon, data_path=data_path),
+            })
+    return cases
+
+
+def case_key(result: Dict) -> str:
+    return "|".join(str(result.get(name) or "-") for name in ("case", "scale", "model", "cleaning_level"))
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[Dict]:
+    """Cas dont la médiane ou le pic de RSS dépasse la référence de plus de `threshold`."""
+    reference = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = reference.get(case_key(result))
+        if base is None or result.get("error") or base.get("error"):
+            continue
+        for metric, floor in (("wall_median", NOISE_FLOOR_SECONDS), ("peak_rss_mb", 0.0)):
+            before, after = base.get(metric), result.get(metric)
+            if before and after and after > before * (1 + threshold) and after - before > floor:
+                regressions.append({"case": case_key(result), "metric": metric, "baseline": before,
+                                    "current": after, "ratio": round(after / before, 3)})
+    return regressions
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path: str, payload):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import pyspark
+        spark_version = pyspark.__version__
+    except ImportError:
+        spark_version = None
+    return {
+        "commit": commit,
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "pyspark": spark_version,
+        "engine": os.environ.get("SEN_PREDICTION_ENGINE", "spark").lower(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from benchmarks.datasets import SCALES
+
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline de prédiction")
+    parser.add_argument("--scales", default="small", help=f"Échelles parmi {','.join(SCALES)}")
+    parser.add_argument("--models", default=",".join(MODEL_TYPES))
+    parser.add_argument("--cleaning-levels", default=",".join(CLEANING_LEVELS))
+    parser.add_argument("--country", default="Senegal")
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=3, help="Appels par cas (le premier est à froid)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-predict-all", action="store_true")
+    parser.add_argument("--data-dir", default=".sen_bench_data", help="CSV synthétiques (réutilisés)")
+    parser.add_argument("--cache-dir", default=".sen_bench_cache", help="Caches du pipeline, vidés à chaque run")
+    parser.add_argument("--keep-cache", action="store_true", help="Ne pas vider les caches (mesures à chaud)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--baseline", default=None,
+                        help="Référence (défaut: baseline.json, sinon dernier run de l'historique)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Dégradation tolérée (0.2 = +20%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Enregistrer ce run comme référence")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    args.models = args.models.split(",")
+    args.cleaning_levels = args.cleaning_levels.split(",")
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Échelles inconnues: {unknown}")
+
+    # Les caches du pipeline sont isolés (et vidés) : le premier appel mesure l'ingestion
+    cache_dir = os.path.abspath(args.cache_dir)
+    if not args.keep_cache:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    os.environ["SEN_CACHE_DIR"] = cache_dir
+    os.environ.setdefault("SEN_RESPONSE_CACHE_DISK", "false")
+
+    from benchmarks.datasets import ensure_scale_dataset
+
+    run = {"run_id": uuid.uuid4().hex[:12], "started_at": datetime.now().isoformat(timespec="seconds"),
+           "environment": _environment(), "config": {k: v for k, v in vars(args).items()}, "results": []}
+    print(f"{'case':<34} {'scale':<7} {'model':<15} {'cleaning':<9} {'first':>8} {'median':>8} "
+          f"{'rss MB':>8} {'jobs':>5}")
+    for scale in scales:
+        started = time.perf_counter()
+        data_path = ensure_scale_dataset(scale, args.data_dir, args.seed)
+        print(f"[{scale}] {data_path} ({time.perf_counter() - started:.1f}s)")
+        for case in _cases(args, data_path):
+            label = f"{case['case']}:{scale}:{case.get('model', '')}:{case.get('cleaning_level', '')}"
+            result = {"case": case["case"], "scale": scale, **SCALES[scale],
+                      "model": case.get("model"), "cleaning_level": case.get("cleaning_level")}
+            result.update(_measure(label, case["fn"], args.repeat))
+            run["results"].append(result)
+            status = f"  ERROR: {result['error']}" if result["error"] else ""
+            print(f"{result['case']:<34} {scale:<7} {result['model'] or '-':<15} {result['cleaning_level'] or '-':<9} "
+                  f"{result['wall_first']:>8.2f} {result['wall_median']:>8.2f} {result['peak_rss_mb']:>8.0f} "
+                  f"{result['spark_jobs_first']:>5}{status}")
+
+    history = _load_json(args.history, [])
+    baseline = _load_json(args.baseline or DEFAULT_BASELINE, None)
+    if baseline is None and not args.baseline and history:
+        baseline = history[-1]
+    run["baseline_run_id"] = baseline.get("run_id") if baseline else None
+    run["regressions"] = compare(run["results"], baseline, args.threshold) if baseline else []
+
+    history.append(run)
+    _write_json(args.history, history)
+    if args.update_baseline:
+        _write_json(args.baseline or DEFAULT_BASELINE, run)
+        print(f"Référence mise à jour: {args.baseline or DEFAULT_BASELINE}")
+
+    for regression in run["regressions"]:
+        print(f"REGRESSION {regression['case']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})")
+    if baseline is None and not args.update_baseline:
+        print("Aucune référence : lancer avec --update-baseline pour en fixer une")
+    return 1 if run["regressions"] and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
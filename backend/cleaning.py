@@ -0,0 +1,199 @@
+"""
+Niveaux de nettoyage des séries par pays (moteurs Spark et local).
+
+Chaque niveau combine trois étapes, appliquées par `location` :
+
+- valeurs négatives supprimées (erreurs de saisie), sauf en `minimal` ;
+- valeurs aberrantes supprimées : au-delà de N fois la médiane exacte
+  (`standard` 10x, `strict` 5x) ou, pour `mad`, au-delà de
+  médiane + 3,5 écarts robustes (1,4826 x MAD) ;
+- pics remplacés sur une fenêtre centrée de 7 jours : par la moyenne mobile
+  au-delà de 5 fois celle-ci (3 fois en `strict`), ou par la médiane mobile
+  pour le filtre de Hampel (`hampel`, écart supérieur à 3 écarts robustes
+  mobiles).
+
+Seuls les pics vers le haut sont écartés : les jours à zéro cas sont des
+déclarations réelles. Sous Spark, toutes les étapes sont des fenêtres
+partitionnées par `location` (médiane exacte avec `percentile`, MAD mobile
+avec `collect_list`) : une seule redistribution par pays, sans job séparé
+pour la médiane. Les statistiques de nettoyage de chaque pays (lignes,
+négatives, aberrantes, valeurs remplacées, médiane, MAD) sont ajoutées dans
+les colonnes `clean_*`, que le feature store garde par version du dataset.
+"""
+
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from pyspark.sql import DataFrame
+
+# Version de la logique de nettoyage : les features matérialisées en dépendent
+CLEANING_VERSION = 2
+
+# Écart-type d'une loi normale estimé par la MAD
+MAD_SCALE = 1.4826
+SPIKE_WINDOW = 7
+
+FILL_COLUMNS = ('new_cases', 'new_deaths', 'new_vaccinations', 'stringency_index', 'total_cases', 'total_deaths')
+
+CLEANING_PROFILES: Dict[str, Dict] = {
+    'minimal': {'drop_negatives': False, 'outliers': None, 'spikes': None},
+    'standard': {'drop_negatives': True, 'outliers': ('median', 10.0), 'spikes': ('rolling_mean', 5.0)},
+    'strict': {'drop_negatives': True, 'outliers': ('median', 5.0), 'spikes': ('rolling_mean', 3.0)},
+    'mad': {'drop_negatives': True, 'outliers': ('mad', 3.5), 'spikes': ('rolling_mean', 5.0)},
+    'hampel': {'drop_negatives': True, 'outliers': None, 'spikes': ('hampel', 3.0)},
+}
+CLEANING_LEVELS = tuple(CLEANING_PROFILES)
+
+# Statistiques par pays, constantes sur les lignes d'un même pays
+STATS_COLUMNS = ["clean_rows", "clean_negatives", "clean_outliers", "clean_replaced", "clean_median", "clean_mad"]
+
+
+def cleaning_profile(cleaning_level: str) -> Dict:
+    if cleaning_level not in CLEANING_PROFILES:
+        raise ValueError(f"Niveau de nettoyage inconnu '{cleaning_level}' (attendu: {', '.join(CLEANING_LEVELS)})")
+    return CLEANING_PROFILES[cleaning_level]
+
+
+def _array_median(array: str) -> str:
+    """Expression SQL de la médiane d'un tableau non vide (moyenne des deux valeurs centrales si pair)."""
+    size = f"size({array})"
+    ordered = f"array_sort({array})"
+    return (f"CASE WHEN {size} % 2 = 1 THEN element_at({ordered}, CAST(({size} + 1) / 2 AS INT)) "
+            f"ELSE (element_at({ordered}, CAST({size} / 2 AS INT)) "
+            f"+ element_at({ordered}, CAST({size} / 2 AS INT) + 1)) / 2 END")
+
+
+def clean_spark(df: "DataFrame", cleaning_level: str) -> "DataFrame":
+    """Nettoie tous les pays de `df` en une passe par `location` et ajoute les colonnes `clean_*`."""
+    # Import local : le moteur pandas (`clean_frame`) ne dépend pas de pyspark
+    from pyspark.sql import Window
+    from pyspark.sql.functions import (
+        abs as spark_abs, coalesce, col, collect_list, count, expr, lit, mean as spark_mean,
+        sum as spark_sum, when
+    )
+
+    profile = cleaning_profile(cleaning_level)
+    by_country = Window.partitionBy("location")
+    rolling = by_country.orderBy("date").rowsBetween(-(SPIKE_WINDOW // 2), SPIKE_WINDOW // 2)
+
+    # NIVEAU MINIMAL : Toujours appliqué (remplacer NULL par 0)
+    df = df.fillna({name: 0 for name in FILL_COLUMNS})
+
+    valid = lit(True)
+    if profile['drop_negatives']:
+        valid = (col('new_cases') >= 0) & (col('new_deaths') >= 0)
+        if 'new_vaccinations' in df.columns:
+            valid = valid & (col('new_vaccinations') >= 0)
+
+    # Médiane exacte des lignes valides, calculée avec les compteurs dans la même fenêtre
+    df = (df
+          .withColumn("_valid", valid)
+          .withColumn("clean_rows", count(lit(1)).over(by_country))
+          .withColumn("clean_negatives", spark_sum(when(col("_valid"), 0).otherwise(1)).over(by_country))
+          .withColumn("clean_median", expr("percentile(CASE WHEN _valid THEN new_cases END, 0.5)").over(by_country)))
+
+    outliers = profile['outliers']
+    if outliers is not None and outliers[0] == 'mad':
+        df = df.withColumn("clean_mad", expr(
+            "percentile(CASE WHEN _valid THEN abs(new_cases - clean_median) END, 0.5)").over(by_country))
+        outlier = (col("clean_mad") > 0) & (
+            col("new_cases") > col("clean_median") + outliers[1] * MAD_SCALE * col("clean_mad"))
+    else:
+        df = df.withColumn("clean_mad", lit(None).cast("double"))
+        outlier = lit(False)
+        if outliers is not None:
+            outlier = (col("clean_median") > 0) & (col("new_cases") > col("clean_median") * outliers[1])
+    df = (df
+          .withColumn("_outlier", col("_valid") & coalesce(outlier, lit(False)))
+          .withColumn("clean_outliers", spark_sum(when(col("_outlier"), 1).otherwise(0)).over(by_country))
+          .filter(col("_valid") & ~col("_outlier")))
+
+    spikes = profile['spikes']
+    if spikes is None:
+        df = df.withColumn("clean_replaced", lit(0).cast("long"))
+        return df.drop("_valid", "_outlier")
+
+    method, threshold = spikes
+    if method == 'hampel':
+        # Filtre de Hampel : écart à la médiane mobile comparé à la MAD mobile (fenêtres plates ignorées)
+        df = (df
+              .withColumn("_window", collect_list("new_cases").over(rolling))
+              .withColumn("_replacement", expr(_array_median("_window")))
+              .withColumn("_spread", expr(_array_median("transform(_window, v -> abs(v - _replacement))"))))
+        spike = (col("_spread") > 0) & (
+            spark_abs(col("new_cases") - col("_replacement")) > threshold * MAD_SCALE * col("_spread"))
+    else:
+        df = df.withColumn("_replacement", spark_mean("new_cases").over(rolling))
+        spike = (col("new_cases") > threshold * col("_replacement")) & (col("_replacement") > 0)
+
+    df = (df
+          .withColumn("_spike", coalesce(spike, lit(False)))
+          .withColumn("clean_replaced", spark_sum(when(col("_spike"), 1).otherwise(0)).over(by_country))
+          .withColumn("new_cases", when(col("_spike"), col("_replacement")).otherwise(col("new_cases"))))
+    return df.drop("_valid", "_outlier", "_window", "_replacement", "_spread", "_spike")
+
+
+def clean_frame(df: pd.DataFrame, cleaning_level: str) -> Tuple[pd.DataFrame, Dict]:
+    """Équivalent pandas de `clean_spark` pour un pays (trié par date).
+
+    Returns:
+        (frame nettoyé, statistiques de nettoyage)
+    """
+    profile = cleaning_profile(cleaning_level)
+    df = df.fillna({name: 0.0 for name in FILL_COLUMNS if name in df.columns})
+    stats = {"rows": len(df), "negatives": 0, "outliers": 0, "replaced": 0, "median": None, "mad": None}
+
+    if profile['drop_negatives']:
+        keep = (df['new_cases'] >= 0) & (df['new_deaths'] >= 0)
+        if 'new_vaccinations' in df.columns:
+            keep &= df['new_vaccinations'] >= 0
+        stats["negatives"] = int((~keep).sum())
+        df = df[keep]
+
+    cases = df['new_cases']
+    median = float(cases.median()) if len(df) else None
+    stats["median"] = median
+    outliers = profile['outliers']
+    if outliers is not None and median is not None:
+        if outliers[0] == 'mad':
+            mad = float((cases - median).abs().median())
+            stats["mad"] = mad
+            limit = median + outliers[1] * MAD_SCALE * mad if mad > 0 else None
+        else:
+            limit = median * outliers[1] if median > 0 else None
+        outlier = cases > limit if limit is not None else pd.Series(False, index=cases.index)
+        stats["outliers"] = int(outlier.sum())
+        df = df[~outlier]
+
+    spikes = profile['spikes']
+    if spikes is not None and len(df):
+        method, threshold = spikes
+        window = df['new_cases'].rolling(SPIKE_WINDOW, center=True, min_periods=1)
+        if method == 'hampel':
+            replacement = window.median()
+            spread = window.apply(lambda values: np.median(np.abs(values - np.median(values))), raw=True)
+            spike = (spread > 0) & ((df['new_cases'] - replacement).abs() > threshold * MAD_SCALE * spread)
+        else:
+            replacement = window.mean()
+            spike = (df['new_cases'] > threshold * replacement) & (replacement > 0)
+        stats["replaced"] = int(spike.sum())
+        df = df.assign(new_cases=df['new_cases'].where(~spike, replacement))
+
+    return df.reset_index(drop=True), stats
+
+
+def stats_from_columns(row: Dict) -> Optional[Dict]:
+    """Statistiques d'un pays à partir des colonnes `clean_*` d'une de ses lignes."""
+    if row is None or row.get("clean_rows") is None:
+        return None
+    return {
+        "rows": int(row["clean_rows"]),
+        "negatives": int(row["clean_negatives"]),
+        "outliers": int(row["clean_outliers"]),
+        "replaced": int(row["clean_replaced"]),
+        "median": None if row["clean_median"] is None else float(row["clean_median"]),
+        "mad": None if row["clean_mad"] is None else float(row["clean_mad"]),
+    }
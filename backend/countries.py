@@ -0,0 +1,109 @@
+"""
+Configuration des pays suivis et validation de leurs séries.
+
+Sans dépendance à Spark : utilisé par les deux moteurs de prédiction
+(`spark_model` le réexporte).
+"""
+
+import logging
+from typing import Optional
+
+# Configuration pour pays spécifiques avec leurs caractéristiques
+COUNTRY_CONFIGS = {
+    # 5 Pays Africains
+    'Senegal': {
+        'continent': 'Africa',
+        'population_density_threshold': 83,  # habitants/km²
+        'gdp_per_capita_range': (1000, 2000),  # USD
+        'vaccination_lag': 30,  # jours de retard typique
+        'seasonal_factor': True,  # prendre en compte la saisonnalité
+        'recommended_model': 'random_forest'
+    },
+    'Nigeria': {
+        'continent': 'Africa',
+        'population_density_threshold': 226,
+        'gdp_per_capita_range': (2000, 3000),
+        'vaccination_lag': 45,
+        'seasonal_factor': True,
+        'recommended_model': 'random_forest'
+    },
+    'South Africa': {
+        'continent': 'Africa',
+        'population_density_threshold': 49,
+        'gdp_per_capita_range': (6000, 7000),
+        'vaccination_lag': 20,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    'Kenya': {
+        'continent': 'Africa',
+        'population_density_threshold': 94,
+        'gdp_per_capita_range': (1800, 2500),
+        'vaccination_lag': 35,
+        'seasonal_factor': True,
+        'recommended_model': 'random_forest'
+    },
+    'Morocco': {
+        'continent': 'Africa',
+        'population_density_threshold': 82,
+        'gdp_per_capita_range': (3000, 4000),
+        'vaccination_lag': 25,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    # 5 Autres Pays (Europe et Amérique du Nord)
+    'France': {
+        'continent': 'Europe',
+        'population_density_threshold': 119,
+        'gdp_per_capita_range': (35000, 45000),
+        'vaccination_lag': 7,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    'Germany': {
+        'continent': 'Europe',
+        'population_density_threshold': 240,
+        'gdp_per_capita_range': (45000, 55000),
+        'vaccination_lag': 5,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    'United Kingdom': {
+        'continent': 'Europe',
+        'population_density_threshold': 281,
+        'gdp_per_capita_range': (40000, 50000),
+        'vaccination_lag': 5,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    'United States': {
+        'continent': 'North America',
+        'population_density_threshold': 36,
+        'gdp_per_capita_range': (55000, 65000),
+        'vaccination_lag': 7,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    },
+    'Canada': {
+        'continent': 'North America',
+        'population_density_threshold': 4,
+        'gdp_per_capita_range': (45000, 55000),
+        'vaccination_lag': 10,
+        'seasonal_factor': True,
+        'recommended_model': 'gradient_boost'
+    }
+}
+
+
+def validate_country_data(df_country, country: str, min_rows: int = 10,
+                          row_count: Optional[int] = None) -> bool:
+    """Valide si le pays a suffisamment de données pour l'entraînement.
+
+    `row_count` peut être fourni (index des pays) pour éviter un count() Spark.
+    """
+    if row_count is None:
+        row_count = df_country.count()
+    if row_count < min_rows:
+        logging.warning(f"Pays {country}: seulement {row_count} lignes disponibles (minimum: {min_rows})")
+        return False
+    return True
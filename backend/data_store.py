@@ -0,0 +1,411 @@
+"""
+Couche d'ingestion du dataset OWID.
+
+Le CSV OWID est converti une seule fois en un dataset Parquet partitionné par
+`location`, avec un schéma explicite (plus d'`inferSchema`, donc plus de double
+lecture du fichier). La taille et la date de modification du CSV source sont
+comparées au manifeste du cache pour décider s'il faut reconstruire.
+
+Toutes les lectures (`predict_cases`, `get_available_countries`, warmup) passent
+par `load_dataset`, qui bénéficie du partition pruning sur `location`.
+
+Un index des pays (nombre de lignes, première et dernière date) est calculé
+une fois par version du dataset et stocké dans le manifeste : la liste des
+pays et la validation d'un pays ne lancent plus de job Spark.
+
+Mise à jour incrémentale : quand le CSV change (publication OWID quotidienne)
+ou qu'un fichier delta est fourni, seules les lignes postérieures à la
+dernière date connue de chaque pays sont ajoutées au dataset Parquet. La
+version du dataset est incrémentée et chaque pays garde la version de sa
+dernière modification : features et modèles ne sont recalculés que pour les
+pays touchés. Les corrections de lignes passées nécessitent `build --full`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.functions import broadcast, col, count, lit, max as spark_max, min as spark_min, to_date
+from pyspark.sql.types import DateType, DoubleType, StringType, StructField, StructType
+
+from sources import CACHE_DIR, OWID_COLUMNS, REQUIRED_COLUMNS, dataset_fingerprint, resolve_data_path, source_stat
+
+# Schéma Spark explicite des colonnes OWID utilisées (voir `sources.OWID_COLUMNS`)
+_SPARK_TYPES = {"string": StringType(), "date": DateType(), "double": DoubleType()}
+OWID_SCHEMA = StructType([StructField(name, _SPARK_TYPES[kind]) for name, kind in OWID_COLUMNS])
+
+# Caractères échappés par Spark dans les noms de répertoires de partition
+_PARTITION_ESCAPE_CHARS = set('"#%\'*/:=?\\\x7f{[]^') | {chr(code) for code in range(0x01, 0x20)}
+
+_INGEST_LOCK = threading.Lock()
+_MANIFESTS: Dict[str, Dict] = {}
+# source -> mtime du manifest.json lu : un refresh fait par un autre processus est détecté
+_MANIFEST_MTIMES: Dict[str, int] = {}
+
+
+def _dataset_dir(source: str) -> str:
+    name = os.path.splitext(os.path.basename(source))[0]
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(CACHE_DIR, "datasets", f"{name}-{digest}")
+
+
+def _read_manifest(dataset_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(dataset_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(dataset_dir: str, manifest: Dict):
+    tmp_path = os.path.join(dataset_dir, f"manifest.json.{uuid.uuid4().hex[:8]}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(dataset_dir, "manifest.json"))
+
+
+def _manifest_mtime(dataset_dir: str) -> Optional[int]:
+    try:
+        return os.stat(os.path.join(dataset_dir, "manifest.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _remember_manifest(source: str, manifest: Dict):
+    _MANIFESTS[source] = manifest
+    _MANIFEST_MTIMES[source] = _manifest_mtime(_dataset_dir(source))
+
+
+def _memo_manifest(source: str, stat: Dict) -> Optional[Dict]:
+    """Manifeste en mémoire s'il correspond toujours au CSV et au manifest.json sur disque."""
+    manifest = _MANIFESTS.get(source)
+    if _is_fresh(manifest, stat) and _MANIFEST_MTIMES.get(source) == _manifest_mtime(_dataset_dir(source)):
+        return manifest
+    return None
+
+
+def _is_fresh(manifest: Optional[Dict], stat: Dict) -> bool:
+    return (
+        manifest is not None
+        and manifest.get("size") == stat["size"]
+        and manifest.get("mtime_ns") == stat["mtime_ns"]
+        and os.path.isdir(manifest.get("parquet_path", ""))
+    )
+
+
+def read_owid_csv(spark: SparkSession, csv_path: str) -> DataFrame:
+    """Lit un CSV OWID et le projette sur `OWID_SCHEMA` en une seule passe.
+
+    Le CSV est lu sans `inferSchema` (toutes les colonnes en chaîne) puis les
+    colonnes utiles sont converties explicitement. Les colonnes absentes du
+    fichier ne sont pas ajoutées, afin que le pipeline puisse continuer à
+    tester leur présence via `df.columns`.
+    """
+    raw = spark.read.csv(csv_path, header=True)
+    missing = [name for name in REQUIRED_COLUMNS if name not in raw.columns]
+    if missing:
+        raise ValueError(f"Colonnes obligatoires absentes de {csv_path}: {missing}")
+
+    projected = []
+    for field in OWID_SCHEMA.fields:
+        if field.name not in raw.columns:
+            continue
+        if isinstance(field.dataType, DateType):
+            projected.append(to_date(col(field.name), "yyyy-MM-dd").alias(field.name))
+        else:
+            projected.append(col(field.name).cast(field.dataType).alias(field.name))
+    return raw.select(*projected).filter(col("location").isNotNull() & col("date").isNotNull())
+
+
+def _build_country_index(spark: SparkSession, parquet_path: str) -> Dict[str, Dict]:
+    """Calcule {pays: {rows, min_date, max_date}} en une seule agrégation."""
+    return _aggregate_country_index(spark.read.parquet(parquet_path))
+
+
+def _aggregate_country_index(df: DataFrame) -> Dict[str, Dict]:
+    rows = (df.groupBy("location")
+            .agg(count(lit(1)).alias("rows"),
+                 spark_min("date").alias("min_date"),
+                 spark_max("date").alias("max_date"))
+            .collect())
+    return {
+        row["location"]: {
+            "rows": row["rows"],
+            "min_date": str(row["min_date"]),
+            "max_date": str(row["max_date"]),
+        }
+        for row in rows
+    }
+
+
+def _build_parquet(spark: SparkSession, source: str, dataset_dir: str, stat: Dict) -> Dict:
+    fingerprint = dataset_fingerprint(source)
+    target = os.path.join(dataset_dir, f"parquet-{fingerprint}")
+    staging = os.path.join(dataset_dir, f"staging-{uuid.uuid4().hex[:8]}")
+
+    logging.info(f"[Data] Building Parquet cache for {source} -> {target}")
+    df = read_owid_csv(spark, source)
+    (df.repartition("location")
+       .write.mode("overwrite")
+       .partitionBy("location")
+       .parquet(staging))
+
+    if os.path.isdir(target):
+        # Un autre worker a déjà construit la même version
+        shutil.rmtree(staging, ignore_errors=True)
+    else:
+        os.replace(staging, target)
+
+    # Le schéma stocké inclut la colonne de partition `location`
+    stored_schema = StructType(
+        [f for f in df.schema.fields if f.name != "location"]
+        + [StructField("location", StringType())]
+    )
+    manifest = {
+        "source": source,
+        "size": stat["size"],
+        "mtime_ns": stat["mtime_ns"],
+        "fingerprint": fingerprint,
+        "version": 1,
+        "parquet_path": target,
+        "schema": stored_schema.json(),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "countries": _build_country_index(spark, target),
+    }
+    _write_manifest(dataset_dir, manifest)
+
+    # Supprimer les anciennes versions (on garde la précédente pour les lectures en cours)
+    previous = _MANIFESTS.get(source, {}).get("parquet_path")
+    for entry in os.listdir(dataset_dir):
+        path = os.path.join(dataset_dir, entry)
+        if entry.startswith("parquet-") and path not in (target, previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+    logging.info(f"[Data] Parquet cache ready (fingerprint={fingerprint})")
+    return manifest
+
+
+def _append_delta(spark: SparkSession, manifest: Dict, df_new: DataFrame) -> Dict:
+    """Ajoute au Parquet les lignes de `df_new` postérieures à la dernière date de chaque pays.
+
+    Retourne le nouveau manifeste (inchangé hormis `refreshed_at` si aucune ligne n'est nouvelle).
+    """
+    stored_schema = StructType.fromJson(json.loads(manifest["schema"]))
+    if sorted(df_new.columns) != sorted(stored_schema.fieldNames()):
+        raise ValueError("Colonnes différentes du dataset existant : reconstruction complète nécessaire")
+
+    countries = manifest["countries"]
+    last_dates = spark.createDataFrame(
+        [(name, info["max_date"]) for name, info in countries.items()] or [("", "1900-01-01")],
+        "location string, last_date string",
+    ).withColumn("last_date", to_date(col("last_date")))
+    delta = (df_new.join(broadcast(last_dates), "location", "left")
+             .filter(col("last_date").isNull() | (col("date") > col("last_date")))
+             .select(*[f.name for f in stored_schema.fields])
+             .persist())
+    try:
+        delta_index = _aggregate_country_index(delta)
+        manifest = dict(manifest, countries=dict(countries),
+                        refreshed_at=datetime.now().isoformat(timespec="seconds"))
+        if not delta_index:
+            logging.info("[Data] Refresh: no new rows")
+            return manifest
+
+        (delta.repartition("location")
+              .write.mode("append")
+              .partitionBy("location")
+              .parquet(manifest["parquet_path"]))
+    finally:
+        delta.unpersist()
+
+    version = manifest.get("version", 1) + 1
+    for name, info in delta_index.items():
+        previous = countries.get(name)
+        if previous is not None:
+            info = {
+                "rows": previous["rows"] + info["rows"],
+                "min_date": min(previous["min_date"], info["min_date"]),
+                "max_date": max(previous["max_date"], info["max_date"]),
+            }
+        manifest["countries"][name] = dict(info, version=version)
+    manifest["version"] = version
+    manifest["last_refresh"] = {
+        "new_rows": sum(info["rows"] for info in delta_index.values()),
+        "updated_countries": sorted(delta_index),
+    }
+    logging.info(f"[Data] Refresh v{version}: {manifest['last_refresh']['new_rows']} new rows "
+                 f"for {len(delta_index)} countries")
+    return manifest
+
+
+def _incremental_or_full(spark: SparkSession, source: str, dataset_dir: str, manifest: Optional[Dict],
+                         stat: Dict, delta_path: Optional[str] = None) -> Dict:
+    """Ajoute les nouvelles lignes au cache existant, ou le reconstruit entièrement."""
+    if manifest is not None and os.path.isdir(manifest.get("parquet_path", "")):
+        try:
+            if "countries" not in manifest:
+                manifest["countries"] = _build_country_index(spark, manifest["parquet_path"])
+            manifest = _append_delta(spark, manifest, read_owid_csv(spark, delta_path or source))
+            manifest.update(stat)
+            _write_manifest(dataset_dir, manifest)
+            return manifest
+        except ValueError as e:
+            logging.warning(f"[Data] Incremental refresh impossible ({e}), full rebuild")
+    return _build_parquet(spark, source, dataset_dir, stat)
+
+
+def refresh_dataset(spark: SparkSession, data_path: str, delta_path: Optional[str] = None) -> Dict:
+    """Mise à jour incrémentale du cache Parquet.
+
+    Args:
+        data_path: CSV de référence du dataset (éventuellement remplacé par une version plus récente)
+        delta_path: CSV ne contenant que les nouvelles lignes (optionnel) ; sinon `data_path` est relu
+
+    Returns:
+        Le manifeste mis à jour (`version`, `last_refresh`)
+    """
+    source = os.path.abspath(resolve_data_path(data_path))
+    with _INGEST_LOCK:
+        dataset_dir = _dataset_dir(source)
+        manifest = _read_manifest(dataset_dir)
+        os.makedirs(dataset_dir, exist_ok=True)
+        manifest = _incremental_or_full(spark, source, dataset_dir, manifest, source_stat(source), delta_path)
+        _remember_manifest(source, manifest)
+    return manifest
+
+
+def ensure_dataset(spark: SparkSession, data_path: str) -> Dict:
+    """Garantit que le cache Parquet est à jour et retourne son manifeste.
+
+    Si le CSV a changé depuis la dernière ingestion, seules les nouvelles
+    dates sont ajoutées (voir `refresh_dataset`) ; la reconstruction complète
+    n'a lieu qu'en l'absence de cache ou si les colonnes ont changé.
+    """
+    source = os.path.abspath(resolve_data_path(data_path))
+    stat = source_stat(source)
+
+    manifest = _memo_manifest(source, stat)
+    if manifest is not None:
+        return manifest
+
+    with _INGEST_LOCK:
+        dataset_dir = _dataset_dir(source)
+        manifest = _read_manifest(dataset_dir)
+        if not _is_fresh(manifest, stat):
+            os.makedirs(dataset_dir, exist_ok=True)
+            manifest = _incremental_or_full(spark, source, dataset_dir, manifest, stat)
+        elif "countries" not in manifest:
+            # Cache construit avant l'introduction de l'index des pays
+            manifest["countries"] = _build_country_index(spark, manifest["parquet_path"])
+            _write_manifest(dataset_dir, manifest)
+        _remember_manifest(source, manifest)
+    return manifest
+
+
+def country_fingerprint(manifest: Dict, country: str) -> str:
+    """Version des données d'un pays : ne change que si de nouvelles lignes du pays sont ajoutées."""
+    info = manifest.get("countries", {}).get(country, {})
+    return f"{manifest['fingerprint']}-v{info.get('version', 1)}"
+
+
+def peek_country_fingerprint(data_path: str, country: str) -> Optional[str]:
+    """Version des données d'un pays d'après le manifeste à jour, sans Spark (None si inconnue)."""
+    try:
+        source = os.path.abspath(resolve_data_path(data_path))
+        stat = source_stat(source)
+    except OSError:
+        return None
+    manifest = _memo_manifest(source, stat)
+    if manifest is None:
+        manifest = _read_manifest(_dataset_dir(source))
+        if not _is_fresh(manifest, stat):
+            return None
+    return country_fingerprint(manifest, country)
+
+
+def partition_path(root: str, country: str) -> str:
+    """Chemin du répertoire `location=<pays>` tel qu'écrit par Spark."""
+    escaped = "".join(f"%{ord(c):02X}" if c in _PARTITION_ESCAPE_CHARS else c for c in country)
+    return os.path.join(root, f"location={escaped}")
+
+
+def read_partitions(spark: SparkSession, root: str, countries: Optional[List[str]] = None,
+                    schema: Optional[StructType] = None) -> DataFrame:
+    """Lit un dataset Parquet partitionné par `location`.
+
+    Avec `countries`, seuls les répertoires des pays demandés sont listés et
+    lus, au lieu de découvrir toutes les partitions puis de filtrer.
+    """
+    reader = spark.read if schema is None else spark.read.schema(schema)
+    if countries is None:
+        return reader.parquet(root)
+    paths = [path for path in (partition_path(root, c) for c in countries) if os.path.isdir(path)]
+    if not paths:
+        return reader.parquet(root).filter(col("location").isin(list(countries)))
+    return reader.option("basePath", root).parquet(*paths)
+
+
+def get_country_index(spark: SparkSession, data_path: str) -> Dict[str, Dict]:
+    """Retourne l'index des pays de la version courante du dataset.
+
+    Returns:
+        Dict {pays: {'rows': int, 'min_date': 'YYYY-MM-DD', 'max_date': 'YYYY-MM-DD'}}
+    """
+    return ensure_dataset(spark, data_path)["countries"]
+
+
+def load_dataset(spark: SparkSession, data_path: str,
+                 countries: Optional[List[str]] = None) -> DataFrame:
+    """Charge le dataset depuis le cache Parquet, filtré sur les pays demandés.
+
+    Le filtre sur `location` porte sur la colonne de partition : seuls les
+    répertoires des pays concernés sont lus.
+    """
+    manifest = ensure_dataset(spark, data_path)
+    schema = StructType.fromJson(json.loads(manifest["schema"]))
+    return read_partitions(spark, manifest["parquet_path"], countries, schema)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gestion du cache Parquet du dataset OWID")
+    parser.add_argument("command", choices=["build", "refresh"],
+                        help="build : (re)construit le cache si nécessaire ; "
+                             "refresh : ajoute uniquement les nouvelles dates")
+    parser.add_argument("--data", default="owid-covid-data.csv", help="Chemin du CSV OWID")
+    parser.add_argument("--delta", help="refresh : CSV ne contenant que les nouvelles lignes")
+    parser.add_argument("--full", action="store_true", help="build : reconstruction complète forcée")
+    parser.add_argument("--cleaning-levels", default="standard",
+                        help="refresh : niveaux de nettoyage dont les features sont mises à jour")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from spark_model import get_spark
+
+    spark_session = get_spark("SENIngestion")
+    if spark_session is None:
+        raise SystemExit("Spark indisponible")
+    if args.command == "refresh":
+        result = refresh_dataset(spark_session, args.data, args.delta)
+        from feature_store import ensure_features
+
+        for level in args.cleaning_levels.split(","):
+            ensure_features(spark_session, args.data, level)
+        print(json.dumps({
+            "version": result.get("version", 1),
+            "last_refresh": result.get("last_refresh"),
+        }, indent=2))
+    else:
+        if args.full:
+            source_path = os.path.abspath(resolve_data_path(args.data))
+            _MANIFESTS.pop(source_path, None)
+            shutil.rmtree(_dataset_dir(source_path), ignore_errors=True)
+        print(json.dumps(ensure_dataset(spark_session, args.data), indent=2))
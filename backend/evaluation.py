@@ -0,0 +1,79 @@
+"""
+Évaluation des modèles en une seule passe.
+
+Le jeu de test d'un pays ne compte que quelques centaines de lignes : il est
+collecté une fois (avec les prédictions du modèle) et toutes les métriques
+sont calculées en NumPy, au lieu de relancer la lignée Spark pour chaque
+`RegressionEvaluator`.
+
+Deux familles de métriques :
+- `regression_metrics` : erreurs à un pas sur tout le jeu de test
+  (RMSE, MAE, R², MAPE, biais) ;
+- `horizon_metrics` : erreurs de la prévision récursive lancée depuis la fin
+  de l'entraînement, regroupées par horizon (J+1..7, J+8..14, J+15..30).
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from forecasting import recursive_forecast
+
+HORIZON_BUCKETS: Tuple[Tuple[int, int], ...] = ((1, 7), (8, 14), (15, 30))
+MAX_EVAL_HORIZON = HORIZON_BUCKETS[-1][1]
+
+
+def _finite(value: float) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def regression_metrics(y_true: Sequence[float], y_pred: Sequence[float]) -> Dict[str, Optional[float]]:
+    """RMSE, MAE, R², MAPE (%) et biais (moyenne de prédiction - réel) en un seul calcul.
+
+    Le MAPE ignore les jours sans cas (division par zéro).
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    if len(y_true) == 0:
+        return {"rmse": None, "mae": None, "r2": None, "mape": None, "bias": None, "n": 0}
+
+    errors = y_pred - y_true
+    sse = float(np.sum(errors ** 2))
+    ss_tot = float(np.sum((y_true - y_true.mean()) ** 2))
+    nonzero = y_true != 0
+    return {
+        "rmse": _finite(np.sqrt(sse / len(y_true))),
+        "mae": _finite(np.mean(np.abs(errors))),
+        "r2": _finite(1.0 - sse / ss_tot) if ss_tot > 0 else None,
+        "mape": _finite(100.0 * np.mean(np.abs(errors[nonzero] / y_true[nonzero]))) if nonzero.any() else None,
+        "bias": _finite(np.mean(errors)),
+        "n": int(len(y_true)),
+    }
+
+
+def horizon_metrics(y_true: Sequence[float], y_pred: Sequence[float],
+                    buckets: Sequence[Tuple[int, int]] = HORIZON_BUCKETS) -> Dict[str, Dict]:
+    """Métriques par tranche d'horizon ; l'élément i des séries correspond à J+(i+1)."""
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    breakdown = {}
+    for start, end in buckets:
+        if start > len(y_true):
+            break
+        metrics = regression_metrics(y_true[start - 1:end], y_pred[start - 1:end])
+        metrics.pop("r2")  # peu significatif sur quelques jours
+        breakdown[f"{start}-{end}"] = metrics
+    return breakdown
+
+
+def evaluate_recursive(history: Dict, actual: Sequence[float], feature_cols: List[str],
+                       predict: Callable[[np.ndarray], np.ndarray],
+                       max_horizon: int = MAX_EVAL_HORIZON) -> Dict[str, Dict]:
+    """Prévision récursive depuis `history` comparée aux valeurs `actual` suivantes."""
+    horizon = min(max_horizon, len(actual))
+    if horizon == 0:
+        return {}
+    forecast = recursive_forecast(history, feature_cols, predict, horizon)
+    return horizon_metrics(actual[:horizon], [point["prediction"] for point in forecast])
@@ -0,0 +1,213 @@
+"""
+Matérialisation des features pour tous les pays.
+
+La matrice de features complète (cases_lag_*, deaths_lag_*, vaccinations_lag_7,
+stringency_lag_1, seasonal_sin/cos) est calculée pour toutes les `location` en
+une seule passe distribuée (fenêtres partitionnées par pays), puis stockée en
+Parquet partitionné par `location`, une fois par (version du dataset, niveau
+de nettoyage). Les prédictions lisent ensuite les lignes pré-calculées au lieu
+de reconstruire les fenêtres à chaque appel.
+
+Après une mise à jour incrémentale du dataset, seules les partitions des pays
+ayant reçu de nouvelles lignes sont recalculées et remplacées.
+
+Le répertoire dépend aussi de `CLEANING_VERSION` : une modification de la
+logique de nettoyage reconstruit les features. Les statistiques de nettoyage
+par pays (colonnes `clean_*`) sont recopiées dans le manifeste.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pyspark.sql import DataFrame, SparkSession
+
+from cleaning import CLEANING_VERSION, STATS_COLUMNS, clean_spark, stats_from_columns
+from data_store import CACHE_DIR, ensure_dataset, load_dataset, partition_path, read_partitions
+
+FEATURES_DIR = os.path.join(CACHE_DIR, "features")
+
+# Colonnes brutes conservées à côté des features (cible et séries d'origine)
+BASE_COLUMNS = ["location", "date", "new_cases", "new_deaths", "new_vaccinations", "stringency_index"]
+SEASONAL_COLUMNS = ["seasonal_sin", "seasonal_cos"]
+
+_FEATURES_LOCK = threading.Lock()
+_MANIFESTS: Dict[Tuple[str, str], Dict] = {}
+
+
+def _features_dir(fingerprint: str, cleaning_level: str) -> str:
+    return os.path.join(FEATURES_DIR, fingerprint, f"{cleaning_level}-v{CLEANING_VERSION}")
+
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compute_features(df: DataFrame, cleaning_level: str) -> Tuple[DataFrame, List[str]]:
+    """Nettoie et construit les features pour tous les pays présents dans `df`."""
+    from spark_model import _build_lag_features, add_seasonal_features
+
+    df_clean = clean_spark(add_seasonal_features(df), cleaning_level)
+    df_lag, feature_cols = _build_lag_features(df_clean)
+    kept = [name for name in BASE_COLUMNS if name in df_lag.columns] + feature_cols + STATS_COLUMNS
+    return df_lag.select(*kept), feature_cols
+
+
+def _write_manifest(path: str, manifest: Dict):
+    tmp_path = os.path.join(path, f"manifest.json.{uuid.uuid4().hex[:8]}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, "manifest.json"))
+
+
+def _collect_cleaning_stats(spark: SparkSession, parquet_path: str,
+                            countries: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Statistiques de nettoyage par pays, lues dans les colonnes `clean_*` du Parquet."""
+    df = read_partitions(spark, parquet_path, countries) if countries else spark.read.parquet(parquet_path)
+    rows = df.select("location", *STATS_COLUMNS).dropDuplicates(["location"]).collect()
+    return {row["location"]: stats_from_columns(row.asDict()) for row in rows}
+
+
+def _country_versions(dataset: Dict) -> Dict[str, int]:
+    return {name: info.get("version", 1) for name, info in dataset["countries"].items()}
+
+
+def materialize_features(spark: SparkSession, data_path: str, cleaning_level: str) -> Dict:
+    """Calcule et écrit la matrice de features de tous les pays ; retourne le manifeste."""
+    dataset = ensure_dataset(spark, data_path)
+    fingerprint = dataset["fingerprint"]
+    target = _features_dir(fingerprint, cleaning_level)
+    staging = f"{target}.staging-{uuid.uuid4().hex[:8]}"
+
+    logging.info(f"[Features] Materializing features (cleaning={cleaning_level}) -> {target}")
+    df_features, feature_cols = compute_features(load_dataset(spark, data_path), cleaning_level)
+    (df_features.repartition("location")
+        .write.mode("overwrite")
+        .partitionBy("location")
+        .parquet(os.path.join(staging, "parquet")))
+
+    manifest = {
+        "dataset_fingerprint": fingerprint,
+        "dataset_version": dataset.get("version", 1),
+        "country_versions": _country_versions(dataset),
+        "cleaning_level": cleaning_level,
+        "feature_cols": feature_cols,
+        "parquet_path": os.path.join(target, "parquet"),
+        "cleaning_version": CLEANING_VERSION,
+        "cleaning_stats": _collect_cleaning_stats(spark, os.path.join(staging, "parquet")),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    _write_manifest(staging, manifest)
+
+    if os.path.isdir(target):
+        shutil.rmtree(staging, ignore_errors=True)
+        return _read_manifest(target) or manifest
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(staging, target)
+
+    # Les features des anciennes versions du dataset ne servent plus
+    for entry in os.listdir(FEATURES_DIR):
+        if entry != fingerprint and not entry.startswith("."):
+            shutil.rmtree(os.path.join(FEATURES_DIR, entry), ignore_errors=True)
+    # ... ni celles d'une version précédente du nettoyage pour ce niveau
+    for entry in os.listdir(os.path.dirname(target)):
+        if (entry == cleaning_level or entry.startswith(f"{cleaning_level}-v")) \
+                and entry != os.path.basename(target) and ".staging-" not in entry:
+            shutil.rmtree(os.path.join(os.path.dirname(target), entry), ignore_errors=True)
+
+    logging.info(f"[Features] Features ready for {fingerprint}/{cleaning_level}")
+    return manifest
+
+
+def update_features(spark: SparkSession, data_path: str, cleaning_level: str, manifest: Dict) -> Dict:
+    """Recalcule uniquement les partitions des pays modifiés depuis `manifest`."""
+    dataset = ensure_dataset(spark, data_path)
+    versions = _country_versions(dataset)
+    known = manifest.get("country_versions", {})
+    changed = sorted(name for name, version in versions.items() if version > known.get(name, 0))
+
+    target = _features_dir(dataset["fingerprint"], cleaning_level)
+    cleaning_stats = dict(manifest.get("cleaning_stats", {}))
+    if changed:
+        logging.info(f"[Features] Updating {len(changed)} countries (cleaning={cleaning_level}): {changed[:10]}")
+        staging = f"{target}.staging-{uuid.uuid4().hex[:8]}"
+        try:
+            df_features, _ = compute_features(load_dataset(spark, data_path, countries=changed), cleaning_level)
+            (df_features.repartition("location")
+                .write.mode("overwrite")
+                .partitionBy("location")
+                .parquet(staging))
+            # Remplacement partition par partition : les autres pays ne sont pas réécrits
+            for name in changed:
+                new_partition = partition_path(staging, name)
+                if os.path.isdir(new_partition):
+                    old_partition = partition_path(manifest["parquet_path"], name)
+                    shutil.rmtree(old_partition, ignore_errors=True)
+                    os.replace(new_partition, old_partition)
+            cleaning_stats.update(_collect_cleaning_stats(spark, manifest["parquet_path"], changed))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = dict(manifest,
+                    dataset_version=dataset.get("version", 1),
+                    country_versions=versions,
+                    cleaning_stats=cleaning_stats,
+                    updated_at=datetime.now().isoformat(timespec="seconds"))
+    _write_manifest(target, manifest)
+    return manifest
+
+
+def ensure_features(spark: SparkSession, data_path: str, cleaning_level: str) -> Dict:
+    """Garantit que les features de la version courante existent et retourne leur manifeste."""
+    dataset = ensure_dataset(spark, data_path)
+    key = (dataset["fingerprint"], cleaning_level)
+    version = dataset.get("version", 1)
+    manifest = _MANIFESTS.get(key)
+    if (manifest is not None and manifest.get("dataset_version", 1) == version
+            and os.path.isdir(manifest["parquet_path"])):
+        return manifest
+
+    with _FEATURES_LOCK:
+        manifest = _read_manifest(_features_dir(dataset["fingerprint"], cleaning_level))
+        if manifest is None or not os.path.isdir(manifest["parquet_path"]):
+            manifest = materialize_features(spark, data_path, cleaning_level)
+        elif manifest.get("dataset_version", 1) != version:
+            manifest = update_features(spark, data_path, cleaning_level, manifest)
+        _MANIFESTS[key] = manifest
+    return manifest
+
+
+def country_feature_columns(feature_cols: List[str], country: str) -> List[str]:
+    """Retire les features saisonnières si la configuration du pays ne les prévoit pas."""
+    from spark_model import COUNTRY_CONFIGS
+
+    config = COUNTRY_CONFIGS.get(country, COUNTRY_CONFIGS['France'])
+    if config.get('seasonal_factor'):
+        return list(feature_cols)
+    return [name for name in feature_cols if name not in SEASONAL_COLUMNS]
+
+
+def load_features(spark: SparkSession, data_path: str, cleaning_level: str,
+                  countries: Optional[List[str]] = None) -> Tuple[DataFrame, List[str]]:
+    """Lit les features pré-calculées (partition pruning sur `location`).
+
+    Returns:
+        (DataFrame des features, liste complète des colonnes de features)
+    """
+    manifest = ensure_features(spark, data_path, cleaning_level)
+    df = read_partitions(spark, manifest["parquet_path"], countries)
+    return df, list(manifest["feature_cols"])
+
+
+def get_cleaning_stats(spark: SparkSession, data_path: str, cleaning_level: str, country: str) -> Optional[Dict]:
+    """Statistiques de nettoyage d'un pays (manifeste en mémoire, sans job Spark)."""
+    return ensure_features(spark, data_path, cleaning_level).get("cleaning_stats", {}).get(country)
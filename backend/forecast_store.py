@@ -0,0 +1,350 @@
+"""
+Prévisions pré-calculées (mode batch nocturne).
+
+Le trafic porte presque uniquement sur les pays de `COUNTRY_CONFIGS`. Après
+chaque rafraîchissement des données, `precompute_forecasts` calcule toutes
+les combinaisons (pays, modèle, niveau de nettoyage) sur l'horizon maximal et
+les écrit dans une base SQLite locale (`.sen_cache/forecasts.sqlite`).
+`/predict` y lit ensuite la réponse par clé primaire, sans Spark : la
+prévision récursive ne dépend pas de l'horizon, l'horizon demandé est donc un
+préfixe de la prévision stockée.
+
+Une entrée n'est servie que si l'empreinte des données du pays, les
+hyperparamètres réglés et la version du nettoyage sont ceux du calcul ;
+sinon, ou pour une combinaison absente, la prédiction est calculée en
+direct. Un nouveau lancement ne recalcule que les combinaisons dont l'un
+d'eux a changé.
+
+Lancement : `python forecast_store.py run` (cron, après `data_store.py
+refresh`) ou SEN_PRECOMPUTE_AT=HH:MM : le maître gunicorn démarre alors un
+unique processus planificateur (`python forecast_store.py schedule`) qui
+lance le batch chaque nuit à cette heure et dès que le CSV source change.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from response_cache import make_response_key
+from sources import CACHE_DIR, dataset_fingerprint
+
+FORECASTS_DB = os.path.join(CACHE_DIR, "forecasts.sqlite")
+# Horizon maximal accepté par /predict : les horizons plus courts en sont des préfixes
+MAX_HORIZON = 30
+
+USE_PRECOMPUTED = os.environ.get("SEN_USE_PRECOMPUTED", "true").lower() in ("1", "true", "yes")
+PRECOMPUTE_AT = os.environ.get("SEN_PRECOMPUTE_AT", "")
+PRECOMPUTE_DATA = os.environ.get("SEN_PRECOMPUTE_DATA", "owid-covid-data.csv")
+PRECOMPUTE_POLL = float(os.environ.get("SEN_PRECOMPUTE_POLL", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    source TEXT NOT NULL,
+    country TEXT NOT NULL,
+    model_type TEXT NOT NULL,
+    cleaning_level TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    horizon INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at TEXT NOT NULL,
+    PRIMARY KEY (source, country, model_type, cleaning_level)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+"""
+
+
+def _stored_fingerprint(key) -> str:
+    """Empreinte enregistrée avec une prévision : données du pays et version du modèle
+    (hyperparamètres + nettoyage, voir `make_response_key`)."""
+    return f"{key[5]}:{key[6]}"
+
+
+class ForecastStore:
+    """Prévisions par (fichier, pays, modèle, nettoyage), une connexion SQLite par thread."""
+
+    def __init__(self, path: str = FORECASTS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            # WAL : les lectures des workers web ne sont pas bloquées pendant l'écriture du batch
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, country: str, model_type: str, horizon: int, cleaning_level: str,
+            data_path: str) -> Optional[Dict]:
+        """Réponse pré-calculée tronquée à `horizon`, ou None si absente ou périmée."""
+        key = make_response_key(country, model_type, horizon, cleaning_level, data_path)
+        if key is None or horizon > MAX_HORIZON:
+            return None
+        row = self._connection().execute(
+            "SELECT fingerprint, horizon, payload FROM forecasts "
+            "WHERE source = ? AND country = ? AND model_type = ? AND cleaning_level = ?",
+            (key[4], country, model_type, cleaning_level)).fetchone()
+        if row is None or row[1] < horizon:
+            self._count("misses")
+            return None
+        if row[0] != _stored_fingerprint(key):
+            self._count("stale")
+            return None
+        self._count("hits")
+        result = json.loads(row[2])
+        result["predictions"] = result["predictions"][:horizon]
+        result["horizon_days"] = horizon
+        return result
+
+    def put(self, country: str, model_type: str, cleaning_level: str, data_path: str, result: Dict) -> bool:
+        """Enregistre une réponse de `predict_cases` ; False si le fichier de données est introuvable."""
+        key = make_response_key(country, model_type, result["horizon_days"], cleaning_level, data_path)
+        if key is None:
+            return False
+        computed_at = datetime.now().isoformat(timespec="seconds")
+        payload = dict(result, precomputed_at=computed_at)
+        payload.pop("timings", None)
+        payload.pop("spark_stats", None)
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (key[4], country, model_type, cleaning_level, _stored_fingerprint(key),
+                          result["horizon_days"], json.dumps(payload, default=str), computed_at))
+        return True
+
+    def is_fresh(self, country: str, model_type: str, cleaning_level: str, data_path: str) -> bool:
+        """Vrai si la combinaison est déjà calculée sur les données courantes du pays."""
+        key = make_response_key(country, model_type, MAX_HORIZON, cleaning_level, data_path)
+        if key is None:
+            return False
+        row = self._connection().execute(
+            "SELECT fingerprint, horizon FROM forecasts "
+            "WHERE source = ? AND country = ? AND model_type = ? AND cleaning_level = ?",
+            (key[4], country, model_type, cleaning_level)).fetchone()
+        return row is not None and row[0] == _stored_fingerprint(key) and row[1] >= MAX_HORIZON
+
+    def record_run(self, data_path: str, summary: Dict):
+        source = os.path.abspath(data_path)
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                         (source, dataset_fingerprint(data_path), summary["finished_at"], json.dumps(summary)))
+
+    def last_run(self, data_path: str) -> Optional[Dict]:
+        """Résumé du dernier batch sur ce fichier, avec l'empreinte du CSV utilisée."""
+        row = self._connection().execute(
+            "SELECT fingerprint, summary FROM runs WHERE source = ?", (os.path.abspath(data_path),)).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row[1]), source_fingerprint=row[0])
+
+    def stats(self) -> Dict:
+        entries = self._connection().execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "path": self.path,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_FORECAST_STORE: Optional[ForecastStore] = None
+_FORECAST_STORE_LOCK = threading.Lock()
+
+
+def get_forecast_store() -> ForecastStore:
+    global _FORECAST_STORE
+    if _FORECAST_STORE is None:
+        with _FORECAST_STORE_LOCK:
+            if _FORECAST_STORE is None:
+                _FORECAST_STORE = ForecastStore()
+    return _FORECAST_STORE
+
+
+def precompute_forecasts(data_path: str = PRECOMPUTE_DATA, countries: Optional[List[str]] = None,
+                         model_types: Optional[List[str]] = None, cleaning_levels: Optional[List[str]] = None,
+                         max_workers: Optional[int] = None, force: bool = False) -> Dict:
+    """Calcule et enregistre les prévisions de toutes les combinaisons demandées.
+
+    Args:
+        data_path: CSV OWID servi par /predict
+        countries: Pays (défaut: pays configurés)
+        model_types: Modèles (défaut: tous)
+        cleaning_levels: Niveaux de nettoyage (défaut: tous)
+        max_workers: Prédictions simultanées (défaut: SEN_PREDICT_ALL_WORKERS)
+        force: Recalculer aussi les combinaisons déjà à jour
+
+    Returns:
+        Résumé du batch (combinaisons calculées, ignorées car à jour, échecs)
+    """
+    from backtesting import MODEL_TYPES
+    from cleaning import CLEANING_LEVELS
+    from data_store import ensure_dataset
+    from spark_model import PREDICTION_ENGINE, get_configured_countries, get_spark, iter_predictions
+
+    started = time.time()
+    store = get_forecast_store()
+    if PREDICTION_ENGINE != 'local':
+        # Ingestion (ou mise à jour incrémentale) d'abord : les empreintes par pays en dépendent
+        spark = get_spark("SENPrecompute")
+        if spark is not None:
+            ensure_dataset(spark, data_path)
+
+    combos = [{'country': country, 'model': model, 'horizon': MAX_HORIZON, 'cleaning_level': level}
+              for level in (cleaning_levels or CLEANING_LEVELS)
+              for country in (countries or get_configured_countries())
+              for model in (model_types or MODEL_TYPES)]
+    specs = [spec for spec in combos
+             if force or not store.is_fresh(spec['country'], spec['model'], spec['cleaning_level'], data_path)]
+    logging.info(f"[Precompute] {len(specs)}/{len(combos)} combinations to compute from {data_path}")
+
+    computed, failed = 0, []
+    if specs:
+        for _, spec, result, error in iter_predictions(specs, data_path, max_workers):
+            if error is None and result.get('fallback_mode'):
+                error = "Spark indisponible : prédiction simulée non enregistrée"
+            if error is not None:
+                failed.append({'country': spec['country'], 'model': spec['model'],
+                               'cleaning_level': spec['cleaning_level'], 'error': error})
+                continue
+            store.put(spec['country'], spec['model'], spec['cleaning_level'], data_path, result)
+            computed += 1
+
+    summary = {
+        'data_path': data_path,
+        'combinations': len(combos),
+        'computed': computed,
+        'skipped': len(combos) - len(specs),
+        'failed': failed,
+        'duration_seconds': round(time.time() - started, 2),
+        'finished_at': datetime.now().isoformat(timespec="seconds"),
+    }
+    store.record_run(data_path, summary)
+    logging.info(f"[Precompute] {computed} computed, {summary['skipped']} up to date, "
+                 f"{len(failed)} failed in {summary['duration_seconds']}s")
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Planificateur (processus dédié : `python forecast_store.py schedule`)
+# ---------------------------------------------------------------------------
+_SCHEDULER_STOP = threading.Event()
+
+
+def _run_due(store: ForecastStore, at: str, data_path: str) -> Optional[str]:
+    """Raison de lancer le batch maintenant ('nightly' ou 'data_changed'), sinon None.
+
+    `at` est une heure HH:MM sur deux chiffres (normalisée par `run_scheduler`).
+    """
+    try:
+        source_fingerprint = dataset_fingerprint(data_path)
+    except OSError:
+        return None
+    last = store.last_run(data_path)
+    if last is not None and last["source_fingerprint"] != source_fingerprint:
+        return "data_changed"
+    now = datetime.now()
+    if now.strftime("%H:%M") >= at and (last is None or last["finished_at"][:10] < now.date().isoformat()):
+        return "nightly"
+    return None
+
+
+def run_scheduler(at: str = PRECOMPUTE_AT, data_path: str = PRECOMPUTE_DATA, poll: float = PRECOMPUTE_POLL):
+    """Boucle du planificateur : batch chaque nuit à `at` (HH:MM) et dès que le CSV change.
+
+    Bloquant ; lancé une seule fois, par le maître gunicorn (`when_ready`)
+    ou à la main. Le verrou fichier évite seulement qu'un batch lancé en
+    parallèle (cron, CLI) ne se superpose à celui-ci.
+    """
+    import fcntl
+
+    # Forme canonique HH:MM ("3:00" -> "03:00") : `_run_due` compare des chaînes
+    at = datetime.strptime(at, "%H:%M").strftime("%H:%M")
+    store = get_forecast_store()
+    logging.info(f"[Precompute] Scheduler started (daily at {at}, data={data_path})")
+    while not _SCHEDULER_STOP.wait(poll):
+        try:
+            reason = _run_due(store, at, data_path)
+            if reason is None:
+                continue
+            with open(f"{store.path}.lock", "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                logging.info(f"[Precompute] Scheduled run ({reason})")
+                precompute_forecasts(data_path)
+        except Exception as e:
+            logging.error(f"[Precompute] Scheduled run failed: {e}")
+
+
+def stop_scheduler():
+    _SCHEDULER_STOP.set()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prévisions pré-calculées servies par /predict")
+    parser.add_argument("command", choices=["run", "status", "schedule"],
+                        help="run : calcule les combinaisons manquantes ou périmées ; status : dernier batch ; "
+                             "schedule : planificateur (SEN_PRECOMPUTE_AT)")
+    parser.add_argument("--data", default=PRECOMPUTE_DATA, help="Chemin du CSV OWID")
+    parser.add_argument("--countries", help="Pays séparés par des virgules (défaut: pays configurés)")
+    parser.add_argument("--models", help="Modèles séparés par des virgules (défaut: tous)")
+    parser.add_argument("--cleaning-levels", help="Niveaux de nettoyage séparés par des virgules (défaut: tous)")
+    parser.add_argument("--workers", type=int, help="Prédictions en parallèle")
+    parser.add_argument("--refresh", action="store_true", help="run : mise à jour incrémentale du dataset d'abord")
+    parser.add_argument("--delta", help="--refresh : CSV ne contenant que les nouvelles lignes")
+    parser.add_argument("--force", action="store_true", help="run : recalculer aussi les combinaisons à jour")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "schedule":
+        if not PRECOMPUTE_AT:
+            raise SystemExit("SEN_PRECOMPUTE_AT=HH:MM requis")
+        run_scheduler(data_path=args.data)
+    elif args.command == "status":
+        print(json.dumps({"last_run": get_forecast_store().last_run(args.data),
+                          "store": get_forecast_store().stats()}, indent=2))
+    else:
+        if args.refresh:
+            from data_store import refresh_dataset
+            from spark_model import get_spark
+
+            spark_session = get_spark("SENIngestion")
+            if spark_session is None:
+                raise SystemExit("Spark indisponible")
+            refresh_dataset(spark_session, args.data, args.delta)
+        result = precompute_forecasts(
+            args.data,
+            countries=args.countries.split(",") if args.countries else None,
+            model_types=args.models.split(",") if args.models else None,
+            cleaning_levels=args.cleaning_levels.split(",") if args.cleaning_levels else None,
+            max_workers=args.workers,
+            force=args.force,
+        )
+        print(json.dumps(result, indent=2))
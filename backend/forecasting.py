@@ -0,0 +1,331 @@
+"""
+Prévision récursive multi-pas sur le driver.
+
+Au lieu de scorer les `horizon` dernières lignes historiques, la prévision part
+de la dernière observation et avance jour par jour : les variables de décalage
+du jour J+1 sont construites à partir des valeurs observées puis des
+prédictions déjà produites. Les séries exogènes (décès, vaccinations,
+stringency) sont prolongées par leur dernière valeur observée.
+
+La récursion ne porte que sur quelques lignes : le pipeline Spark ML
+(assembleur + StandardScaler + régresseur) est converti une fois en tableaux
+NumPy (coefficients linéaires ou arbres aplatis) et évalué en mémoire, sans
+lancer `horizon` jobs Spark.
+"""
+
+import re
+from datetime import date as date_type, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Plus grand décalage utilisé par les features (cases_lag_14)
+MAX_LAG = 14
+HISTORY_COLUMNS = ("new_cases", "new_deaths", "new_vaccinations", "stringency_index")
+
+_TREE_HEADER_RE = re.compile(r"^Tree (\d+) \(weight ([^)]+)\):$")
+_SPLIT_RE = re.compile(r"^If \(feature (\d+) <= ([^)]+)\)$")
+_ELSE_RE = re.compile(r"^Else \(feature (\d+) > ([^)]+)\)$")
+_LEAF_RE = re.compile(r"^Predict: (.+)$")
+
+
+class TreeEnsemble:
+    """Ensemble d'arbres de régression aplatis en tableaux NumPy.
+
+    Tous les arbres sont parcourus simultanément : une itération par niveau
+    de profondeur, vectorisée sur (lignes x arbres).
+    """
+
+    def __init__(self, trees: List[Dict], weights: Sequence[float]):
+        self.trees = list(trees)
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        self.max_depth = 0
+        for tree in trees:
+            offset = len(feature)
+            roots.append(offset)
+            self.max_depth = max(self.max_depth, tree["depth"])
+            feature.extend(tree["feature"])
+            threshold.extend(tree["threshold"])
+            left.extend(child + offset if child >= 0 else -1 for child in tree["left"])
+            right.extend(child + offset if child >= 0 else -1 for child in tree["right"])
+            value.extend(tree["value"])
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.value = np.asarray(value, dtype=float)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=float)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            is_leaf = self.left[nodes] < 0
+            if is_leaf.all():
+                break
+            # Convention Spark ML : valeur <= seuil -> fils gauche
+            go_left = X[rows, np.maximum(self.feature[nodes], 0)] <= self.threshold[nodes]
+            nodes = np.where(is_leaf, nodes, np.where(go_left, self.left[nodes], self.right[nodes]))
+        return self.value[nodes] @ self.weights
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        sizes = [len(tree["feature"]) for tree in self.trees]
+        return {
+            "tree_sizes": np.asarray(sizes, dtype=np.int64),
+            "tree_depths": np.asarray([tree["depth"] for tree in self.trees], dtype=np.int64),
+            "tree_feature": self.feature,
+            "tree_threshold": self.threshold,
+            # Indices des fils relatifs à chaque arbre (-1 pour une feuille)
+            "tree_left": np.concatenate([np.asarray(tree["left"], dtype=np.int64) for tree in self.trees]),
+            "tree_right": np.concatenate([np.asarray(tree["right"], dtype=np.int64) for tree in self.trees]),
+            "tree_value": self.value,
+            "tree_weights": self.weights,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "TreeEnsemble":
+        trees = []
+        start = 0
+        for size, depth in zip(arrays["tree_sizes"], arrays["tree_depths"]):
+            end = start + int(size)
+            trees.append({
+                "feature": arrays["tree_feature"][start:end].tolist(),
+                "threshold": arrays["tree_threshold"][start:end].tolist(),
+                "left": arrays["tree_left"][start:end].tolist(),
+                "right": arrays["tree_right"][start:end].tolist(),
+                "value": arrays["tree_value"][start:end].tolist(),
+                "depth": int(depth),
+            })
+            start = end
+        return cls(trees, arrays["tree_weights"])
+
+
+def trees_from_sklearn(estimators: Iterable) -> List[Dict]:
+    """Convertit des arbres scikit-learn (même convention `x <= seuil` -> gauche)."""
+    trees = []
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        trees.append({
+            "feature": np.where(is_leaf, -1, tree.feature).tolist(),
+            "threshold": np.where(is_leaf, 0.0, tree.threshold).tolist(),
+            "left": np.where(is_leaf, -1, tree.children_left).tolist(),
+            "right": np.where(is_leaf, -1, tree.children_right).tolist(),
+            "value": tree.value[:, 0, 0].tolist(),
+            "depth": int(tree.max_depth),
+        })
+    return trees
+
+
+def constant_tree(value: float) -> Dict:
+    """Arbre réduit à une feuille (ex. valeur initiale d'un gradient boosting)."""
+    return {"feature": [-1], "threshold": [0.0], "left": [-1], "right": [-1], "value": [float(value)], "depth": 0}
+
+
+def _parse_tree(lines: List[str], pos: int, tree: Dict, depth: int) -> Tuple[int, int]:
+    """Parse un sous-arbre (pré-ordre) ; retourne (indice du nœud, position suivante)."""
+    index = len(tree["feature"])
+    tree["depth"] = max(tree["depth"], depth)
+    leaf = _LEAF_RE.match(lines[pos])
+    if leaf:
+        tree["feature"].append(-1)
+        tree["threshold"].append(0.0)
+        tree["left"].append(-1)
+        tree["right"].append(-1)
+        tree["value"].append(float(leaf.group(1)))
+        return index, pos + 1
+
+    split = _SPLIT_RE.match(lines[pos])
+    if not split:
+        raise ValueError(f"Split non supporté dans l'arbre: {lines[pos]!r}")
+    tree["feature"].append(int(split.group(1)))
+    tree["threshold"].append(float(split.group(2)))
+    tree["left"].append(-1)
+    tree["right"].append(-1)
+    tree["value"].append(0.0)
+
+    left, pos = _parse_tree(lines, pos + 1, tree, depth + 1)
+    if not _ELSE_RE.match(lines[pos]):
+        raise ValueError(f"Branche Else attendue: {lines[pos]!r}")
+    right, pos = _parse_tree(lines, pos + 1, tree, depth + 1)
+    tree["left"][index] = left
+    tree["right"][index] = right
+    return index, pos
+
+
+def parse_tree_ensemble(debug_string: str) -> List[Dict]:
+    """Convertit le `toDebugString` d'un ensemble d'arbres Spark ML en listes de nœuds."""
+    lines = [line.strip() for line in debug_string.splitlines() if line.strip()]
+    trees = []
+    pos = 0
+    while pos < len(lines):
+        if _TREE_HEADER_RE.match(lines[pos]):
+            tree = {"feature": [], "threshold": [], "left": [], "right": [], "value": [], "depth": 0}
+            _, pos = _parse_tree(lines, pos + 1, tree, 0)
+            trees.append(tree)
+        else:
+            pos += 1
+    if not trees:
+        raise ValueError("Aucun arbre trouvé dans la description du modèle")
+    return trees
+
+
+class CompiledPipeline:
+    """Pipeline Spark ML (assembleur + scaler + régresseur) évalué en NumPy.
+
+    Le régresseur est soit linéaire (`coefficients`, `intercept`), soit un
+    ensemble d'arbres (`ensemble`), appliqué aux features standardisées.
+    """
+
+    def __init__(self, feature_cols: List[str], mean: np.ndarray, std: np.ndarray,
+                 coefficients: Optional[np.ndarray] = None, intercept: float = 0.0,
+                 ensemble: Optional[TreeEnsemble] = None):
+        if (coefficients is None) == (ensemble is None):
+            raise ValueError("Un modèle linéaire ou un ensemble d'arbres est requis")
+        self.feature_cols = list(feature_cols)
+        self.mean = np.asarray(mean, dtype=float)
+        self.std = np.asarray(std, dtype=float)
+        self.coefficients = None if coefficients is None else np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.ensemble = ensemble
+
+    def scale(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        # StandardScaler Spark : une feature d'écart-type nul est ramenée à 0
+        return np.where(self.std > 0, (X - self.mean) / np.where(self.std > 0, self.std, 1.0), 0.0)
+
+    def predict_scaled(self, Z: np.ndarray) -> np.ndarray:
+        if self.ensemble is not None:
+            return self.ensemble.predict(Z)
+        return Z @ self.coefficients + self.intercept
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_scaled(self.scale(X))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tableaux NumPy sérialisables (np.savez) ; voir `from_arrays`."""
+        arrays = {
+            "feature_cols": np.asarray(self.feature_cols),
+            "scaler_mean": self.mean,
+            "scaler_std": self.std,
+        }
+        if self.ensemble is not None:
+            arrays.update(self.ensemble.to_arrays())
+        else:
+            arrays["coefficients"] = self.coefficients
+            arrays["intercept"] = np.asarray([self.intercept])
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CompiledPipeline":
+        feature_cols = [str(name) for name in arrays["feature_cols"]]
+        if "tree_sizes" in arrays:
+            return cls(feature_cols, arrays["scaler_mean"], arrays["scaler_std"],
+                       ensemble=TreeEnsemble.from_arrays(arrays))
+        return cls(feature_cols, arrays["scaler_mean"], arrays["scaler_std"],
+                   coefficients=arrays["coefficients"], intercept=float(arrays["intercept"][0]))
+
+
+def compile_pipeline(pipeline_model) -> CompiledPipeline:
+    """Extrait les paramètres d'un PipelineModel ajusté par `_fit_and_evaluate`."""
+    from pyspark.ml.feature import StandardScalerModel, VectorAssembler
+    from pyspark.ml.regression import (GBTRegressionModel, LinearRegressionModel,
+                                       RandomForestRegressionModel)
+
+    assembler, scaler, regressor = pipeline_model.stages
+    if not isinstance(assembler, VectorAssembler) or not isinstance(scaler, StandardScalerModel):
+        raise ValueError("Pipeline inattendu : VectorAssembler + StandardScalerModel requis")
+
+    n_features = len(assembler.getInputCols())
+    mean = scaler.mean.toArray() if scaler.getWithMean() else np.zeros(n_features)
+    std = scaler.std.toArray() if scaler.getWithStd() else np.ones(n_features)
+
+    feature_cols = assembler.getInputCols()
+    if isinstance(regressor, LinearRegressionModel):
+        return CompiledPipeline(feature_cols, mean, std, coefficients=regressor.coefficients.toArray(),
+                                intercept=float(regressor.intercept))
+    if isinstance(regressor, RandomForestRegressionModel):
+        trees = parse_tree_ensemble(regressor.toDebugString)
+        ensemble = TreeEnsemble(trees, np.full(len(trees), 1.0 / len(trees)))
+    elif isinstance(regressor, GBTRegressionModel):
+        ensemble = TreeEnsemble(parse_tree_ensemble(regressor.toDebugString), regressor.treeWeights)
+    else:
+        raise ValueError(f"Régresseur non supporté pour la prévision: {type(regressor).__name__}")
+    return CompiledPipeline(feature_cols, mean, std, ensemble=ensemble)
+
+
+def history_from_rows(rows: Iterable) -> Dict[str, np.ndarray]:
+    """Construit les séries d'historique (ordre chronologique) à partir de lignes date + colonnes."""
+    rows = sorted(rows, key=lambda row: row["date"])[-MAX_LAG:]
+    if not rows:
+        raise ValueError("Historique vide : impossible de prévoir")
+    history = {"date": rows[-1]["date"]}
+    for name in HISTORY_COLUMNS:
+        try:
+            history[name] = np.array([float(row[name] or 0.0) for row in rows])
+        except (KeyError, ValueError):
+            continue
+    return history
+
+
+def _to_date(value) -> date_type:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date_type):
+        return value
+    if hasattr(value, "date"):  # pandas.Timestamp
+        return value.date()
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def recursive_forecast(history: Dict, feature_cols: List[str],
+                       predict: Callable[[np.ndarray], np.ndarray], horizon: int) -> List[Dict]:
+    """Prévoit `horizon` jours après la dernière observation, en réinjectant les prédictions.
+
+    Args:
+        history: {'date': dernière date observée, 'new_cases': array, ...}
+            (valeurs nettoyées, ordre chronologique, au moins `MAX_LAG` points de préférence)
+        feature_cols: colonnes de features dans l'ordre attendu par `predict`
+        predict: fonction (n, len(feature_cols)) -> (n,)
+        horizon: nombre de jours à prévoir
+
+    Returns:
+        Liste de {'date': 'YYYY-MM-DD', 'prediction': float >= 0}, dates futures croissantes
+    """
+    series = {name: list(history[name]) for name in HISTORY_COLUMNS if name in history}
+    cases = series.setdefault("new_cases", [])
+    last_date = _to_date(history["date"])
+
+    def lagged(name: str, days: int) -> float:
+        values = series.get(name, ())
+        return float(values[-days]) if len(values) >= days else 0.0
+
+    predictions = []
+    for step in range(1, horizon + 1):
+        current = last_date + timedelta(days=step)
+        angle = 2 * np.pi * current.timetuple().tm_yday / 365
+        features = {
+            "cases_lag_1": lagged("new_cases", 1),
+            "cases_lag_3": lagged("new_cases", 3),
+            "cases_lag_7": lagged("new_cases", 7),
+            "cases_lag_14": lagged("new_cases", 14),
+            "deaths_lag_1": lagged("new_deaths", 1),
+            "deaths_lag_7": lagged("new_deaths", 7),
+            "vaccinations_lag_7": lagged("new_vaccinations", 7),
+            "stringency_lag_1": lagged("stringency_index", 1),
+            "seasonal_sin": float(np.sin(angle)),
+            "seasonal_cos": float(np.cos(angle)),
+        }
+        row = np.array([[features[name] for name in feature_cols]], dtype=float)
+        value = max(0.0, float(predict(row)[0]))
+        predictions.append({"date": current.strftime("%Y-%m-%d"), "prediction": value})
+
+        # La prédiction devient l'observation du jour ; les séries exogènes sont prolongées
+        cases.append(value)
+        for name, values in series.items():
+            if name != "new_cases" and values:
+                values.append(values[-1])
+    return predictions
+
@@ -0,0 +1,94 @@
+"""
+Configuration Gunicorn de production : gunicorn -c gunicorn.conf.py wsgi:app
+
+Chaque worker possède sa propre JVM (`_SPARK_SESSION` est un singleton par
+processus) : l'application n'est jamais préchargée dans le maître, car la
+passerelle py4j ne survit pas à un fork. Les requêtes concurrentes d'un même
+worker sont servies par des threads (gthread) qui partagent la session Spark.
+
+Avec plusieurs workers, les caches disque (Parquet, features, modèle de
+référence) sont préparés une seule fois avant le fork dans un processus
+séparé ; le warmup de chaque worker ne fait ensuite que démarrer sa JVM et
+recharger ces caches.
+
+Variables d'environnement :
+    PORT               port d'écoute (défaut 8080)
+    SEN_WEB_WORKERS    nombre de processus (défaut 1 : une JVM par worker)
+    SEN_WEB_THREADS    threads par worker (défaut 4)
+    SEN_WEB_TIMEOUT    timeout des requêtes en secondes (défaut 120)
+    SEN_PRECOMPUTE_AT  HH:MM : le maître lance un unique planificateur des
+                       prévisions pré-calculées (forecast_store.py schedule)
+
+Le profil Spark de chaque worker (spark_profiles.py) est calculé sur sa part
+du budget mémoire du conteneur.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("SEN_WEB_WORKERS", "1"))
+threads = int(os.environ.get("SEN_WEB_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.environ.get("SEN_WEB_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Jamais de JVM dans le maître : chaque worker importe l'application après le fork
+preload_app = False
+
+_ENGINE = os.environ.get("SEN_PREDICTION_ENGINE", "spark").lower()
+
+# Le budget mémoire détecté est partagé entre les JVM des workers (profil Spark de chacun)
+if workers > 1 and _ENGINE == "spark" and not os.environ.get("SEN_SPARK_MEMORY_MB"):
+    from spark_profiles import detect_memory_mb
+    os.environ["SEN_SPARK_MEMORY_MB"] = str(detect_memory_mb() // workers)
+
+
+def on_starting(server):
+    """Prépare les caches disque une seule fois avant de lancer plusieurs workers Spark."""
+    if workers > 1 and _ENGINE == "spark":
+        logging.warning(f"[Gunicorn] {workers} workers : une JVM Spark par worker, surveiller la mémoire")
+    if workers <= 1 or os.environ.get("SEN_WARMUP", "background").lower() == "off":
+        return
+    server.log.info("[Warmup] Préparation des caches avant le fork...")
+    try:
+        result = subprocess.run([sys.executable, "-c", "import app; app.run_warmup()"],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=timeout * 5)
+        returncode = result.returncode
+    except (subprocess.TimeoutExpired, OSError) as e:
+        server.log.warning(f"[Warmup] Préparation des caches interrompue : {e}")
+        returncode = None
+    if returncode != 0:
+        server.log.warning("[Warmup] Échec de la préparation des caches ; chaque worker fera son warmup complet")
+
+
+_SCHEDULER = None
+
+
+def when_ready(server):
+    """Démarre le planificateur des prévisions dans un processus à part (jamais dans les workers)."""
+    global _SCHEDULER
+    if not os.environ.get("SEN_PRECOMPUTE_AT") or (_SCHEDULER is not None and _SCHEDULER.poll() is None):
+        return
+    try:
+        _SCHEDULER = subprocess.Popen([sys.executable, "forecast_store.py", "schedule"],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)))
+        server.log.info(f"[Precompute] Planificateur démarré (pid {_SCHEDULER.pid})")
+    except OSError as e:
+        server.log.warning(f"[Precompute] Planificateur non démarré : {e}")
+
+
+def on_exit(server):
+    if _SCHEDULER is not None and _SCHEDULER.poll() is None:
+        _SCHEDULER.terminate()
+        try:
+            _SCHEDULER.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _SCHEDULER.kill()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"[Gunicorn] Worker {worker.pid} prêt ({threads} threads), warmup en arrière-plan")
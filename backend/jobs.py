@@ -0,0 +1,191 @@
+"""
+Exécution asynchrone des prédictions.
+
+`POST /jobs` enregistre un job et rend la main immédiatement ; un pool de
+threads borné exécute ensuite `predict_cases` ou
+`predict_all_configured_countries`. Les workers Flask ne restent donc plus
+bloqués pendant l'entraînement Spark. Deux requêtes identiques encore en
+cours partagent le même job (et donc le même calcul).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+JOB_WORKERS = int(os.environ.get("SEN_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("SEN_JOB_QUEUE_SIZE", "16"))
+JOB_RETENTION_SECONDS = float(os.environ.get("SEN_JOB_RETENTION", "3600"))
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class JobQueueFull(RuntimeError):
+    """Levée quand la file des jobs en attente est pleine."""
+
+
+class Job:
+    """État d'un job ; les changements sont notifiés via `changed`."""
+
+    def __init__(self, kind: str, params: Dict, dedup_key: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.dedup_key = dedup_key
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.version = 0
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def _set(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self.changed.notify_all()
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        data = {
+            "job_id": self.id,
+            "type": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.finished_at is not None and self.started_at is not None:
+            data["duration_seconds"] = round(self.finished_at - self.started_at, 3)
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Pool de threads borné avec déduplication des jobs identiques en cours."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE,
+                 retention: float = JOB_RETENTION_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(1, queue_size)
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sen-job")
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def _prune(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    def submit(self, kind: str, params: Dict, fn: Callable[[], Dict]) -> Tuple[Job, bool]:
+        """Enregistre un job (ou réutilise le job identique en cours).
+
+        Returns:
+            (job, deduplicated)
+
+        Raises:
+            JobQueueFull: si trop de jobs attendent déjà un worker
+        """
+        dedup_key = json.dumps([kind, params], sort_keys=True, default=str)
+        with self._lock:
+            self._prune()
+            existing_id = self._in_flight.get(dedup_key)
+            if existing_id is not None:
+                self.deduplicated += 1
+                return self._jobs[existing_id], True
+            if self._pending() >= self.queue_size:
+                self.rejected += 1
+                raise JobQueueFull(f"File des jobs pleine ({self.queue_size} en attente)")
+            job = Job(kind, params, dedup_key)
+            self._jobs[job.id] = job
+            self._in_flight[dedup_key] = job.id
+
+        self._executor.submit(self._run, job, fn)
+        logging.info(f"[Jobs] Queued {kind} job {job.id}")
+        return job, False
+
+    def _run(self, job: Job, fn: Callable[[], Dict]):
+        job._set(status="running", started_at=time.time())
+        try:
+            result = fn()
+            job._set(status="succeeded", result=result, finished_at=time.time())
+            logging.info(f"[Jobs] Job {job.id} succeeded in {job.finished_at - job.started_at:.2f}s")
+        except Exception as e:
+            job._set(status="failed", error=str(e), finished_at=time.time())
+            logging.error(f"[Jobs] Job {job.id} failed: {e}")
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.dedup_key) == job.id:
+                    del self._in_flight[job.dedup_key]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def events(self, job: Job, heartbeat: float = 15.0) -> Iterator[str]:
+        """Flux Server-Sent Events : un événement par changement d'état, jusqu'à la fin du job."""
+        seen = -1
+        while True:
+            with job.changed:
+                if job.version == seen:
+                    job.changed.wait(timeout=heartbeat)
+                if job.version == seen:
+                    payload = None
+                else:
+                    seen = job.version
+                    payload = job.to_dict(include_result=job.done)
+            if payload is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {payload['status']}\ndata: {json.dumps(payload, default=str)}\n\n"
+            if payload["status"] in ("succeeded", "failed"):
+                return
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                "workers": self.max_workers,
+                "queue_size": self.queue_size,
+                "jobs": counts,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+            }
+
+
+_JOB_MANAGER: Optional[JobManager] = None
+_JOB_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _JOB_MANAGER
+    if _JOB_MANAGER is None:
+        with _JOB_MANAGER_LOCK:
+            if _JOB_MANAGER is None:
+                _JOB_MANAGER = JobManager()
+    return _JOB_MANAGER
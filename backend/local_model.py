@@ -0,0 +1,324 @@
+"""
+Moteur de prédiction en mémoire (NumPy/pandas), sans Spark.
+
+Pour un seul pays, la série ne fait que quelques milliers de lignes : une JVM
+et un driver de 400MB sont inutiles. Ce moteur reproduit le pipeline de
+`spark_model.predict_cases` (niveaux de nettoyage, variables de décalage,
+StandardScaler, modèles linéaire / forêt aléatoire / gradient boosting) et
+retourne le même schéma de réponse.
+
+Activation : SEN_PREDICTION_ENGINE=local. Il sert aussi de repli lorsque la
+session Spark ne peut pas être créée. Les modèles à base d'arbres utilisent
+scikit-learn ; le modèle linéaire ne dépend que de NumPy.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_frame
+from countries import COUNTRY_CONFIGS, validate_country_data
+from evaluation import evaluate_recursive, regression_metrics
+from forecasting import MAX_LAG, history_from_rows, recursive_forecast
+from metrics import PREDICTIONS, StageTimer
+from model_registry import MODEL_CACHE_SIZE
+from sources import NUMERIC_COLUMNS, OWID_COLUMNS, REQUIRED_COLUMNS, dataset_fingerprint, resolve_data_path
+from tuning import params_hash, resolve_params, tuned_params
+
+_DATA_LOCK = threading.Lock()
+# chemin du CSV -> (empreinte, {pays: DataFrame trié par date})
+_DATASETS: Dict[str, Tuple[str, Dict[str, pd.DataFrame]]] = {}
+
+_MODELS_LOCK = threading.Lock()
+_MODELS: "OrderedDict[Tuple[str, str, str, str], Dict]" = OrderedDict()
+
+
+def load_local_dataset(data_path: str) -> Dict[str, pd.DataFrame]:
+    """Charge le CSV OWID (colonnes utiles uniquement) et le découpe par pays.
+
+    Le résultat est gardé en mémoire tant que le fichier ne change pas.
+    """
+    source = resolve_data_path(data_path)
+    fingerprint = dataset_fingerprint(source)
+    cached = _DATASETS.get(source)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    with _DATA_LOCK:
+        cached = _DATASETS.get(source)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        header = pd.read_csv(source, nrows=0).columns
+        missing = [name for name in REQUIRED_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"Colonnes obligatoires absentes de {source}: {missing}")
+        usecols = [name for name, _ in OWID_COLUMNS if name in header]
+        numeric = [name for name in NUMERIC_COLUMNS if name in header]
+
+        df = pd.read_csv(source, usecols=usecols,
+                         dtype={name: "string" for name in usecols if name not in numeric and name != "date"})
+        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+        for name in numeric:
+            df[name] = pd.to_numeric(df[name], errors="coerce")
+        df = df.dropna(subset=["location", "date"])
+
+        frames = {
+            str(location): group.sort_values("date").reset_index(drop=True)
+            for location, group in df.groupby("location", sort=False)
+        }
+        _DATASETS[source] = (fingerprint, frames)
+        logging.info(f"[Local] Loaded {len(df)} rows for {len(frames)} countries from {source}")
+        return frames
+
+
+def get_available_countries_local(data_path: str) -> List[str]:
+    return sorted(load_local_dataset(data_path))
+
+
+def clean_country_frame(df: pd.DataFrame, cleaning_level: str) -> pd.DataFrame:
+    """Équivalent pandas de `cleaning.clean_spark` pour un pays (sans les statistiques)."""
+    return clean_frame(df, cleaning_level)[0]
+
+
+def build_lag_features(df: pd.DataFrame, country: str) -> Tuple[pd.DataFrame, List[str]]:
+    """Équivalent pandas de `create_country_specific_features` + `_build_lag_features`."""
+    config = COUNTRY_CONFIGS.get(country, COUNTRY_CONFIGS['France'])
+    df = df.copy()
+
+    feature_cols = ["cases_lag_1", "cases_lag_3", "cases_lag_7", "cases_lag_14",
+                    "deaths_lag_1", "deaths_lag_7"]
+    for lag_days in (1, 3, 7, 14):
+        df[f"cases_lag_{lag_days}"] = df["new_cases"].shift(lag_days)
+    for lag_days in (1, 7):
+        df[f"deaths_lag_{lag_days}"] = df["new_deaths"].shift(lag_days)
+
+    if "new_vaccinations" in df.columns:
+        df["vaccinations_lag_7"] = df["new_vaccinations"].shift(7)
+        feature_cols.append("vaccinations_lag_7")
+    if "stringency_index" in df.columns:
+        df["stringency_lag_1"] = df["stringency_index"].shift(1)
+        feature_cols.append("stringency_lag_1")
+
+    if config.get('seasonal_factor'):
+        angle = 2 * np.pi * df["date"].dt.dayofyear / 365
+        df["seasonal_sin"] = np.sin(angle)
+        df["seasonal_cos"] = np.cos(angle)
+        feature_cols.extend(["seasonal_sin", "seasonal_cos"])
+
+    df[feature_cols] = df[feature_cols].fillna(0.0)
+    return df, feature_cols
+
+
+def linear_sufficient_stats(X: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    """Statistiques suffisantes d'une régression linéaire ; elles s'additionnent entre lots."""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    return {
+        "n": np.asarray(float(len(y))),
+        "sum_x": X.sum(axis=0),
+        "sum_y": np.asarray(float(y.sum())),
+        "xtx": X.T @ X,
+        "xty": X.T @ y,
+        "sum_yy": np.asarray(float(y @ y)),
+    }
+
+
+class LinearModel:
+    """Régression ridge en forme fermée, alignée sur le solveur normal de Spark.
+
+    Comme `LinearRegression(regParam=...)` avec standardisation, la pénalité L2
+    s'applique dans l'espace des features et du label standardisés.
+    """
+
+    def __init__(self, reg_param: float = 0.01):
+        self.reg_param = reg_param
+        self.coef_ = None
+        self.intercept_ = 0.0
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "LinearModel":
+        return self.fit_stats(linear_sufficient_stats(X, y))
+
+    def fit_stats(self, stats: Dict[str, np.ndarray]) -> "LinearModel":
+        """Résout à partir des statistiques suffisantes (n, Σx, Σy, XᵀX, Xᵀy, Σy²)."""
+        n = float(stats["n"])
+        x_mean = np.asarray(stats["sum_x"]) / n
+        y_mean = float(stats["sum_y"]) / n
+        cov = np.asarray(stats["xtx"]) / n - np.outer(x_mean, x_mean)
+        x_std = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        y_std = float(np.sqrt(max(float(stats["sum_yy"]) / n - y_mean ** 2, 0.0)))
+        x_std_safe = np.where(x_std > 0, x_std, 1.0)
+        if y_std == 0:
+            self.coef_ = np.zeros(len(x_mean))
+            self.intercept_ = y_mean
+            return self
+        # Mêmes quantités que ZᵀZ/n et Zᵀz_y/n sur les données standardisées
+        gram = cov / np.outer(x_std_safe, x_std_safe) + (self.reg_param / y_std) * np.eye(len(x_mean))
+        cross = (np.asarray(stats["xty"]) / n - x_mean * y_mean) / (x_std_safe * y_std)
+        w = np.linalg.solve(gram, cross)
+        self.coef_ = np.where(x_std > 0, w * y_std / x_std_safe, 0.0)
+        self.intercept_ = float(y_mean - x_mean @ self.coef_)
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef_ + self.intercept_
+
+
+def _build_estimator(model_type: str, params: Optional[Dict] = None):
+    """Instancie l'estimateur équivalent au régresseur Spark ML (mêmes hyperparamètres que `_build_regressor`)."""
+    params = resolve_params(model_type, params)
+    if model_type == 'linear':
+        return LinearModel(reg_param=params['regParam'])
+    try:
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    except ImportError:
+        raise RuntimeError("scikit-learn est requis pour les modèles à base d'arbres du moteur local")
+    if model_type == 'random_forest':
+        # featureSubsetStrategy 'auto' de Spark = un tiers des features en régression
+        return RandomForestRegressor(n_estimators=params['numTrees'], max_depth=params['maxDepth'],
+                                     min_samples_leaf=params['minInstancesPerNode'], max_features=1 / 3,
+                                     random_state=42, n_jobs=1)
+    return GradientBoostingRegressor(n_estimators=params['maxIter'], max_depth=params['maxDepth'],
+                                     learning_rate=params['stepSize'], random_state=42)
+
+
+def _standardize(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Moyenne et écart-type (non biaisé, comme StandardScaler de Spark ML)."""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0, ddof=1) if len(X) > 1 else np.zeros(X.shape[1])
+    return mean, std
+
+
+def _scale(X: np.ndarray, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    # Spark renvoie 0 pour une feature de variance nulle
+    return np.where(std > 0, (X - mean) / np.where(std > 0, std, 1.0), 0.0)
+
+
+def _fit_local_model(df_lag: pd.DataFrame, feature_cols: List[str], model_type: str,
+                     timer: Optional[StageTimer] = None, params: Optional[Dict] = None) -> Dict:
+    timer = timer or StageTimer()
+    params = resolve_params(model_type, params)
+    X = df_lag[feature_cols].to_numpy(dtype=float)
+    y = df_lag["new_cases"].to_numpy(dtype=float)
+
+    # Même ordre que Spark : scaler ajusté sur toutes les lignes, puis split 80/20
+    mean, std = _standardize(X)
+    X_scaled = _scale(X, mean, std)
+    train_size = int(len(y) * 0.8)
+    timer.lap("scaling")
+
+    estimator = _build_estimator(model_type, params)
+    estimator.fit(X_scaled[:train_size], y[:train_size])
+    timer.lap("fit")
+    metrics = regression_metrics(y[train_size:], estimator.predict(X_scaled[train_size:]))
+    horizon = evaluate_recursive(
+        history_from_rows(df_lag.iloc[:train_size].tail(MAX_LAG).to_dict("records")),
+        y[train_size:], feature_cols,
+        lambda X_step: estimator.predict(_scale(X_step, mean, std))
+    )
+    timer.lap("evaluation")
+
+    return {
+        "estimator": estimator,
+        "scaler": (mean, std),
+        "metadata": {
+            "feature_cols": feature_cols,
+            "params": params,
+            "training_samples": train_size,
+            "test_samples": len(y) - train_size,
+            "metrics": {name: metrics[name] for name in ("rmse", "mae", "r2", "mape", "bias")},
+            "horizon_metrics": horizon,
+        },
+    }
+
+
+def predict_cases_local(country: str, model_type: str = 'linear', horizon: int = 14,
+                        data_path: str = "owid-covid-data.csv",
+                        cleaning_level: str = 'standard', reuse_model: bool = True) -> Dict:
+    """Prédit les cas COVID-19 d'un pays sans Spark.
+
+    Mêmes paramètres et même schéma de réponse que `spark_model.predict_cases`.
+    """
+    timer = StageTimer()
+    frames = load_local_dataset(data_path)
+    if country not in frames:
+        raise ValueError(f"Pays '{country}' non trouvé. Pays disponibles: {sorted(frames)[:10]}...")
+
+    df_country = frames[country]
+    if not validate_country_data(None, country, row_count=len(df_country)):
+        raise ValueError(f"Données insuffisantes pour le pays '{country}'")
+
+    timer.lap("load")
+    df_clean, cleaning_stats = clean_frame(df_country, cleaning_level)
+    timer.lap("cleaning")
+    df_lag, feature_cols = build_lag_features(df_clean, country)
+    timer.lap("features")
+
+    count = len(df_lag)
+    min_rows = 30 if cleaning_level == 'strict' else 20
+    if count < min_rows:
+        raise ValueError(f"Insufficient data after preprocessing for {country} (rows={count})")
+
+    params = tuned_params(country, model_type, cleaning_level)
+    key = (country, model_type, cleaning_level, dataset_fingerprint(data_path), params_hash(params))
+    with _MODELS_LOCK:
+        entry = _MODELS.get(key) if reuse_model else None
+        if entry is not None:
+            _MODELS.move_to_end(key)
+    model_reused = entry is not None
+    timer.lap("registry")
+    if entry is None:
+        entry = _fit_local_model(df_lag, feature_cols, model_type, timer, params)
+        with _MODELS_LOCK:
+            _MODELS[key] = entry
+            while len(_MODELS) > MODEL_CACHE_SIZE:
+                _MODELS.popitem(last=False)
+
+    metadata = entry["metadata"]
+    mean, std = entry["scaler"]
+
+    # Prévision récursive à partir de la dernière observation (même moteur que Spark)
+    history = history_from_rows(df_lag.tail(MAX_LAG).to_dict("records"))
+    pred_list = recursive_forecast(
+        history, feature_cols,
+        lambda X: entry["estimator"].predict(_scale(X, mean, std)),
+        horizon
+    )
+    timer.lap("forecast")
+    PREDICTIONS.inc(engine="local", model=model_type, training="reused" if model_reused else "full")
+
+    raw_r2 = metadata["metrics"]["r2"]
+    r2_normalized = max(0.0, min(1.0, raw_r2)) if raw_r2 is not None else None
+
+    return {
+        "country": country,
+        "model_type": model_type,
+        "horizon_days": horizon,
+        "cleaning_level": cleaning_level,
+        "training_samples": metadata["training_samples"],
+        "test_samples": metadata["test_samples"],
+        "features_used": feature_cols,
+        "hyperparameters": metadata["params"],
+        "cleaning_stats": cleaning_stats,
+        "metrics": {
+            "rmse": metadata["metrics"]["rmse"],
+            "mae": metadata["metrics"]["mae"],
+            "r2_score": raw_r2,
+            "r2_score_normalized": r2_normalized,
+            "mape": metadata["metrics"]["mape"],
+            "bias": metadata["metrics"]["bias"]
+        },
+        "horizon_metrics": metadata["horizon_metrics"],
+        "country_config": COUNTRY_CONFIGS.get(country, "Default"),
+        "model_reused": model_reused,
+        # Pas de mise à jour incrémentale dans le moteur local : chaque modèle est un entraînement complet
+        "model_updated": False,
+        "updates_since_full": metadata.get("updates_since_full", 0),
+        "engine": "local",
+        "predictions": pred_list,
+        "timings": timer.report("local", model_type)
+    }
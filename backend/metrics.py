@@ -0,0 +1,268 @@
+"""
+Instrumentation des prédictions et export au format texte Prometheus.
+
+- `StageTimer` chronomètre les étapes de `predict_cases` (chargement,
+  features, normalisation, entraînement, évaluation, prévision) ; le détail
+  est renvoyé dans le champ `timings` de chaque réponse.
+- Les compteurs et histogrammes ci-dessous sont exposés par `/metrics`
+  (format d'exposition texte 0.0.4, sans dépendance à prometheus_client).
+- Les valeurs tenues ailleurs (caches, jobs, mémoire JVM et du driver) sont
+  relevées au moment du scrape par `collect_runtime_metrics`.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                                      10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçus {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for values, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def total(self) -> float:
+        """Somme sur toutes les combinaisons de labels."""
+        with self._lock:
+            return float(sum(self._values.values()))
+
+    def set_total(self, value: float, **labels):
+        """Recopie un compteur tenu par un autre composant (caches, registre)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(values, dict(state, counts=list(state["counts"]))) for values, state in self._values.items()]
+        for values, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(state['sum'])}"
+            yield f"{self.name}_count{labels} {state['count']}"
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exportées et des relevés effectués au scrape."""
+
+    def __init__(self):
+        self._metrics: "OrderedDict[str, _Metric]" = OrderedDict()
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logging.warning(f"[Metrics] Collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "sen_http_request_duration_seconds", "Durée des requêtes HTTP", ("endpoint", "method", "status")))
+PREDICTION_LATENCY = REGISTRY.register(Histogram(
+    "sen_prediction_duration_seconds", "Durée des prédictions par modèle et pays", ("model", "country", "cache")))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "sen_prediction_stage_seconds", "Durée des étapes de predict_cases", ("engine", "model", "stage")))
+PREDICTIONS = REGISTRY.register(Counter(
+    "sen_predictions_total", "Prédictions calculées (hors cache des réponses)", ("engine", "model", "training")))
+SPARK_JOBS = REGISTRY.register(Counter(
+    "sen_spark_jobs_total", "Jobs Spark lancés par les prédictions", ("model",)))
+SPARK_STAGES = REGISTRY.register(Counter(
+    "sen_spark_stages_total", "Stages Spark lancés par les prédictions", ("model",)))
+CACHE_HITS = REGISTRY.register(Counter("sen_cache_hits_total", "Succès des caches", ("cache",)))
+CACHE_MISSES = REGISTRY.register(Counter("sen_cache_misses_total", "Échecs des caches", ("cache",)))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge("sen_cache_hit_ratio", "Taux de succès des caches", ("cache",)))
+CACHE_ENTRIES = REGISTRY.register(Gauge("sen_cache_entries", "Entrées en mémoire des caches", ("cache",)))
+JOBS = REGISTRY.register(Gauge("sen_jobs", "Jobs asynchrones par statut", ("status",)))
+JVM_MEMORY = REGISTRY.register(Gauge("sen_jvm_memory_bytes", "Mémoire du tas de la JVM du driver Spark", ("area",)))
+PROCESS_MEMORY = REGISTRY.register(Gauge(
+    "sen_process_memory_bytes", "Mémoire du processus Python (driver)", ("kind",)))
+READY = REGISTRY.register(Gauge("sen_ready", "1 une fois le warmup du processus terminé"))
+
+
+class StageTimer:
+    """Chronomètre les étapes d'une prédiction (secondes, cumulées par étape).
+
+    `lap(name)` attribue à l'étape `name` le temps écoulé depuis l'étape précédente.
+    """
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.stages: "OrderedDict[str, float]" = OrderedDict()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def report(self, engine: str, model_type: str) -> Dict[str, float]:
+        """Exporte les étapes dans l'histogramme et retourne le champ `timings` de la réponse."""
+        total = time.perf_counter() - self.started
+        for name, seconds in self.stages.items():
+            STAGE_LATENCY.observe(seconds, engine=engine, model=model_type, stage=name)
+        STAGE_LATENCY.observe(total, engine=engine, model=model_type, stage="total")
+        timings = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        timings["total"] = round(total, 4)
+        return timings
+
+
+def _process_memory() -> Dict[str, float]:
+    memory = {}
+    try:
+        with open("/proc/self/statm", "r") as f:
+            memory["resident"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["peak_resident"] = peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        pass
+    return memory
+
+
+def collect_runtime_metrics():
+    """Relève les caches, les jobs et la mémoire (JVM seulement si Spark est déjà démarré)."""
+    from jobs import get_job_manager
+    from model_registry import get_model_registry
+    from response_cache import get_response_cache
+    import spark_model
+
+    for cache, stats in (("responses", get_response_cache().stats()), ("models", get_model_registry().stats())):
+        CACHE_HITS.set_total(stats["hits"], cache=cache)
+        CACHE_MISSES.set_total(stats["misses"], cache=cache)
+        lookups = stats["hits"] + stats["misses"]
+        CACHE_HIT_RATIO.set(stats["hits"] / lookups if lookups else 0.0, cache=cache)
+        CACHE_ENTRIES.set(stats.get("entries", stats.get("in_memory", 0)), cache=cache)
+
+    for status, count in get_job_manager().stats()["jobs"].items():
+        JOBS.set(count, status=status)
+
+    for kind, value in _process_memory().items():
+        PROCESS_MEMORY.set(value, kind=kind)
+
+    spark = spark_model._SPARK_SESSION  # ne pas démarrer de JVM pour un scrape
+    if spark is not None:
+        runtime = spark.sparkContext._jvm.java.lang.Runtime.getRuntime()
+        total, free = runtime.totalMemory(), runtime.freeMemory()
+        JVM_MEMORY.set(total - free, area="used")
+        JVM_MEMORY.set(total, area="committed")
+        JVM_MEMORY.set(runtime.maxMemory(), area="max")
+
+
+REGISTRY.add_collector(collect_runtime_metrics)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,246 @@
+"""
+Registre des modèles entraînés.
+
+Chaque pipeline ajusté (VectorAssembler + StandardScaler + régresseur) est
+identifié par la clé (pays, type de modèle, niveau de nettoyage, fichier
+source, empreinte du dataset, hash des hyperparamètres, version du
+nettoyage). Les pipelines sont
+sauvegardés sur disque avec le save/load de Spark ML et les plus utilisés
+sont gardés en mémoire (LRU), ce qui évite de ré-entraîner une forêt de 100
+arbres à chaque appel de `/predict`.
+
+La version compilée en NumPy (`forecaster.npz`) est sauvegardée à côté : elle
+suffit pour prévoir, évite de recharger le pipeline Spark, et représente aussi
+les modèles mis à jour de façon incrémentale (voir `model_updates`).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+from cleaning import CLEANING_VERSION
+from forecasting import CompiledPipeline
+from sources import CACHE_DIR
+
+if TYPE_CHECKING:
+    from pyspark.ml import PipelineModel
+
+ModelKey = Tuple[str, str, str, str, str, str, str]
+
+MODELS_DIR = os.path.join(CACHE_DIR, "models")
+MODEL_CACHE_SIZE = int(os.environ.get("SEN_MODEL_CACHE_SIZE", "8"))
+# Nombre fixe de verrous d'entraînement, répartis par hash de la clé
+KEY_LOCK_STRIPES = 64
+
+
+def make_model_key(country: str, model_type: str, cleaning_level: str, source: str, fingerprint: str,
+                   params_hash: str) -> ModelKey:
+    """`source` identifie le fichier de données (`sources.source_id`), `fingerprint` sa version.
+
+    La version de la logique de nettoyage est ajoutée : un modèle entraîné sur
+    des séries nettoyées autrement n'est jamais rechargé.
+    """
+    return (country, model_type, cleaning_level, source, fingerprint, params_hash, f"c{CLEANING_VERSION}")
+
+
+class ModelRegistry:
+    """Cache LRU en mémoire adossé à un stockage disque des pipelines Spark ML."""
+
+    def __init__(self, root_dir: str = MODELS_DIR, capacity: int = MODEL_CACHE_SIZE):
+        self.root_dir = root_dir
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[ModelKey, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_prefix(self, country: str, model_type: str, cleaning_level: str, source: str) -> str:
+        slug = "".join(c if c.isalnum() else "_" for c in country)
+        return f"{slug}-{model_type}-{cleaning_level}-{source}-"
+
+    def _entry_dir(self, key: ModelKey) -> str:
+        digest = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root_dir, self._entry_prefix(*key[:4]) + digest)
+
+    def lock_for(self, key: ModelKey) -> threading.Lock:
+        """Verrou de la clé : deux requêtes identiques n'entraînent qu'un seul modèle.
+
+        Les verrous sont en nombre fixe (une clé par empreinte du dataset ferait
+        grossir un dictionnaire sans fin) ; deux clés différentes peuvent
+        rarement partager le même.
+        """
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _remember(self, key: ModelKey, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                evicted, _ = self._entries.popitem(last=False)
+                logging.info(f"[Registry] Evicted {evicted[:3]} from memory")
+
+    def get(self, key: ModelKey) -> Optional[Dict]:
+        """Retourne {'model': PipelineModel ou None, 'metadata': dict, 'forecaster'} ou None.
+
+        Depuis le disque, le pipeline Spark n'est rechargé que si la version
+        compilée n'a pas été sauvegardée.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry_dir = self._entry_dir(key)
+        metadata_path = os.path.join(entry_dir, "metadata.json")
+        if os.path.exists(metadata_path):
+            try:
+                with open(metadata_path, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+                forecaster_path = os.path.join(entry_dir, "forecaster.npz")
+                if os.path.exists(forecaster_path):
+                    with np.load(forecaster_path, allow_pickle=False) as arrays:
+                        entry = {"model": None, "metadata": metadata,
+                                 "forecaster": CompiledPipeline.from_arrays(arrays)}
+                else:
+                    from pyspark.ml import PipelineModel
+
+                    model = PipelineModel.load(os.path.join(entry_dir, "pipeline"))
+                    entry = {"model": model, "metadata": metadata}
+                self._remember(key, entry)
+                with self._lock:
+                    self.hits += 1
+                logging.info(f"[Registry] Loaded {key[:3]} from disk")
+                return entry
+            except Exception as e:
+                logging.warning(f"[Registry] Failed to load {entry_dir}: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: ModelKey, model: Optional["PipelineModel"], metadata: Dict,
+            forecaster: Optional[CompiledPipeline] = None) -> Dict:
+        """Sauvegarde le pipeline (et/ou sa version compilée) sur disque et le garde en mémoire."""
+        metadata = dict(metadata, model_key=list(key), cleaning_version=CLEANING_VERSION)
+        entry = {"model": model, "metadata": metadata}
+        if forecaster is not None:
+            entry["forecaster"] = forecaster
+        self._remember(key, entry)
+
+        entry_dir = self._entry_dir(key)
+        staging = f"{entry_dir}.staging-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(staging, exist_ok=True)
+            if model is not None:
+                model.write().overwrite().save(os.path.join(staging, "pipeline"))
+            if forecaster is not None:
+                np.savez_compressed(os.path.join(staging, "forecaster.npz"), **forecaster.to_arrays())
+            with open(os.path.join(staging, "metadata.json"), "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=2, default=str)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+        except Exception as e:
+            # Le modèle reste utilisable en mémoire même si la persistance échoue
+            logging.warning(f"[Registry] Failed to persist {key[:3]}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return entry
+        self._prune_older(key, entry_dir, metadata.get("trained_at", ""))
+        return entry
+
+    def _prune_older(self, key: ModelKey, keep_dir: str, trained_at: str):
+        """Supprime du disque les modèles plus anciens de (pays, modèle, nettoyage, fichier).
+
+        Chaque nouvelle version des données ou des hyperparamètres crée un
+        répertoire : seuls ceux entraînés avant `trained_at` sont supprimés,
+        le plus récent (celui que retient `find_latest`) est donc conservé.
+        """
+        prefix = self._entry_prefix(*key[:4])
+        try:
+            names = [name for name in os.listdir(self.root_dir)
+                     if name.startswith(prefix) and ".staging-" not in name]
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.root_dir, name)
+            if path == keep_dir:
+                continue
+            try:
+                with open(os.path.join(path, "metadata.json"), "r", encoding="utf-8") as f:
+                    older = json.load(f).get("trained_at", "") < trained_at
+            except (OSError, ValueError):
+                older = True
+            if older:
+                shutil.rmtree(path, ignore_errors=True)
+                logging.info(f"[Registry] Pruned {name}")
+
+    def find_latest(self, country: str, model_type: str, cleaning_level: str,
+                    source: str) -> Optional[Tuple[ModelKey, Dict]]:
+        """Dernier modèle entraîné pour (pays, modèle, nettoyage) sur le même fichier source,
+        toutes versions de ce fichier confondues.
+
+        Les modèles entraînés avec une autre version du nettoyage (`cleaning_version`
+        absent : avant son introduction) ne servent pas de base aux mises à jour.
+        """
+        best_key, best_at = None, ""
+        with self._lock:
+            for key, entry in self._entries.items():
+                metadata = entry["metadata"]
+                trained_at = metadata.get("trained_at", "")
+                if (key[:4] == (country, model_type, cleaning_level, source) and trained_at >= best_at
+                        and metadata.get("cleaning_version") == CLEANING_VERSION):
+                    best_key, best_at = key, trained_at
+
+        prefix = self._entry_prefix(country, model_type, cleaning_level, source)
+        try:
+            names = [name for name in os.listdir(self.root_dir) if name.startswith(prefix) and ".staging-" not in name]
+        except OSError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(self.root_dir, name, "metadata.json"), "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            trained_at = metadata.get("trained_at", "")
+            if metadata.get("cleaning_version") != CLEANING_VERSION:
+                continue
+            if "model_key" in metadata and trained_at > best_at:
+                best_key, best_at = tuple(metadata["model_key"]), trained_at
+
+        if best_key is None:
+            return None
+        entry = self.get(best_key)
+        return (best_key, entry) if entry is not None else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_memory": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_REGISTRY: Optional[ModelRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = ModelRegistry()
+    return _REGISTRY
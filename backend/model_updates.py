@@ -0,0 +1,235 @@
+"""
+Mises à jour incrémentales des modèles quand de nouveaux jours arrivent.
+
+Après un refresh incrémental du dataset, un pays touché change d'empreinte et
+son modèle n'est plus trouvé dans le registre. Plutôt que de tout ré-entraîner
+(100 itérations / 100 arbres dans Spark), le dernier modèle du pays est mis à
+jour sur le driver :
+
+- linéaire : les statistiques suffisantes (n, Σx, Σy, XᵀX, Xᵀy, Σy²) des
+  nouvelles lignes d'entraînement sont ajoutées à celles du modèle, puis la
+  régression ridge est résolue en forme fermée (même solution que Spark) ;
+- forêt aléatoire : les `SEN_UPDATE_TREES` arbres les plus anciens (au plus
+  la moitié de la forêt) sont remplacés par des arbres entraînés sur la
+  fenêtre glissante récente ;
+- gradient boosting : des arbres ajustés sur les résidus de la fenêtre récente
+  sont ajoutés à l'ensemble.
+
+Le scaler et les hyperparamètres du modèle d'origine sont conservés. Un
+ré-entraînement complet est imposé par la politique `full_retrain_reason`
+(hyperparamètres réglés depuis, nombre de mises à jour, part de nouvelles
+lignes, âge du dernier entraînement complet) ou si l'erreur de test se dégrade.
+
+Ré-entraînement nocturne :
+    python model_updates.py --models linear,random_forest
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cleaning import CLEANING_LEVELS
+from evaluation import evaluate_recursive, regression_metrics
+from forecasting import (HISTORY_COLUMNS, MAX_LAG, CompiledPipeline, TreeEnsemble, compile_pipeline,
+                         history_from_rows, trees_from_sklearn)
+from local_model import LinearModel, linear_sufficient_stats
+from model_registry import ModelKey, ModelRegistry
+from tuning import resolve_params
+
+UPDATE_MAX_INCREMENTAL = int(os.environ.get("SEN_UPDATE_MAX_INCREMENTAL", "7"))
+UPDATE_MAX_NEW_FRACTION = float(os.environ.get("SEN_UPDATE_MAX_NEW_FRACTION", "0.1"))
+UPDATE_MAX_AGE_DAYS = float(os.environ.get("SEN_UPDATE_MAX_AGE_DAYS", "30"))
+UPDATE_WINDOW = int(os.environ.get("SEN_UPDATE_WINDOW", "180"))
+UPDATE_TREES = int(os.environ.get("SEN_UPDATE_TREES", "20"))
+UPDATE_MAX_DEGRADATION = float(os.environ.get("SEN_UPDATE_MAX_DEGRADATION", "1.5"))
+
+
+def full_retrain_reason(metadata: Dict, total_rows: int, feature_cols: List[str],
+                        model_type: str, now: Optional[datetime] = None,
+                        params: Optional[Dict] = None) -> Optional[str]:
+    """Raison d'imposer un ré-entraînement complet, ou None si une mise à jour suffit."""
+    now = now or datetime.now()
+    if metadata.get("feature_cols") != list(feature_cols):
+        return "features différentes"
+    # Les modèles enregistrés avant le tuning ont les hyperparamètres par défaut
+    if resolve_params(model_type, metadata.get("params")) != resolve_params(model_type, params):
+        return "hyperparamètres différents"
+    if "rows" not in metadata or "full_trained_at" not in metadata:
+        return "modèle sans historique d'entraînement"
+    if model_type == 'linear' and "linear_stats" not in metadata:
+        return "statistiques suffisantes absentes"
+    new_rows = total_rows - metadata["rows"]
+    if new_rows <= 0:
+        return "aucune nouvelle ligne"
+    if metadata.get("updates_since_full", 0) >= UPDATE_MAX_INCREMENTAL:
+        return f"{UPDATE_MAX_INCREMENTAL} mises à jour depuis le dernier entraînement complet"
+    if new_rows > UPDATE_MAX_NEW_FRACTION * metadata["rows"]:
+        return f"{new_rows} nouvelles lignes (> {UPDATE_MAX_NEW_FRACTION:.0%})"
+    age = now - datetime.fromisoformat(metadata["full_trained_at"])
+    if age.total_seconds() > UPDATE_MAX_AGE_DAYS * 86400:
+        return f"dernier entraînement complet il y a {age.days} jours"
+    return None
+
+
+def _stats_from_metadata(stats: Dict) -> Dict[str, np.ndarray]:
+    return {name: np.asarray(value, dtype=float) for name, value in stats.items()}
+
+
+def stats_to_metadata(stats: Dict[str, np.ndarray]) -> Dict:
+    return {name: np.asarray(value).tolist() for name, value in stats.items()}
+
+
+def _update_regressor(forecaster: CompiledPipeline, metadata: Dict, model_type: str,
+                      Z_new: np.ndarray, y_new: np.ndarray,
+                      Z_window: np.ndarray, y_window: np.ndarray) -> Tuple[CompiledPipeline, Dict]:
+    """Retourne (pipeline mis à jour, champs de métadonnées spécifiques au modèle)."""
+    params = resolve_params(model_type, metadata.get("params"))
+    if model_type == 'linear':
+        stats = _stats_from_metadata(metadata["linear_stats"])
+        delta = linear_sufficient_stats(Z_new, y_new)
+        stats = {name: stats[name] + delta[name] for name in stats}
+        linear = LinearModel(reg_param=params['regParam']).fit_stats(stats)
+        updated = CompiledPipeline(forecaster.feature_cols, forecaster.mean, forecaster.std,
+                                   coefficients=linear.coef_, intercept=linear.intercept_)
+        return updated, {"linear_stats": stats_to_metadata(stats)}
+
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+    old = forecaster.ensemble
+    # Graine fixe (celle de l'entraînement complet) décalée à chaque mise à jour : résultats reproductibles
+    seed = 42 + metadata.get("updates_since_full", 0)
+    if model_type == 'random_forest':
+        # Les arbres les plus anciens sont remplacés : la forêt garde sa taille et au moins
+        # la moitié de ses arbres entraînés sur tout l'historique
+        replaced = max(1, min(UPDATE_TREES, len(old.trees) // 2))
+        forest = RandomForestRegressor(n_estimators=replaced, max_depth=params['maxDepth'],
+                                       min_samples_leaf=params['minInstancesPerNode'], max_features=1 / 3,
+                                       random_state=seed, n_jobs=1)
+        forest.fit(Z_window, y_window)
+        trees = old.trees[replaced:] + trees_from_sklearn(forest.estimators_)
+        ensemble = TreeEnsemble(trees, np.full(len(trees), 1.0 / len(trees)))
+    elif model_type == 'gradient_boost':
+        # Nouveaux arbres ajustés sur les résidus récents de l'ensemble existant
+        residuals = y_window - old.predict(Z_window)
+        booster = GradientBoostingRegressor(n_estimators=UPDATE_TREES, max_depth=params['maxDepth'],
+                                            learning_rate=params['stepSize'], init='zero', random_state=seed)
+        booster.fit(Z_window, residuals)
+        trees = old.trees + trees_from_sklearn(booster.estimators_[:, 0])
+        weights = np.concatenate([old.weights, np.full(len(booster.estimators_), booster.learning_rate)])
+        ensemble = TreeEnsemble(trees, weights)
+    else:
+        raise ValueError(f"Model type '{model_type}' not supported.")
+    return CompiledPipeline(forecaster.feature_cols, forecaster.mean, forecaster.std, ensemble=ensemble), {}
+
+
+def update_model(entry: Dict, frame: pd.DataFrame, feature_cols: List[str],
+                 model_type: str) -> Optional[Tuple[CompiledPipeline, Dict]]:
+    """Met à jour le modèle de `entry` avec les lignes de `frame` (toutes les lignes du pays, triées).
+
+    Returns:
+        (pipeline compilé, métadonnées) ou None si l'erreur de test se dégrade trop
+    """
+    metadata = entry["metadata"]
+    forecaster = entry.get("forecaster") or compile_pipeline(entry["model"])
+
+    X = frame[feature_cols].to_numpy(dtype=float)
+    y = frame["new_cases"].to_numpy(dtype=float)
+    total = len(y)
+    train_size = int(total * 0.8)
+    old_train = min(metadata["training_samples"], train_size)
+
+    Z = forecaster.scale(X)
+    window_start = max(0, train_size - UPDATE_WINDOW)
+    updated, extra = _update_regressor(forecaster, metadata, model_type,
+                                       Z[old_train:train_size], y[old_train:train_size],
+                                       Z[window_start:train_size], y[window_start:train_size])
+
+    metrics = regression_metrics(y[train_size:], updated.predict_scaled(Z[train_size:]))
+    old_rmse = metadata["metrics"].get("rmse")
+    if old_rmse and metrics["rmse"] is not None and metrics["rmse"] > UPDATE_MAX_DEGRADATION * old_rmse:
+        logging.warning(f"[Update] RMSE {metrics['rmse']:.2f} vs {old_rmse:.2f} : ré-entraînement complet")
+        return None
+
+    history = history_from_rows(frame.iloc[max(0, train_size - MAX_LAG):train_size].to_dict("records"))
+    horizon = evaluate_recursive(history, y[train_size:], feature_cols, updated.predict)
+
+    new_metadata = dict(
+        metadata,
+        training_samples=train_size,
+        test_samples=total - train_size,
+        metrics={name: metrics[name] for name in ("rmse", "mae", "r2", "mape", "bias")},
+        horizon_metrics=horizon,
+        rows=total,
+        trained_at=datetime.now().isoformat(timespec="seconds"),
+        updates_since_full=metadata.get("updates_since_full", 0) + 1,
+        update_mode="incremental",
+        **extra,
+    )
+    return updated, new_metadata
+
+
+def try_incremental_update(registry: ModelRegistry, key: ModelKey, df_lag, feature_cols: List[str],
+                           model_type: str, total: int, params: Optional[Dict] = None) -> Optional[Dict]:
+    """Met à jour le dernier modèle du pays si la politique le permet ; retourne l'entrée du registre.
+
+    `df_lag` est le frame Spark (persisté) des features du pays ; il n'est
+    collecté que si une mise à jour est possible.
+    """
+    country, _, cleaning_level, source = key[:4]
+    latest = registry.find_latest(country, model_type, cleaning_level, source)
+    if latest is None:
+        return None
+    previous_key, entry = latest
+    reason = full_retrain_reason(entry["metadata"], total, feature_cols, model_type, params=params)
+    if reason is not None:
+        logging.info(f"[Update] Full retrain for {country}/{model_type}: {reason}")
+        return None
+
+    started = time.time()
+    columns = ["date"] + [name for name in HISTORY_COLUMNS if name in df_lag.columns]
+    columns += [name for name in feature_cols if name not in columns]
+    frame = pd.DataFrame.from_records([row.asDict() for row in df_lag.select(*columns).collect()],
+                                      columns=columns).sort_values("date").reset_index(drop=True)
+    try:
+        result = update_model(entry, frame, feature_cols, model_type)
+    except Exception as e:
+        logging.warning(f"[Update] Incremental update failed for {country}/{model_type}: {e}")
+        return None
+    if result is None:
+        return None
+
+    forecaster, metadata = result
+    logging.info(f"[Update] {country}/{model_type} updated incrementally in {time.time() - started:.2f}s "
+                 f"({total - entry['metadata']['rows']} new rows)")
+    return registry.put(key, None, metadata, forecaster)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ré-entraînement (incrémental si possible) des pays configurés")
+    parser.add_argument("--countries", help="Pays séparés par des virgules (défaut: pays configurés)")
+    parser.add_argument("--models", default="linear", help="Modèles séparés par des virgules")
+    parser.add_argument("--data", default="owid-covid-data.csv", help="Chemin du CSV OWID")
+    parser.add_argument("--cleaning-level", default="standard", choices=CLEANING_LEVELS)
+    parser.add_argument("--full", action="store_true", help="Forcer un ré-entraînement complet")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from spark_model import get_configured_countries, predict_cases
+
+    countries = args.countries.split(",") if args.countries else get_configured_countries()
+    begin = time.time()
+    for name in countries:
+        for model in args.models.split(","):
+            t0 = time.time()
+            res = predict_cases(name, model, horizon=1, data_path=args.data,
+                                cleaning_level=args.cleaning_level, reuse_model=not args.full)
+            mode = "reused" if res.get("model_reused") else ("incremental" if res.get("model_updated") else "full")
+            print(f"{name:<16} {model:<16} {mode:<12} {time.time() - t0:6.1f}s  RMSE={res['metrics']['rmse']}")
+    print(f"Total: {time.time() - begin:.1f}s")
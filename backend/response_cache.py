@@ -0,0 +1,180 @@
+"""
+Cache des réponses de `/predict`.
+
+Le tableau de bord relance sans cesse les mêmes requêtes alors que les
+données ne changent qu'à chaque publication OWID. Les résultats de
+`predict_cases` sont donc gardés en mémoire (LRU + TTL), avec un stockage
+disque optionnel partagé entre les workers. La clé contient l'empreinte du
+dataset (par pays quand le cache Parquet est à jour) : une nouvelle version
+des données invalide automatiquement les réponses précédentes, et un refresh
+incrémental n'invalide que les pays ayant reçu de nouvelles lignes. La
+version du modèle servi (hash des hyperparamètres réglés par `tuning.py` et
+`CLEANING_VERSION`) en fait aussi partie : une nouvelle recherche
+d'hyperparamètres invalide les réponses du pays.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from cleaning import CLEANING_VERSION
+from data_store import CACHE_DIR, dataset_fingerprint, peek_country_fingerprint
+from tuning import params_hash, tuned_params
+
+# (pays, modèle, horizon, nettoyage, fichier, empreinte des données, version du modèle)
+ResponseKey = Tuple[str, str, int, str, str, str, str]
+
+RESPONSES_DIR = os.path.join(CACHE_DIR, "responses")
+RESPONSE_CACHE_SIZE = int(os.environ.get("SEN_RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.environ.get("SEN_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_DISK = os.environ.get("SEN_RESPONSE_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+
+
+def make_response_key(country: str, model_type: str, horizon: int, cleaning_level: str,
+                      data_path: str) -> Optional[ResponseKey]:
+    """Clé (paramètres + empreinte du dataset + version du modèle), ou None si le fichier est introuvable."""
+    try:
+        fingerprint = peek_country_fingerprint(data_path, country) or dataset_fingerprint(data_path)
+        # Mêmes hyperparamètres que `predict_cases`
+        params = tuned_params(country, model_type, cleaning_level)
+    except (OSError, ValueError):
+        return None
+    return (country, model_type, int(horizon), cleaning_level, os.path.abspath(data_path), fingerprint,
+            f"{params_hash(params)}-c{CLEANING_VERSION}")
+
+
+class ResponseCache:
+    """Cache LRU avec expiration, éventuellement adossé à des fichiers JSON."""
+
+    def __init__(self, capacity: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 root_dir: Optional[str] = RESPONSES_DIR if RESPONSE_CACHE_DISK else None):
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.root_dir = root_dir
+        self._entries: "OrderedDict[ResponseKey, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _entry_path(self, key: ResponseKey) -> str:
+        digest = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.root_dir, f"{digest}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def _remember(self, key: ResponseKey, stored_at: float, payload: Dict):
+        with self._lock:
+            # Une nouvelle empreinte pour le même pays et le même fichier rend les anciennes réponses
+            # obsolètes, comme une nouvelle version du même modèle (hyperparamètres réglés, nettoyage)
+            stale = [k for k in self._entries if k[0] == key[0] and k[4] == key[4] and (
+                k[5] != key[5] or (k[1] == key[1] and k[3] == key[3] and k[6] != key[6]))]
+            for old in stale:
+                del self._entries[old]
+            self.invalidations += len(stale)
+            self._entries[key] = (stored_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key: ResponseKey) -> Optional[Tuple[float, Dict]]:
+        if self.root_dir is None:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(stored["stored_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored["stored_at"], stored["payload"]
+
+    def _write_disk(self, key: ResponseKey, stored_at: float, payload: Dict):
+        if self.root_dir is None:
+            return
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(self.root_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "key": list(key), "payload": payload}, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"[Cache] Failed to persist response: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get(self, key: ResponseKey) -> Optional[Dict]:
+        """Retourne une copie de la réponse en cache, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, *entry)
+            with self._lock:
+                self.hits += 1
+            return copy.deepcopy(entry[1])
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: ResponseKey, payload: Dict):
+        stored_at = time.time()
+        payload = copy.deepcopy(payload)
+        self._remember(key, stored_at, payload)
+        self._write_disk(key, stored_at, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl,
+                "disk": self.root_dir is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        with _RESPONSE_CACHE_LOCK:
+            if _RESPONSE_CACHE is None:
+                _RESPONSE_CACHE = ResponseCache()
+    return _RESPONSE_CACHE
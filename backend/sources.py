@@ -0,0 +1,65 @@
+"""
+Fichiers de données OWID : chemin, empreinte et colonnes utilisées.
+
+Module sans dépendance à Spark, partagé par la couche d'ingestion
+(`data_store`, qui en dérive le schéma Spark) et par le moteur local, qui doit
+pouvoir tourner sans pyspark installé.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Dict
+
+SAMPLE_DATA_PATH = "owid-covid-data-sample.csv"
+
+# Répertoire racine des artefacts dérivés (Parquet, manifestes...)
+CACHE_DIR = os.environ.get("SEN_CACHE_DIR", ".sen_cache")
+
+# Colonnes OWID utilisées par le pipeline, avec leur type ('string', 'date' ou 'double').
+# Les autres colonnes du CSV (67 au total) ne sont pas conservées.
+OWID_COLUMNS = (
+    ("iso_code", "string"),
+    ("continent", "string"),
+    ("location", "string"),
+    ("date", "date"),
+    ("total_cases", "double"),
+    ("new_cases", "double"),
+    ("total_deaths", "double"),
+    ("new_deaths", "double"),
+    ("new_vaccinations", "double"),
+    ("stringency_index", "double"),
+    ("population", "double"),
+)
+NUMERIC_COLUMNS = tuple(name for name, kind in OWID_COLUMNS if kind == "double")
+
+REQUIRED_COLUMNS = ("location", "date", "new_cases")
+
+
+def resolve_data_path(data_path: str) -> str:
+    """Retourne le chemin du CSV à utiliser (échantillon si le fichier principal manque)."""
+    if os.path.exists(data_path):
+        return data_path
+    if data_path != SAMPLE_DATA_PATH and os.path.exists(SAMPLE_DATA_PATH):
+        logging.warning(f"Main data file {data_path} not found, using sample data")
+        return SAMPLE_DATA_PATH
+    raise FileNotFoundError(f"Fichier de données introuvable: {data_path}")
+
+
+def source_stat(data_path: str) -> Dict:
+    stat = os.stat(data_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def dataset_fingerprint(data_path: str) -> str:
+    """Empreinte courte d'une version du dataset (chemin absolu + taille + mtime)."""
+    source = os.path.abspath(resolve_data_path(data_path))
+    stat = source_stat(source)
+    raw = f"{source}:{stat['size']}:{stat['mtime_ns']}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def source_id(data_path: str) -> str:
+    """Identifiant court et stable du fichier source (chemin absolu), indépendant de sa version."""
+    source = os.path.abspath(resolve_data_path(data_path))
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
@@ -1,13 +1,32 @@
 from datetime import datetime, timedelta
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession, Window
-from pyspark.sql.functions import col, lag, row_number, when, isnan, isnull, mean as spark_mean
+from pyspark.sql.functions import col, count, floor, lag, lit, row_number
 from pyspark.ml.feature import VectorAssembler, StandardScaler
 from pyspark.ml.regression import LinearRegression, RandomForestRegressor, GBTRegressor
-from pyspark.ml.evaluation import RegressionEvaluator
+from pyspark.ml import PipelineModel
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import math
+import numpy as np
+import os
 import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from countries import COUNTRY_CONFIGS, validate_country_data
+from data_store import country_fingerprint, ensure_dataset, get_country_index, load_dataset
+from feature_store import country_feature_columns, ensure_features, get_cleaning_stats, load_features
+from evaluation import evaluate_recursive, regression_metrics
+from forecasting import (MAX_LAG, HISTORY_COLUMNS, CompiledPipeline, compile_pipeline,
+                         history_from_rows, recursive_forecast)
+from local_model import linear_sufficient_stats
+from metrics import PREDICTIONS, SPARK_JOBS, SPARK_STAGES, StageTimer
+from model_registry import get_model_registry, make_model_key
+from spark_profiles import resolve_spark_profile
+from model_updates import stats_to_metadata, try_incremental_update
+from sources import source_id
+from tuning import params_hash, resolve_params, tuned_params
 
 # ---------------------------------------------------------------------------
 # Spark Session Singleton
@@ -22,122 +41,112 @@ def get_spark(app_name: str = "SENPrediction") -> Optional[SparkSession]:
     with _SPARK_LOCK:
         if _SPARK_SESSION is None:
             try:
-                _SPARK_SESSION = (SparkSession.builder
-                                  .appName(app_name)
-                                  .config("spark.ui.showConsoleProgress", "false")
-                                  # Optimisations mémoire pour Fly.io (768MB total)
-                                  .config("spark.driver.memory", "400m")
-                                  .config("spark.executor.memory", "256m")
-                                  .config("spark.driver.maxResultSize", "100m")
-                                  .config("spark.sql.shuffle.partitions", "4")  # Réduit de 200 par défaut
-                                  .config("spark.default.parallelism", "2")
-                                  .config("spark.sql.autoBroadcastJoinThreshold", "10485760")  # 10MB
-                                  .config("spark.memory.fraction", "0.6")
-                                  .config("spark.memory.storageFraction", "0.5")
-                                  .getOrCreate())
-                logging.info("[Spark] Session created with optimized memory settings (768MB)")
+                # Profil choisi selon le budget mémoire/CPU (SEN_SPARK_PROFILE ou limites du conteneur)
+                profile, master, config, resources = resolve_spark_profile()
+                builder = (SparkSession.builder
+                           .appName(app_name)
+                           .master(master)
+                           .config("spark.ui.showConsoleProgress", "false")
+                           # Pools FAIR : plusieurs pays peuvent s'entraîner en parallèle
+                           .config("spark.scheduler.mode", "FAIR"))
+                for name, value in config.items():
+                    builder = builder.config(name, value)
+                _SPARK_SESSION = builder.getOrCreate()
+                logging.info(f"[Spark] Session created with profile '{profile}' ({master}, driver "
+                             f"{config['spark.driver.memory']}, {resources['memory_mb']}MB / "
+                             f"{resources['cores']} cores available)")
             except Exception as e:
                 logging.error(f"[Spark] Failed to create session: {e}")
                 logging.warning("[Spark] Running in fallback mode without Spark")
                 return None
     return _SPARK_SESSION
 
+# Moteur de prédiction : 'spark' (défaut) ou 'local' (NumPy/pandas, sans JVM)
+PREDICTION_ENGINE = os.environ.get("SEN_PREDICTION_ENGINE", "spark").lower()
+
+# Nombre maximal d'entraînements simultanés pour predict_all_configured_countries
+PREDICT_ALL_WORKERS = int(os.environ.get("SEN_PREDICT_ALL_WORKERS", "2"))
+
+def run_in_scheduler_pool(spark: Optional[SparkSession], pool: str, fn, *args, **kwargs):
+    """Exécute `fn` en rattachant les jobs Spark du thread courant au pool FAIR `pool`."""
+    if spark is None:
+        return fn(*args, **kwargs)
+    sc = spark.sparkContext
+    sc.setLocalProperty("spark.scheduler.pool", pool)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        sc.setLocalProperty("spark.scheduler.pool", None)
+
+# ---------------------------------------------------------------------------
+# Suivi des jobs Spark par requête (diagnostic)
+# ---------------------------------------------------------------------------
+SPARK_DEBUG = os.environ.get("SEN_SPARK_DEBUG", "0").lower() in ("1", "true", "yes")
+
+_JOB_GROUP_PROPERTIES = ("spark.jobGroup.id", "spark.job.description", "spark.job.interruptOnCancel")
+
+def begin_job_group(spark: Optional[SparkSession], label: str) -> Optional[Dict]:
+    """Rattache les jobs Spark du thread courant à un groupe dédié afin de pouvoir les compter."""
+    if spark is None:
+        return None
+    sc = spark.sparkContext
+    token = {
+        "group_id": f"{label}#{uuid.uuid4().hex[:8]}",
+        "previous": {key: sc.getLocalProperty(key) for key in _JOB_GROUP_PROPERTIES},
+    }
+    sc.setJobGroup(token["group_id"], label)
+    return token
+
+def spark_job_stats(spark: Optional[SparkSession], token: Optional[Dict]) -> Dict:
+    """Retourne le nombre de jobs et de stages lancés dans le groupe depuis `begin_job_group`."""
+    if spark is None or token is None:
+        return {"jobs": 0, "stages": 0}
+    tracker = spark.sparkContext.statusTracker()
+    job_ids = tracker.getJobIdsForGroup(token["group_id"])
+    stage_ids = set()
+    for job_id in job_ids:
+        info = tracker.getJobInfo(job_id)
+        if info is not None:
+            stage_ids.update(info.stageIds)
+    return {"jobs": len(job_ids), "stages": len(stage_ids)}
+
+def end_job_group(spark: Optional[SparkSession], token: Optional[Dict]):
+    """Restaure le groupe de jobs précédent du thread courant."""
+    if spark is None or token is None:
+        return
+    sc = spark.sparkContext
+    for key, value in token["previous"].items():
+        sc.setLocalProperty(key, value)
+
 def warmup_spark(data_path: str = "owid-covid-data-sample.csv"):
+    if PREDICTION_ENGINE == 'local':
+        # Pas de JVM en mode local : on précharge seulement le dataset
+        from local_model import load_local_dataset
+        try:
+            load_local_dataset(data_path)
+            logging.info("[Local] Warmup completed")
+        except Exception as e:
+            logging.warning(f"[Local] Warmup failed: {e}")
+        return
     try:
         spark = get_spark("SENPredictionWarmup")
-        spark.read.csv(data_path, header=True, inferSchema=True).select("location").limit(5).collect()
+        # Construit aussi le cache Parquet et les features du niveau par défaut si nécessaire
+        load_dataset(spark, data_path).select("location").limit(5).collect()
+        ensure_features(spark, data_path, 'standard')
         logging.info("[Spark] Warmup completed")
     except Exception as e:
         logging.warning(f"[Spark] Warmup failed: {e}")
 
-# Configuration pour pays spécifiques avec leurs caractéristiques
-COUNTRY_CONFIGS = {
-    # 5 Pays Africains
-    'Senegal': {
-        'continent': 'Africa',
-        'population_density_threshold': 83,  # habitants/km²
-        'gdp_per_capita_range': (1000, 2000),  # USD
-        'vaccination_lag': 30,  # jours de retard typique
-        'seasonal_factor': True,  # prendre en compte la saisonnalité
-        'recommended_model': 'random_forest'
-    },
-    'Nigeria': {
-        'continent': 'Africa',
-        'population_density_threshold': 226,
-        'gdp_per_capita_range': (2000, 3000),
-        'vaccination_lag': 45,
-        'seasonal_factor': True,
-        'recommended_model': 'random_forest'
-    },
-    'South Africa': {
-        'continent': 'Africa',
-        'population_density_threshold': 49,
-        'gdp_per_capita_range': (6000, 7000),
-        'vaccination_lag': 20,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    'Kenya': {
-        'continent': 'Africa',
-        'population_density_threshold': 94,
-        'gdp_per_capita_range': (1800, 2500),
-        'vaccination_lag': 35,
-        'seasonal_factor': True,
-        'recommended_model': 'random_forest'
-    },
-    'Morocco': {
-        'continent': 'Africa',
-        'population_density_threshold': 82,
-        'gdp_per_capita_range': (3000, 4000),
-        'vaccination_lag': 25,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    # 5 Autres Pays (Europe et Amérique du Nord)
-    'France': {
-        'continent': 'Europe',
-        'population_density_threshold': 119,
-        'gdp_per_capita_range': (35000, 45000),
-        'vaccination_lag': 7,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    'Germany': {
-        'continent': 'Europe',
-        'population_density_threshold': 240,
-        'gdp_per_capita_range': (45000, 55000),
-        'vaccination_lag': 5,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    'United Kingdom': {
-        'continent': 'Europe',
-        'population_density_threshold': 281,
-        'gdp_per_capita_range': (40000, 50000),
-        'vaccination_lag': 5,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    'United States': {
-        'continent': 'North America',
-        'population_density_threshold': 36,
-        'gdp_per_capita_range': (55000, 65000),
-        'vaccination_lag': 7,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    },
-    'Canada': {
-        'continent': 'North America',
-        'population_density_threshold': 4,
-        'gdp_per_capita_range': (45000, 55000),
-        'vaccination_lag': 10,
-        'seasonal_factor': True,
-        'recommended_model': 'gradient_boost'
-    }
-}
-
 def get_available_countries(data_path: str = "owid-covid-data.csv") -> List[str]:
     """Retourne la liste des pays disponibles dans le dataset."""
+    if PREDICTION_ENGINE == 'local':
+        from local_model import get_available_countries_local
+        try:
+            return get_available_countries_local(data_path)
+        except Exception as e:
+            logging.error(f"Failed to list countries: {e}")
+            return sorted(list(COUNTRY_CONFIGS.keys()))
+
     spark = get_spark("SENCountryList")
 
     # Si Spark n'est pas disponible, retourner la liste des pays configurés
@@ -146,28 +155,14 @@ def get_available_countries(data_path: str = "owid-covid-data.csv") -> List[str]
         return sorted(list(COUNTRY_CONFIGS.keys()))
 
     try:
-        try:
-            df = spark.read.csv(data_path, header=True, inferSchema=True)
-        except Exception:
-            logging.warning(f"Main data file {data_path} not found, using sample data")
-            df = spark.read.csv("owid-covid-data-sample.csv", header=True, inferSchema=True)
-        countries = [row["location"] for row in df.select("location").distinct().collect()]
-        return sorted(countries)
+        return sorted(get_country_index(spark, data_path))
     except Exception as e:
         logging.error(f"Failed to list countries: {e}")
         # En cas d'erreur, retourner au moins les pays configurés
         return sorted(list(COUNTRY_CONFIGS.keys()))
 
-def validate_country_data(df_country, country: str, min_rows: int = 10) -> bool:
-    """Valide si le pays a suffisamment de données pour l'entraînement."""
-    row_count = df_country.count()
-    if row_count < min_rows:
-        logging.warning(f"Pays {country}: seulement {row_count} lignes disponibles (minimum: {min_rows})")
-        return False
-    return True
-
 def _generate_fallback_prediction(country: str, model_type: str, horizon: int, cleaning_level: str) -> Dict:
-    """Génère des prédictions de fallback lorsque Spark n'est pas disponible."""
+    """Génère des prédictions simulées lorsqu'aucun moteur n'est disponible."""
     import random
     from datetime import datetime, timedelta
 
@@ -213,6 +208,16 @@ def _generate_fallback_prediction(country: str, model_type: str, horizon: int, c
         'fallback_mode': True
     }
 
+def add_seasonal_features(df):
+    """Ajoute seasonal_sin / seasonal_cos (jour de l'année) à toutes les lignes."""
+    from pyspark.sql.functions import dayofyear, sin, cos
+    from math import pi
+    return df.withColumn(
+        "seasonal_sin", sin(2 * lit(pi) * dayofyear(col("date")) / 365)
+    ).withColumn(
+        "seasonal_cos", cos(2 * lit(pi) * dayofyear(col("date")) / 365)
+    )
+
 def create_country_specific_features(df_country, country: str):
     """Crée des features spécifiques au pays selon sa configuration."""
     config = COUNTRY_CONFIGS.get(country, COUNTRY_CONFIGS['France'])  # Défaut
@@ -222,19 +227,224 @@ def create_country_specific_features(df_country, country: str):
     
     # Ajouter des features selon la configuration du pays
     if config.get('seasonal_factor'):
-        from pyspark.sql.functions import dayofyear, sin, cos, lit
-        from math import pi
-        df_features = df_features.withColumn(
-            "seasonal_sin", sin(2 * lit(pi) * dayofyear(col("date")) / 365)
-        ).withColumn(
-            "seasonal_cos", cos(2 * lit(pi) * dayofyear(col("date")) / 365)
-        )
+        df_features = add_seasonal_features(df_features)
     
     return df_features
 
+def _country_window():
+    """Fenêtre chronologique par pays : jamais de fenêtre globale sans partition."""
+    return Window.partitionBy("location").orderBy("date")
+
+def _build_lag_features(df_clean) -> Tuple:
+    """Ajoute les variables de décalage et retourne (DataFrame, colonnes de features).
+
+    Les décalages sont calculés par `location` et peuvent donc être produits
+    pour plusieurs pays en une seule passe distribuée.
+    """
+    window_spec = _country_window()
+
+    # Variables de décalage multiples pour capturer les tendances
+    df_lag = (
+        df_clean
+        .withColumn("cases_lag_1", lag("new_cases", 1).over(window_spec))
+        .withColumn("cases_lag_3", lag("new_cases", 3).over(window_spec))
+        .withColumn("cases_lag_7", lag("new_cases", 7).over(window_spec))
+        .withColumn("cases_lag_14", lag("new_cases", 14).over(window_spec))
+        .withColumn("deaths_lag_1", lag("new_deaths", 1).over(window_spec))
+        .withColumn("deaths_lag_7", lag("new_deaths", 7).over(window_spec))
+    )
+
+    # Ajouter features supplémentaires si disponibles
+    available_cols = df_lag.columns
+    feature_cols = ["cases_lag_1", "cases_lag_3", "cases_lag_7", "cases_lag_14",
+                   "deaths_lag_1", "deaths_lag_7"]
+
+    if "new_vaccinations" in available_cols:
+        df_lag = df_lag.withColumn("vaccinations_lag_7", lag("new_vaccinations", 7).over(window_spec))
+        feature_cols.append("vaccinations_lag_7")
+
+    if "stringency_index" in available_cols:
+        df_lag = df_lag.withColumn("stringency_lag_1", lag("stringency_index", 1).over(window_spec))
+        feature_cols.append("stringency_lag_1")
+
+    # Ajouter features saisonnières si configurées
+    if "seasonal_sin" in df_lag.columns:
+        feature_cols.extend(["seasonal_sin", "seasonal_cos"])
+
+    # Remplacer les valeurs nulles restantes dans les features de décalage par 0
+    for col_name in feature_cols:
+        if col_name in df_lag.columns:
+            df_lag = df_lag.fillna({col_name: 0})
+
+    # Ne supprimer les lignes que si toutes les features sont nulles
+    df_lag = df_lag.dropna(subset=feature_cols, how='all')
+
+    return df_lag, feature_cols
+
+def _build_regressor(model_type: str, params: Optional[Dict] = None):
+    """Instancie le régresseur Spark ML du type de modèle (hyperparamètres par défaut complétés par `params`)."""
+    params = resolve_params(model_type, params)
+    if model_type == 'linear':
+        return LinearRegression(
+            featuresCol="features",
+            labelCol="new_cases",
+            maxIter=100,
+            regParam=params['regParam']  # Régularisation pour éviter l'overfitting
+        )
+    if model_type == 'random_forest':
+        return RandomForestRegressor(
+            featuresCol="features",
+            labelCol="new_cases",
+            numTrees=params['numTrees'],
+            maxDepth=params['maxDepth'],
+            minInstancesPerNode=params['minInstancesPerNode'],
+            seed=42  # Pour la reproductibilité
+        )
+    return GBTRegressor(
+        featuresCol="features",
+        labelCol="new_cases",
+        maxIter=params['maxIter'],
+        maxDepth=params['maxDepth'],
+        stepSize=params['stepSize'],
+        seed=42
+    )
+
+def _safe_float(value: float) -> Optional[float]:
+    """Convertit une métrique en float JSON-compatible (NaN/inf -> None)."""
+    try:
+        if value is None:
+            return None
+        if isinstance(value, (int, float)) and (math.isnan(value) or math.isinf(value)):
+            return None
+        return float(value)
+    except Exception:
+        return None
+
+def _chronological_split(df, train_ratio: float = 0.8):
+    """Ajoute `row_number` et `is_train` : les premiers 80 % des jours de chaque pays."""
+    return (df
+            .withColumn("row_number", row_number().over(_country_window()))
+            .withColumn("is_train", col("row_number") <= floor(
+                count(lit(1)).over(Window.partitionBy("location")) * train_ratio)))
+
+def _fit_and_evaluate(df_lag, feature_cols: List[str], model_type: str, total: int,
+                      timer: Optional[StageTimer] = None,
+                      params: Optional[Dict] = None) -> Tuple[PipelineModel, Dict, CompiledPipeline]:
+    """Entraîne le pipeline (assembleur + scaler + régresseur) et l'évalue.
+
+    `df_lag` doit être persisté et `total` est son nombre de lignes (déjà
+    calculé) : aucun count() supplémentaire n'est lancé ici. Les étapes
+    (scaling, fit, evaluation) sont chronométrées dans `timer`. `params`
+    complète les hyperparamètres par défaut du régresseur.
+
+    Returns:
+        (PipelineModel ajusté, métadonnées : métriques et tailles des jeux,
+         pipeline compilé en NumPy pour la prévision)
+    """
+    timer = timer or StageTimer()
+    params = resolve_params(model_type, params)
+    # Assembler les features disponibles
+    assembler = VectorAssembler(
+        inputCols=feature_cols,
+        outputCol="features_raw"
+    )
+
+    df_features = assembler.transform(df_lag)
+
+    # Normalisation des features (important pour la convergence)
+    scaler = StandardScaler(inputCol="features_raw", outputCol="features",
+                          withStd=True, withMean=True)
+    scaler_model = scaler.fit(df_features)
+    history_cols = [name for name in HISTORY_COLUMNS if name in df_lag.columns]
+    df_ml = scaler_model.transform(df_features).select("location", "date", "features", *history_cols)
+
+    # Séparer entraînement/test selon la chronologie (80/20 pour plus de données d'entraînement)
+    # row_number est dense : les tailles des jeux se déduisent de `total` sans count()
+    train_size = int(total * 0.8)
+    df_indexed = _chronological_split(df_ml).persist(StorageLevel.MEMORY_AND_DISK)
+    timer.lap("scaling")
+    try:
+        train_df = df_indexed.filter(col("is_train"))
+
+        training_samples = train_size
+        test_samples = total - train_size
+        logging.info(f"Données d'entraînement: {training_samples}, Test: {test_samples}")
+
+        # Choisir, configurer et entraîner le modèle selon le type
+        reg_model = _build_regressor(model_type, params).fit(train_df)
+
+        # Le pipeline complet est reconstruit à partir des étapes déjà ajustées
+        pipeline_model = PipelineModel(stages=[assembler, scaler_model, reg_model])
+        forecaster = compile_pipeline(pipeline_model)
+        timer.lap("fit")
+
+        # Évaluation en une seule collecte : jeu de test avec prédictions, plus la
+        # fin de l'entraînement qui sert d'historique à la prévision récursive
+        rows = (reg_model.transform(df_indexed.filter(col("row_number") > train_size - MAX_LAG))
+                .select("date", "is_train", "prediction", *history_cols)
+                .collect())
+
+        # Statistiques suffisantes du jeu d'entraînement (features normalisées) :
+        # elles permettent ensuite de mettre à jour la régression sans tout relire
+        linear_stats = None
+        if model_type == 'linear':
+            train_rows = train_df.select("features", "new_cases").collect()
+            linear_stats = linear_sufficient_stats(
+                np.array([row["features"].toArray() for row in train_rows]),
+                np.array([row["new_cases"] for row in train_rows], dtype=float))
+    finally:
+        df_indexed.unpersist()
+
+    rows.sort(key=lambda row: row["date"])
+    test_rows = [row for row in rows if not row["is_train"]]
+    metrics = regression_metrics([row["new_cases"] for row in test_rows],
+                                 [row["prediction"] for row in test_rows])
+    horizon = evaluate_recursive(history_from_rows([row for row in rows if row["is_train"]]),
+                                 [row["new_cases"] for row in test_rows],
+                                 forecaster.feature_cols, forecaster.predict)
+
+    trained_at = datetime.now().isoformat(timespec="seconds")
+    metadata = {
+        "feature_cols": feature_cols,
+        "params": params,
+        "training_samples": training_samples,
+        "test_samples": test_samples,
+        "metrics": {name: metrics[name] for name in ("rmse", "mae", "r2", "mape", "bias")},
+        "horizon_metrics": horizon,
+        "rows": total,
+        "trained_at": trained_at,
+        "full_trained_at": trained_at,
+        "updates_since_full": 0,
+        "update_mode": "full",
+    }
+    if linear_stats is not None:
+        metadata["linear_stats"] = stats_to_metadata(linear_stats)
+    timer.lap("evaluation")
+    return pipeline_model, metadata, forecaster
+
+def _forecast_future(df_lag, entry: Dict, max_date: str, horizon: int) -> List[Dict]:
+    """Prévoit `horizon` jours futurs à partir des dernières lignes du pays.
+
+    Seules les dernières semaines sont collectées (filtre sur la date, sans tri
+    global) ; le pipeline compilé en NumPy est gardé dans l'entrée du registre.
+    """
+    predictor = entry.get("forecaster")
+    if predictor is None:
+        predictor = entry["forecaster"] = compile_pipeline(entry["model"])
+
+    columns = ["date"] + [name for name in HISTORY_COLUMNS if name in df_lag.columns]
+    cutoff = datetime.strptime(max_date, "%Y-%m-%d") - timedelta(days=4 * MAX_LAG)
+    rows = df_lag.filter(col("date") >= lit(cutoff.date())).select(*columns).collect()
+    if len(rows) < MAX_LAG:
+        # Trous dans la série récente (lignes filtrées au nettoyage) : top-k par date
+        rows = df_lag.orderBy(col("date").desc()).limit(MAX_LAG).select(*columns).collect()
+
+    return recursive_forecast(history_from_rows(rows), predictor.feature_cols, predictor.predict, horizon)
+
 def predict_cases(country: str, model_type: str = 'linear', horizon: int = 14,
                  data_path: str = "owid-covid-data.csv", lang: str = 'fr',
-                 cleaning_level: str = 'standard') -> Dict:
+                 cleaning_level: str = 'standard', reuse_model: bool = True,
+                 source_df=None, debug: bool = False) -> Dict:
     """Prédit les cas COVID-19 pour un pays donné avec des modèles ML.
 
     Args:
@@ -243,252 +453,114 @@ def predict_cases(country: str, model_type: str = 'linear', horizon: int = 14,
         horizon: Nombre de jours à prédire
         data_path: Chemin vers le fichier de données COVID-19
         lang: Langue pour les messages ('fr' ou 'en')
-        cleaning_level: Niveau de nettoyage ('minimal', 'standard', 'strict')
+        cleaning_level: Niveau de nettoyage (voir `cleaning.CLEANING_PROFILES`)
             - minimal: Remplace NULL par 0 uniquement
-            - standard: + suppression négatives + outliers >10x + lissage 7j
-            - strict: + outliers >5x + lissage + validation stricte
+            - standard: + suppression négatives + outliers >10x médiane + lissage 7j
+            - strict: + outliers >5x médiane + lissage + validation stricte
+            - mad: + outliers au-delà de médiane + 3,5 écarts robustes (MAD) + lissage 7j
+            - hampel: + suppression négatives + filtre de Hampel sur 7 jours
+        reuse_model: Réutiliser un modèle déjà entraîné du registre si disponible
+            pour (pays, modèle, nettoyage, version du dataset)
+        source_df: Features déjà chargées (et mises en cache) pour plusieurs pays,
+            à réutiliser au lieu de relire le feature store (prédictions multi-pays)
+        debug: Ajouter `spark_stats` (jobs et stages Spark lancés par la requête)
+            à la réponse (activé globalement par SEN_SPARK_DEBUG=1)
 
     Returns:
         Dict contenant les prédictions et métriques du modèle
     """
 
+    if PREDICTION_ENGINE == 'local':
+        from local_model import predict_cases_local
+        return predict_cases_local(country, model_type, horizon, data_path=data_path,
+                                   cleaning_level=cleaning_level, reuse_model=reuse_model)
+
     # Créer une session Spark
     spark = get_spark(f"SENPrediction_{country}")
 
-    # Si Spark n'est pas disponible, utiliser le fallback
+    # Si Spark n'est pas disponible, utiliser le moteur local puis, en dernier recours, le fallback
     if spark is None:
-        logging.warning(f"[Fallback] Spark unavailable, generating mock predictions for {country}")
-        return _generate_fallback_prediction(country, model_type, horizon, cleaning_level)
+        from local_model import predict_cases_local
+        try:
+            logging.warning(f"[Fallback] Spark unavailable, using local engine for {country}")
+            return predict_cases_local(country, model_type, horizon, data_path=data_path,
+                                       cleaning_level=cleaning_level, reuse_model=reuse_model)
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.warning(f"[Fallback] Local engine failed ({e}), generating mock predictions for {country}")
+            return _generate_fallback_prediction(country, model_type, horizon, cleaning_level)
 
+    debug = debug or SPARK_DEBUG
+    timer = StageTimer()
+    job_group = begin_job_group(spark, f"predict:{country}:{model_type}")
+    df_lag = None
     try:
-        # Charger les données COVID-19
-        try:
-            df = spark.read.csv(data_path, header=True, inferSchema=True)
-        except Exception:
-            logging.warning(f"Main data file {data_path} not found, using sample data")
-            df = spark.read.csv("owid-covid-data-sample.csv", header=True, inferSchema=True)
-        
-        # Vérifier si le pays existe
-        available_countries = [row["location"] for row in df.select("location").distinct().collect()]
-        if country not in available_countries:
-            raise ValueError(f"Pays '{country}' non trouvé. Pays disponibles: {sorted(available_countries)[:10]}...")
-        
-        # Filtrer le pays
-        df_country = df.filter(col("location") == country)
+        # Vérifier si le pays existe (index des pays, sans job Spark)
+        country_index = get_country_index(spark, data_path)
+        if country not in country_index:
+            raise ValueError(f"Pays '{country}' non trouvé. Pays disponibles: {sorted(country_index)[:10]}...")
         
         # Valider les données du pays
-        if not validate_country_data(df_country, country):
+        if not validate_country_data(None, country, row_count=country_index[country]["rows"]):
             raise ValueError(f"Données insuffisantes pour le pays '{country}'")
-            
-        # Créer des features spécifiques au pays
-        df_country = create_country_specific_features(df_country, country)
-
-        # =================================================================
-        # NETTOYAGE DES DONNÉES - Niveaux configurables
-        # =================================================================
-        window_spec = Window.orderBy("date")
-
-        # NIVEAU MINIMAL : Toujours appliqué (remplacer NULL par 0)
-        df_clean = df_country.fillna({
-            'new_cases': 0,
-            'new_deaths': 0,
-            'new_vaccinations': 0,
-            'stringency_index': 0,
-            'total_cases': 0,
-            'total_deaths': 0
-        })
-
-        # NIVEAU STANDARD et STRICT : Nettoyage avancé
-        if cleaning_level in ['standard', 'strict']:
-            # Supprimer les valeurs négatives (erreurs de saisie)
-            df_clean = df_clean.filter(
-                (col('new_cases') >= 0) &
-                (col('new_deaths') >= 0)
-            )
-
-            if 'new_vaccinations' in df_clean.columns:
-                df_clean = df_clean.filter(col('new_vaccinations') >= 0)
-
-            # Filtrer les valeurs aberrantes extrêmes
-            try:
-                median_cases = df_clean.approxQuantile("new_cases", [0.5], 0.01)[0]
-                if median_cases > 0:
-                    # Standard: >10x médiane, Strict: >5x médiane
-                    multiplier = 5 if cleaning_level == 'strict' else 10
-                    df_clean = df_clean.filter(col('new_cases') <= median_cases * multiplier)
-                    logging.info(f"Median new_cases={median_cases:.2f}, max_limit={median_cases * multiplier:.2f}")
-            except Exception as e:
-                logging.warning(f"Median computation error: {e}")
-
-            # Lissage sur 7 jours
-            window_7 = Window.orderBy("date").rowsBetween(-3, 3)
-            df_clean = df_clean.withColumn(
-                "cases_7d_avg",
-                spark_mean("new_cases").over(window_7)
-            )
-
-            # Standard: >5x moyenne, Strict: >3x moyenne
-            threshold = 3 if cleaning_level == 'strict' else 5
-            df_clean = df_clean.withColumn(
-                "new_cases_cleaned",
-                when(
-                    (col("new_cases") > threshold * col("cases_7d_avg")) & (col("cases_7d_avg") > 0),
-                    col("cases_7d_avg")
-                ).otherwise(col("new_cases"))
-            )
-
-            df_clean = df_clean.withColumn("new_cases", col("new_cases_cleaned")).drop("new_cases_cleaned", "cases_7d_avg")
+        timer.lap("load")
 
         # =================================================================
-        # CRÉATION DES FEATURES
+        # NETTOYAGE + FEATURES : lignes pré-calculées pour tous les pays
+        # (feature store, une passe par version du dataset et niveau de nettoyage)
         # =================================================================
+        if source_df is None:
+            df_lag, feature_cols = load_features(spark, data_path, cleaning_level, countries=[country])
+        else:
+            df_lag = source_df.filter(col("location") == country)
+            feature_cols = ensure_features(spark, data_path, cleaning_level)["feature_cols"]
+        feature_cols = country_feature_columns(feature_cols, country)
 
-        # Variables de décalage multiples pour capturer les tendances
-        df_lag = (
-            df_clean
-            .withColumn("cases_lag_1", lag("new_cases", 1).over(window_spec))
-            .withColumn("cases_lag_3", lag("new_cases", 3).over(window_spec))
-            .withColumn("cases_lag_7", lag("new_cases", 7).over(window_spec))
-            .withColumn("cases_lag_14", lag("new_cases", 14).over(window_spec))
-            .withColumn("deaths_lag_1", lag("new_deaths", 1).over(window_spec))
-            .withColumn("deaths_lag_7", lag("new_deaths", 7).over(window_spec))
-        )
-        
-        # Ajouter features supplémentaires si disponibles
-        available_cols = df_lag.columns
-        feature_cols = ["cases_lag_1", "cases_lag_3", "cases_lag_7", "cases_lag_14", 
-                       "deaths_lag_1", "deaths_lag_7"]
-        
-        if "new_vaccinations" in available_cols:
-            df_lag = df_lag.withColumn("vaccinations_lag_7", lag("new_vaccinations", 7).over(window_spec))
-            feature_cols.append("vaccinations_lag_7")
-            
-        if "stringency_index" in available_cols:
-            df_lag = df_lag.withColumn("stringency_lag_1", lag("stringency_index", 1).over(window_spec))
-            feature_cols.append("stringency_lag_1")
-        
-        # Ajouter features saisonnières si configurées
-        if "seasonal_sin" in df_lag.columns:
-            feature_cols.extend(["seasonal_sin", "seasonal_cos"])
-            
-        # Remplacer les valeurs nulles restantes dans les features de décalage par 0
-        for col_name in feature_cols:
-            if col_name in df_lag.columns:
-                df_lag = df_lag.fillna({col_name: 0})
-        
-        # Ne supprimer les lignes que si toutes les features sont nulles
-        df_lag = df_lag.dropna(subset=feature_cols, how='all')
+        # Le frame du pays est persisté pour le count, l'entraînement et les prédictions futures
+        df_lag = df_lag.persist(StorageLevel.MEMORY_AND_DISK)
         
         # Vérifier que nous avons encore des données après le preprocessing
         count = df_lag.count()
         min_rows = 30 if cleaning_level == 'strict' else 20
         if count < min_rows:
             raise ValueError(f"Insufficient data after preprocessing for {country} (rows={count})")
+        timer.lap("features")
 
-        # Assembler les features disponibles
-        assembler = VectorAssembler(
-            inputCols=feature_cols,
-            outputCol="features_raw"
-        )
-        
-        df_features = assembler.transform(df_lag)
-        
-        # Normalisation des features (important pour la convergence)
-        scaler = StandardScaler(inputCol="features_raw", outputCol="features", 
-                              withStd=True, withMean=True)
-        scaler_model = scaler.fit(df_features)
-        df_ml = scaler_model.transform(df_features).select("date", "new_cases", "features")
-
-        # Séparer entraînement/test selon la chronologie (80/20 pour plus de données d'entraînement)
-        total = df_ml.count()
-        train_size = int(total * 0.8)
-        df_indexed = df_ml.withColumn("row_number", row_number().over(window_spec))
-        train_df = df_indexed.filter(col("row_number") <= train_size)
-        test_df = df_indexed.filter(col("row_number") > train_size)
-        
-        logging.info(f"Données d'entraînement: {train_df.count()}, Test: {test_df.count()}")
-
-        # Choisir et configurer le modèle selon le type
-        if model_type == 'linear':
-            reg = LinearRegression(
-                featuresCol="features", 
-                labelCol="new_cases",
-                maxIter=100,
-                regParam=0.01  # Régularisation pour éviter l'overfitting
-            )
-        elif model_type == 'random_forest':
-            reg = RandomForestRegressor(
-                featuresCol="features", 
-                labelCol="new_cases", 
-                numTrees=100,
-                maxDepth=10,
-                seed=42  # Pour la reproductibilité
-            )
-        elif model_type == 'gradient_boost':
-            reg = GBTRegressor(
-                featuresCol="features",
-                labelCol="new_cases",
-                maxIter=100,
-                maxDepth=6,
-                seed=42
-            )
-        else:
-            raise ValueError(f"Model type '{model_type}' not supported. Use 'linear', 'random_forest', or 'gradient_boost'.")
-
-        # Entraîner le modèle
-        model = reg.fit(train_df)
-        
-        # Évaluation du modèle sur les données de test
-        test_predictions = model.transform(test_df)
-        evaluator = RegressionEvaluator(
-            labelCol="new_cases", 
-            predictionCol="prediction", 
-            metricName="rmse"
-        )
-        rmse = evaluator.evaluate(test_predictions)
-        
-        # Calculer d'autres métriques
-        evaluator_mae = RegressionEvaluator(
-            labelCol="new_cases", 
-            predictionCol="prediction", 
-            metricName="mae"
-        )
-        mae = evaluator_mae.evaluate(test_predictions)
-        
-        evaluator_r2 = RegressionEvaluator(
-            labelCol="new_cases", 
-            predictionCol="prediction", 
-            metricName="r2"
-        )
-        r2 = evaluator_r2.evaluate(test_predictions)
-        
-        # Faire des prédictions futures (extrapolation)
-        # Utiliser les dernières données pour prédire les prochains jours
-        latest_data = df_indexed.orderBy(col("date").desc()).limit(horizon)
-        future_predictions = model.transform(latest_data)
-        
-        # Convertir les prédictions en format Python
-        pred_list = []
-        for row in future_predictions.select("date", "prediction").collect():
-            pred_list.append({
-                "date": row["date"].strftime("%Y-%m-%d") if isinstance(row["date"], datetime) else str(row["date"]),
-                "prediction": max(0, float(row["prediction"]))  # S'assurer que les prédictions sont positives
-            })
+        # =================================================================
+        # ENTRAÎNEMENT (ou réutilisation depuis le registre)
+        # =================================================================
+        registry = get_model_registry()
+        # Hyperparamètres réglés pour ce pays (tuning.py), sinon valeurs par défaut
+        params = tuned_params(country, model_type, cleaning_level)
+        # Empreinte propre au pays : un refresh qui ne touche pas ce pays garde le modèle
+        key = make_model_key(country, model_type, cleaning_level, source_id(data_path),
+                             country_fingerprint(ensure_dataset(spark, data_path), country), params_hash(params))
+        with registry.lock_for(key):
+            entry = registry.get(key) if reuse_model else None
+            model_reused = entry is not None
+            model_updated = False
+            timer.lap("registry")
+            if entry is None and reuse_model:
+                # Nouvelles lignes pour ce pays : mise à jour du dernier modèle si la politique le permet
+                entry = try_incremental_update(registry, key, df_lag, feature_cols, model_type, count, params)
+                model_updated = entry is not None
+                timer.lap("update")
+            if entry is None:
+                pipeline_model, metadata, forecaster = _fit_and_evaluate(df_lag, feature_cols, model_type,
+                                                                         count, timer, params)
+                entry = registry.put(key, pipeline_model, metadata, forecaster)
+            elif model_reused:
+                logging.info(f"[Registry] Reusing trained {model_type} model for {country}")
+        metadata = entry["metadata"]
+
+        # Prévision récursive à partir de la dernière observation (sur le driver, en NumPy)
+        pred_list = _forecast_future(df_lag, entry, country_index[country]["max_date"], horizon)
+        timer.lap("forecast")
         
         # Informations sur la qualité du modèle
-        # Sanitize metric values (replace NaN/inf with None or fallback)
-        def safe_float(value: float) -> Optional[float]:
-            try:
-                if value is None:
-                    return None
-                if isinstance(value, (int, float)) and (math.isnan(value) or math.isinf(value)):
-                    return None
-                return float(value)
-            except Exception:
-                return None
-
         # Compute a normalized/clipped R² for UI display (0.0–1.0)
-        raw_r2 = safe_float(r2)
+        raw_r2 = _safe_float(metadata["metrics"]["r2"])
         r2_normalized = None
         try:
             if raw_r2 is not None:
@@ -502,19 +574,41 @@ def predict_cases(country: str, model_type: str = 'linear', horizon: int = 14,
             "model_type": model_type,
             "horizon_days": horizon,
             "cleaning_level": cleaning_level,
-            "training_samples": train_df.count(),
-            "test_samples": test_df.count(),
-            "features_used": feature_cols,
+            "training_samples": metadata["training_samples"],
+            "test_samples": metadata["test_samples"],
+            "features_used": metadata["feature_cols"],
+            "hyperparameters": metadata.get("params", params),
+            "cleaning_stats": get_cleaning_stats(spark, data_path, cleaning_level, country),
             "metrics": {
-                "rmse": safe_float(rmse),
-                "mae": safe_float(mae),
+                "rmse": metadata["metrics"]["rmse"],
+                "mae": metadata["metrics"]["mae"],
                 # Keep raw R² for diagnostics but also provide a normalized field for UI
                 "r2_score": raw_r2,
-                "r2_score_normalized": r2_normalized
+                "r2_score_normalized": r2_normalized,
+                "mape": metadata["metrics"].get("mape"),
+                "bias": metadata["metrics"].get("bias")
             },
+            "horizon_metrics": metadata.get("horizon_metrics"),
             "country_config": COUNTRY_CONFIGS.get(country, "Default"),
+            "model_reused": model_reused,
+            "model_updated": model_updated,
+            "updates_since_full": metadata.get("updates_since_full", 0),
+            "engine": "spark",
             "predictions": pred_list
         }
+
+        model_info["timings"] = timer.report("spark", model_type)
+        training = "reused" if model_reused else ("incremental" if model_updated else "full")
+        PREDICTIONS.inc(engine="spark", model=model_type, training=training)
+
+        # Jobs et stages Spark de la requête : toujours exportés, renvoyés en mode debug
+        spark_stats = spark_job_stats(spark, job_group)
+        SPARK_JOBS.inc(spark_stats["jobs"], model=model_type)
+        SPARK_STAGES.inc(spark_stats["stages"], model=model_type)
+        if debug:
+            model_info["spark_stats"] = spark_stats
+            logging.info(f"[Spark] {country}/{model_type}: {spark_stats['jobs']} jobs, "
+                         f"{spark_stats['stages']} stages")
         
         return model_info
         
@@ -523,57 +617,172 @@ def predict_cases(country: str, model_type: str = 'linear', horizon: int = 14,
         raise
     finally:
         # Do not stop the singleton Spark session; keep it alive for reuse.
-        pass
+        if df_lag is not None:
+            df_lag.unpersist()
+        end_job_group(spark, job_group)
 
 def get_configured_countries() -> List[str]:
     """Retourne la liste des pays configurés pour les prédictions optimisées."""
     return list(COUNTRY_CONFIGS.keys())
 
+def _load_shared_frame(spark: Optional[SparkSession], data_path: str, countries: List[str],
+                       cleaning_level: str = 'standard'):
+    """Charge une seule fois les features nettoyées des pays demandés et les met en cache."""
+    if spark is None:
+        return None
+    df = load_features(spark, data_path, cleaning_level, countries=countries)[0].persist()
+    df.count()  # Matérialiser le cache avant de lancer les entraînements en parallèle
+    return df
+
+def configured_countries_summary(model_type: str, horizon: int, max_workers: Optional[int] = None) -> Dict:
+    """En-tête `summary` des prédictions de tous les pays configurés."""
+    return {
+        'total_countries': len(COUNTRY_CONFIGS),
+        'african_countries': len([c for c in COUNTRY_CONFIGS.values() if c['continent'] == 'Africa']),
+        'other_countries': len([c for c in COUNTRY_CONFIGS.values() if c['continent'] != 'Africa']),
+        'model_used': model_type,
+        'horizon_days': horizon,
+        'max_workers': max(1, max_workers or PREDICT_ALL_WORKERS)
+    }
+
+def iter_configured_countries(model_type: str = 'linear', horizon: int = 14,
+                              data_path: str = "owid-covid-data-sample.csv",
+                              max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[Dict], Optional[str]]]:
+    """Prédictions des pays configurés, produites dès que chaque modèle est prêt.
+
+    Chaque pays utilise son modèle recommandé (à défaut `model_type`) ; le
+    dataset est chargé une seule fois (voir `iter_predictions`).
+
+    Yields:
+        (pays, résultat ou None, message d'erreur ou None), dans l'ordre de fin des entraînements
+    """
+    specs = [{
+        'country': country,
+        # Utiliser le modèle recommandé pour ce pays si aucun modèle spécifié
+        'model': config.get('recommended_model', model_type),
+        'horizon': horizon,
+        'cleaning_level': 'standard'
+    } for country, config in COUNTRY_CONFIGS.items()]
+    for _, spec, result, error in iter_predictions(specs, data_path, max_workers):
+        yield spec['country'], result, error
+
 def predict_all_configured_countries(model_type: str = 'linear', horizon: int = 14, 
-                                   data_path: str = "owid-covid-data-sample.csv") -> Dict:
+                                   data_path: str = "owid-covid-data-sample.csv",
+                                   max_workers: Optional[int] = None) -> Dict:
     """Génère des prédictions pour tous les pays configurés.
     
+    Le dataset est chargé une seule fois, puis les pays sont entraînés en
+    parallèle (jobs Spark concurrents sur la session partagée, un pool FAIR
+    par pays).
+
     Args:
         model_type: Type de modèle ('linear', 'random_forest', 'gradient_boost')
         horizon: Nombre de jours à prédire
         data_path: Chemin vers le fichier de données COVID-19
+        max_workers: Nombre maximal de pays entraînés simultanément
+            (défaut: SEN_PREDICT_ALL_WORKERS, 1 = séquentiel)
         
     Returns:
         Dict contenant les prédictions pour tous les pays configurés
     """
-    results = {
+    predictions = {}
+    failed = {}
+    for country, result, error in iter_configured_countries(model_type, horizon, data_path, max_workers):
+        if error is None:
+            predictions[country] = result
+        else:
+            failed[country] = {'country': country, 'error': error}
+
+    # Les résultats sont rendus dans l'ordre de COUNTRY_CONFIGS
+    return {
+        'summary': configured_countries_summary(model_type, horizon, max_workers),
+        'predictions_by_country': {country: predictions[country] for country in COUNTRY_CONFIGS if country in predictions},
+        'failed_countries': [failed[country] for country in COUNTRY_CONFIGS if country in failed]
+    }
+
+def iter_predictions(specs: List[Dict], data_path: str = "owid-covid-data-sample.csv",
+                     max_workers: Optional[int] = None, lang: str = 'fr') -> Iterator[Tuple[int, Dict, Optional[Dict], Optional[str]]]:
+    """Prédit une liste de (pays, modèle, horizon, nettoyage) en partageant le chargement des données.
+
+    Les features de chaque niveau de nettoyage sont chargées une seule fois pour
+    tous les pays concernés, puis les modèles sont entraînés (ou repris du
+    registre) en parallèle. Chaque résultat est produit dès qu'il est prêt.
+
+    Args:
+        specs: Dicts avec les clés country, model, horizon et cleaning_level
+        data_path: Chemin vers le fichier de données COVID-19
+        max_workers: Nombre maximal de prédictions simultanées (défaut: SEN_PREDICT_ALL_WORKERS)
+        lang: Langue des messages
+
+    Yields:
+        (indice de la spec, spec, résultat ou None, message d'erreur ou None)
+    """
+    workers = max(1, max_workers or PREDICT_ALL_WORKERS)
+    spark = None if PREDICTION_ENGINE == 'local' else get_spark("SENPredictionBatch")
+    shared: Dict[str, object] = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict_batch")
+    try:
+        for level in dict.fromkeys(spec['cleaning_level'] for spec in specs):
+            countries = sorted({spec['country'] for spec in specs if spec['cleaning_level'] == level})
+            try:
+                shared[level] = _load_shared_frame(spark, data_path, countries, level)
+            except Exception as e:
+                # Chaque spec retentera son propre chargement
+                logging.warning(f"Shared dataset load failed ({level}), falling back to per-country loads: {e}")
+                shared[level] = None
+
+        def _predict(spec: Dict) -> Dict:
+            return run_in_scheduler_pool(
+                spark, f"country_{spec['country']}", predict_cases,
+                country=spec['country'],
+                model_type=spec['model'],
+                horizon=spec['horizon'],
+                data_path=data_path,
+                lang=lang,
+                cleaning_level=spec['cleaning_level'],
+                source_df=shared[spec['cleaning_level']]
+            )
+
+        futures = {executor.submit(_predict, spec): index for index, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, specs[index], future.result(), None
+            except Exception as e:
+                logging.error(f"Échec de prédiction pour {specs[index]['country']}: {str(e)}")
+                yield index, specs[index], None, str(e)
+    finally:
+        # Itération abandonnée (client déconnecté) : les prédictions non commencées sont annulées
+        executor.shutdown(wait=True, cancel_futures=True)
+        for df in shared.values():
+            if df is not None:
+                df.unpersist()
+
+def predict_batch(specs: List[Dict], data_path: str = "owid-covid-data-sample.csv",
+                  max_workers: Optional[int] = None, lang: str = 'fr') -> Dict:
+    """Prédictions groupées : un élément par spec, dans l'ordre de la requête.
+
+    Un échec (pays inconnu, données insuffisantes...) n'interrompt pas le lot :
+    il est signalé sur son élément et repris dans `failed`.
+    """
+    items: List[Optional[Dict]] = [None] * len(specs)
+    failed = []
+    for index, spec, result, error in iter_predictions(specs, data_path, max_workers, lang):
+        item = {'index': index, **spec}
+        if error is None:
+            item.update(status='ok', result=result)
+        else:
+            item.update(status='error', error=error)
+            failed.append({'index': index, 'country': spec['country'], 'model': spec['model'], 'error': error})
+        items[index] = item
+
+    return {
         'summary': {
-            'total_countries': len(COUNTRY_CONFIGS),
-            'african_countries': len([c for c in COUNTRY_CONFIGS.values() if c['continent'] == 'Africa']),
-            'other_countries': len([c for c in COUNTRY_CONFIGS.values() if c['continent'] != 'Africa']),
-            'model_used': model_type,
-            'horizon_days': horizon
+            'requested': len(specs),
+            'succeeded': len(specs) - len(failed),
+            'failed': len(failed),
+            'max_workers': max(1, max_workers or PREDICT_ALL_WORKERS)
         },
-        'predictions_by_country': {},
-        'failed_countries': []
+        'items': items,
+        'failed': failed
     }
-    
-    for country in COUNTRY_CONFIGS.keys():
-        try:
-            logging.info(f"Génération des prédictions pour {country}...")
-            
-            # Utiliser le modèle recommandé pour ce pays si aucun modèle spécifié
-            recommended_model = COUNTRY_CONFIGS[country].get('recommended_model', model_type)
-            
-            prediction = predict_cases(
-                country=country,
-                model_type=recommended_model,
-                horizon=horizon,
-                data_path=data_path
-            )
-            
-            results['predictions_by_country'][country] = prediction
-            
-        except Exception as e:
-            logging.error(f"Échec de prédiction pour {country}: {str(e)}")
-            results['failed_countries'].append({
-                'country': country,
-                'error': str(e)
-            })
-    
-    return results
@@ -0,0 +1,143 @@
+"""
+Profils de session Spark adaptés au budget mémoire et CPU de la machine.
+
+Le profil est choisi par `SEN_SPARK_PROFILE` (tiny, standard, multi-core,
+large ou auto, défaut). En mode auto, il est déduit des limites du conteneur
+(cgroup v2 ou v1, sinon mémoire physique et CPU disponibles), que l'on peut
+aussi imposer avec `SEN_SPARK_MEMORY_MB` et `SEN_SPARK_CORES`.
+
+Spark (mode local) exige un tas d'au moins 450 Mo pour le driver ; la mémoire
+de l'exécuteur n'est pas fixée puisqu'en local il partage la JVM du driver.
+Le tas n'est jamais porté au-delà de la part du budget détecté : sous ce
+minimum, Spark risque de ne pas démarrer et le moteur local prend le relais.
+AQE et Kryo sont activés partout (coût CPU seulement).
+"""
+
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+PROFILES = ("tiny", "standard", "multi-core", "large")
+
+# Tas minimal accepté par le UnifiedMemoryManager de Spark (1,5 x 300 Mo réservés)
+MIN_DRIVER_MEMORY_MB = 512
+
+_CGROUP_UNLIMITED = 1 << 60
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def detect_memory_mb() -> int:
+    """Limite mémoire du conteneur (cgroup), sinon mémoire physique."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        if value and value != "max" and value.isdigit() and int(value) < _CGROUP_UNLIMITED:
+            return int(value) // 2 ** 20
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2 ** 20
+    except (ValueError, OSError, AttributeError):
+        return 1024
+
+
+def detect_cores() -> int:
+    """Quota CPU du conteneur (cgroup), sinon CPU utilisables par le processus."""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    quota = None
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        limit, _, period = cpu_max.partition(" ")
+        if limit != "max" and period:
+            quota = int(limit) / int(period)
+    else:
+        limit, period = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+    if quota is not None:
+        available = min(available, max(1, int(quota)))
+    return max(1, available)
+
+
+def select_profile(memory_mb: int, cores: int) -> str:
+    if memory_mb < 1536:
+        return "tiny"
+    if cores >= 4 and memory_mb >= 12288:
+        return "large"
+    if cores >= 4 and memory_mb >= 4096:
+        return "multi-core"
+    return "standard"
+
+
+def profile_config(profile: str, memory_mb: int, cores: int) -> Dict[str, str]:
+    """Configuration Spark du profil pour `memory_mb` Mo et `cores` CPU."""
+    if profile not in PROFILES:
+        raise ValueError(f"Profil Spark inconnu '{profile}' (attendu: {', '.join(PROFILES)})")
+
+    # Part du budget donnée au tas du driver : le reste couvre Python et la mémoire hors tas de la JVM
+    share = {"tiny": 0.6, "standard": 0.5, "multi-core": 0.55, "large": 0.65}[profile]
+    cap = {"tiny": 768, "standard": 4096, "multi-core": 8192, "large": None}[profile]
+    driver_mb = int(memory_mb * share)
+    if driver_mb < MIN_DRIVER_MEMORY_MB:
+        if memory_mb >= MIN_DRIVER_MEMORY_MB * 1.5:
+            # Le minimum de Spark tient encore dans le budget, avec de la marge pour Python
+            driver_mb = MIN_DRIVER_MEMORY_MB
+        else:
+            logging.warning(f"[Spark] Budget de {memory_mb} Mo insuffisant pour le tas minimal de Spark "
+                            f"({MIN_DRIVER_MEMORY_MB}m) : tas limité à {driver_mb}m, "
+                            f"préférer SEN_PREDICTION_ENGINE=local")
+    if cap is not None:
+        driver_mb = min(driver_mb, cap)
+    cores = max(1, cores)
+    config = {
+        "spark.driver.memory": f"{driver_mb}m",
+        "spark.sql.adaptive.enabled": "true",
+        "spark.sql.adaptive.coalescePartitions.enabled": "true",
+        "spark.serializer": "org.apache.spark.serializer.KryoSerializer",
+        "spark.memory.fraction": "0.6",
+        "spark.memory.storageFraction": "0.5",
+    }
+    if profile == "tiny":
+        config.update({
+            "spark.sql.shuffle.partitions": "4",
+            "spark.default.parallelism": str(min(cores, 2)),
+            "spark.driver.maxResultSize": "100m",
+            "spark.sql.autoBroadcastJoinThreshold": str(10 * 2 ** 20),
+            "spark.ui.enabled": "false",
+        })
+    else:
+        partitions = {"standard": 2 * cores, "multi-core": 2 * cores, "large": 4 * cores}[profile]
+        config.update({
+            "spark.sql.shuffle.partitions": str(max(4, partitions)),
+            "spark.default.parallelism": str(cores),
+            "spark.driver.maxResultSize": f"{max(256, driver_mb // 4)}m",
+            "spark.sql.autoBroadcastJoinThreshold": str((64 if profile == "large" else 10) * 2 ** 20),
+        })
+    return config
+
+
+def resolve_spark_profile() -> Tuple[str, str, Dict[str, str], Dict[str, int]]:
+    """Retourne (profil, master, configuration, ressources détectées) selon l'environnement."""
+    memory_mb = int(os.environ.get("SEN_SPARK_MEMORY_MB") or detect_memory_mb())
+    cores = int(os.environ.get("SEN_SPARK_CORES") or detect_cores())
+    profile = os.environ.get("SEN_SPARK_PROFILE", "auto").lower()
+    if profile == "auto":
+        profile = select_profile(memory_mb, cores)
+
+    config = profile_config(profile, memory_mb, cores)
+    driver_memory = os.environ.get("SPARK_DRIVER_MEMORY")
+    if driver_memory:
+        config["spark.driver.memory"] = driver_memory
+        if driver_memory.lower().endswith("m") and int(driver_memory[:-1]) < MIN_DRIVER_MEMORY_MB:
+            logging.warning(f"[Spark] SPARK_DRIVER_MEMORY={driver_memory} est sous le minimum de Spark "
+                            f"({MIN_DRIVER_MEMORY_MB}m) : la session risque de ne pas démarrer")
+
+    master = os.environ.get("SEN_SPARK_MASTER") or f"local[{cores}]"
+    return profile, master, config, {"memory_mb": memory_mb, "cores": cores}
@@ -0,0 +1,12 @@
+"""Configuration commune des tests : modules du backend importables, caches isolés."""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Les chemins par défaut des caches sont lus à l'import des modules
+os.environ.setdefault("SEN_CACHE_DIR", tempfile.mkdtemp(prefix="sen-tests-"))
@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+import backtesting
+import tuning
+from backtesting import load_results, make_origins, results_path
+from tuning import DEFAULT_PARAMS
+
+
+def test_make_origins_leaves_one_horizon_after_the_last_origin():
+    assert make_origins(100, 3, 10, min_train=30) == [70, 80, 90]
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(backtesting, "BACKTESTS_DIR", str(tmp_path / "backtests"))
+    monkeypatch.setattr(tuning, "TUNING_DIR", str(tmp_path / "tuning"))
+    monkeypatch.setattr(tuning, "USE_TUNED_PARAMS", True)
+    data_path = tmp_path / "owid.csv"
+    data_path.write_text("location,date,new_cases\n", encoding="utf-8")
+    path = results_path("Senegal", "standard", str(data_path))
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": {"model_types": ["linear"],
+                              "hyperparameters": {"linear": DEFAULT_PARAMS["linear"]}}}, f)
+    return str(data_path)
+
+
+def test_load_results_returns_a_backtest_run_with_the_served_params(stored):
+    assert load_results("Senegal", "standard", stored)["params"]["model_types"] == ["linear"]
+
+
+def test_load_results_is_stale_once_tuning_changes(stored):
+    os.makedirs(tuning.TUNING_DIR)
+    with open(tuning.tuning_path("Senegal"), "w", encoding="utf-8") as f:
+        json.dump({"models": {"linear": {"params": {"regParam": 1.0}}}}, f)
+
+    assert load_results("Senegal", "standard", stored) is None
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import CLEANING_LEVELS, MAD_SCALE, clean_frame, stats_from_columns
+
+
+def _frame(cases, deaths=None):
+    cases = np.asarray(cases, dtype=float)
+    return pd.DataFrame({
+        "date": pd.date_range("2021-01-01", periods=len(cases)),
+        "new_cases": cases,
+        "new_deaths": np.zeros(len(cases)) if deaths is None else deaths,
+        "new_vaccinations": np.nan,
+    })
+
+
+def _noisy_series():
+    """21 jours autour de 10 cas, avec une valeur négative, un pic modéré (40) et un pic fort (200)."""
+    cases = np.tile([9.0, 10.0, 11.0], 7)
+    cases[3], cases[10], cases[17] = -5.0, 40.0, 200.0
+    deaths = np.zeros(len(cases))
+    deaths[5] = np.nan
+    return _frame(cases, deaths)
+
+
+def test_minimal_only_fills_missing_values():
+    cleaned, stats = clean_frame(_noisy_series(), "minimal")
+
+    assert len(cleaned) == 21
+    assert cleaned["new_deaths"].notna().all() and (cleaned["new_vaccinations"] == 0).all()
+    assert cleaned["new_cases"].min() == -5.0
+    assert stats == {"rows": 21, "negatives": 0, "outliers": 0, "replaced": 0, "median": 10.0, "mad": None}
+
+
+@pytest.mark.parametrize("level", ["standard", "strict"])
+def test_median_levels_drop_negatives_and_far_outliers(level):
+    cleaned, stats = clean_frame(_noisy_series(), level)
+
+    # 200 dépasse 5x et 10x la médiane (10) ; 40 reste sous les deux seuils
+    assert stats == {"rows": 21, "negatives": 1, "outliers": 1, "replaced": 0, "median": 10.0, "mad": None}
+    assert sorted(cleaned["new_cases"])[-1] == 40.0
+    assert len(cleaned) == 19
+
+
+def test_rolling_mean_replaces_isolated_spikes():
+    cases = np.zeros(15)
+    cases[7] = 30.0
+
+    cleaned, stats = clean_frame(_frame(cases), "standard")
+
+    # Médiane nulle : pas de seuil d'aberration, le pic est ramené à la moyenne mobile sur 7 jours
+    assert stats["outliers"] == 0 and stats["replaced"] == 1
+    assert cleaned["new_cases"][7] == pytest.approx(30.0 / 7)
+
+
+def test_mad_level_uses_robust_spread():
+    cleaned, stats = clean_frame(_noisy_series(), "mad")
+
+    assert stats["median"] == 10.0 and stats["mad"] == 1.0
+    # Seuil : 10 + 3,5 x 1,4826 x 1 ~ 15,2 -> 40 et 200 sont écartés
+    assert stats["outliers"] == 2
+    assert cleaned["new_cases"].max() <= 10.0 + 3.5 * MAD_SCALE
+
+
+def test_mad_level_keeps_everything_when_spread_is_zero():
+    cases = np.full(10, 4.0)
+    cases[2] = 400.0
+
+    cleaned, stats = clean_frame(_frame(cases), "mad")
+
+    assert stats["mad"] == 0.0 and stats["outliers"] == 0
+    assert len(cleaned) == 10
+
+
+def test_hampel_replaces_spikes_by_rolling_median():
+    cleaned, stats = clean_frame(_noisy_series(), "hampel")
+
+    assert stats["negatives"] == 1 and stats["outliers"] == 0
+    assert stats["replaced"] == 2
+    assert len(cleaned) == 20
+    assert set(cleaned["new_cases"]) <= {9.0, 10.0, 10.5, 11.0}
+
+
+def test_hampel_ignores_flat_windows():
+    cases = np.full(10, 5.0)
+    cleaned, stats = clean_frame(_frame(cases), "hampel")
+
+    assert stats["replaced"] == 0
+    assert (cleaned["new_cases"] == 5.0).all()
+
+
+def test_all_levels_handle_an_empty_series():
+    for level in CLEANING_LEVELS:
+        cleaned, stats = clean_frame(_frame([-1.0, -2.0]), level)
+        assert stats["rows"] == 2
+        if level != "minimal":
+            assert cleaned.empty and stats["median"] is None
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        clean_frame(_frame([1.0]), "aggressive")
+
+
+def test_stats_from_columns():
+    row = {"clean_rows": 21, "clean_negatives": 1, "clean_outliers": 2, "clean_replaced": 0,
+           "clean_median": 10, "clean_mad": None}
+
+    assert stats_from_columns(row) == {"rows": 21, "negatives": 1, "outliers": 2, "replaced": 0,
+                                       "median": 10.0, "mad": None}
+    assert stats_from_columns({"clean_rows": None}) is None
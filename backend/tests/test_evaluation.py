@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from evaluation import evaluate_recursive, horizon_metrics, regression_metrics
+
+
+def test_regression_metrics_values():
+    metrics = regression_metrics([10.0, 0.0, 20.0, 30.0], [12.0, 1.0, 18.0, 33.0])
+
+    assert metrics["n"] == 4
+    assert metrics["rmse"] == pytest.approx(np.sqrt((4 + 1 + 4 + 9) / 4))
+    assert metrics["mae"] == pytest.approx(2.0)
+    assert metrics["bias"] == pytest.approx(1.0)
+    assert metrics["r2"] == pytest.approx(1 - 18 / 500)
+    # Le jour à 0 cas est exclu du MAPE
+    assert metrics["mape"] == pytest.approx(100 * (0.2 + 0.1 + 0.1) / 3)
+
+
+def test_regression_metrics_edge_cases():
+    assert regression_metrics([], []) == {"rmse": None, "mae": None, "r2": None, "mape": None,
+                                          "bias": None, "n": 0}
+
+    constant = regression_metrics([0.0, 0.0], [1.0, -1.0])
+    assert constant["r2"] is None
+    assert constant["mape"] is None
+    assert constant["bias"] == 0.0
+
+    overflow = regression_metrics([0.0], [np.inf])
+    assert overflow["rmse"] is None and overflow["mae"] is None
+
+
+def test_horizon_metrics_buckets():
+    y_true = np.arange(1.0, 31.0)
+    y_pred = y_true + np.repeat([1.0, 2.0, 3.0], [7, 7, 16])
+
+    breakdown = horizon_metrics(y_true, y_pred)
+
+    assert list(breakdown) == ["1-7", "8-14", "15-30"]
+    assert [breakdown[b]["n"] for b in breakdown] == [7, 7, 16]
+    assert [breakdown[b]["mae"] for b in breakdown] == [1.0, 2.0, 3.0]
+    assert all("r2" not in metrics for metrics in breakdown.values())
+
+
+def test_horizon_metrics_skips_buckets_beyond_the_series():
+    breakdown = horizon_metrics(np.ones(10), np.zeros(10))
+
+    assert list(breakdown) == ["1-7", "8-14"]
+    assert breakdown["8-14"]["n"] == 3
+
+
+def test_evaluate_recursive_compares_forecast_with_actuals():
+    history = {"date": "2021-01-31", "new_cases": np.full(14, 5.0)}
+
+    breakdown = evaluate_recursive(history, [5.0] * 10, ["cases_lag_1"], lambda X: X[:, 0] + 1, max_horizon=8)
+
+    # Prévisions 6, 7, ..., 13 contre 5 : erreur = numéro du jour
+    assert breakdown["1-7"]["mae"] == pytest.approx(4.0)
+    assert breakdown["8-14"]["n"] == 1
+    assert evaluate_recursive(history, [], ["cases_lag_1"], lambda X: X[:, 0]) == {}
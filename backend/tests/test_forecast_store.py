@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+
+import pytest
+
+import response_cache
+import tuning
+from forecast_store import MAX_HORIZON, ForecastStore
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / "owid.csv"
+    path.write_text("location,date,new_cases\nSenegal,2021-01-01,10\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ForecastStore(str(tmp_path / "db" / "forecasts.sqlite"))
+
+
+def _result(horizon=MAX_HORIZON):
+    return {
+        "country": "Senegal",
+        "model_type": "linear",
+        "horizon_days": horizon,
+        "predictions": [{"date": f"day-{i}", "prediction": float(i)} for i in range(1, horizon + 1)],
+        "timings": {"total": 1.0},
+    }
+
+
+def test_get_truncates_the_stored_horizon(store, data_path):
+    assert store.put("Senegal", "linear", "standard", data_path, _result())
+
+    result = store.get("Senegal", "linear", 7, "standard", data_path)
+
+    assert result["horizon_days"] == 7
+    assert [p["prediction"] for p in result["predictions"]] == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    assert "timings" not in result and "precomputed_at" in result
+    assert store.get("Senegal", "linear", 7, "strict", data_path) is None
+    assert store.get("Senegal", "linear", MAX_HORIZON + 1, "standard", data_path) is None
+
+
+def test_shorter_stored_horizon_is_a_miss(store, data_path):
+    store.put("Senegal", "linear", "standard", data_path, _result(horizon=14))
+
+    assert store.get("Senegal", "linear", 14, "standard", data_path)["horizon_days"] == 14
+    assert store.get("Senegal", "linear", 21, "standard", data_path) is None
+    assert not store.is_fresh("Senegal", "linear", "standard", data_path)
+    assert store.stats()["misses"] == 1
+
+
+def test_new_data_makes_stored_forecasts_stale(store, data_path):
+    store.put("Senegal", "linear", "standard", data_path, _result())
+    assert store.is_fresh("Senegal", "linear", "standard", data_path)
+
+    with open(data_path, "a", encoding="utf-8") as f:
+        f.write("Senegal,2021-01-02,12\n")
+
+    assert not store.is_fresh("Senegal", "linear", "standard", data_path)
+    assert store.get("Senegal", "linear", 7, "standard", data_path) is None
+    assert store.stats()["stale"] == 1
+
+
+def test_new_cleaning_version_makes_stored_forecasts_stale(store, data_path, monkeypatch):
+    store.put("Senegal", "linear", "standard", data_path, _result())
+
+    monkeypatch.setattr(response_cache, "CLEANING_VERSION", response_cache.CLEANING_VERSION + 1)
+
+    assert not store.is_fresh("Senegal", "linear", "standard", data_path)
+    assert store.get("Senegal", "linear", 7, "standard", data_path) is None
+
+
+def test_new_tuning_makes_stored_forecasts_stale(store, data_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(tuning, "TUNING_DIR", str(tmp_path / "tuning"))
+    monkeypatch.setattr(tuning, "USE_TUNED_PARAMS", True)
+    store.put("Senegal", "linear", "standard", data_path, _result())
+    store.put("Senegal", "random_forest", "standard", data_path, dict(_result(), model_type="random_forest"))
+
+    (tmp_path / "tuning").mkdir()
+    with open(tuning.tuning_path("Senegal"), "w", encoding="utf-8") as f:
+        json.dump({"models": {"linear": {"params": {"regParam": 1.0}}}}, f)
+
+    assert not store.is_fresh("Senegal", "linear", "standard", data_path)
+    assert store.get("Senegal", "linear", 7, "standard", data_path) is None
+    assert store.is_fresh("Senegal", "random_forest", "standard", data_path)
+
+
+def test_put_overwrites_and_persists_across_instances(store, data_path):
+    store.put("Senegal", "linear", "standard", data_path, dict(_result(), model_type="old"))
+    store.put("Senegal", "linear", "standard", data_path, _result())
+
+    reopened = ForecastStore(store.path)
+
+    assert reopened.get("Senegal", "linear", 1, "standard", data_path)["model_type"] == "linear"
+    assert reopened.stats()["entries"] == 1
+
+
+def test_missing_data_file_is_never_served(store, tmp_path):
+    missing = str(tmp_path / "missing.csv")
+
+    assert not store.put("Senegal", "linear", "standard", missing, _result())
+    assert store.get("Senegal", "linear", 7, "standard", missing) is None
+    assert not store.is_fresh("Senegal", "linear", "standard", missing)
+
+
+def test_each_thread_uses_its_own_connection(store, data_path):
+    store.put("Senegal", "linear", "standard", data_path, _result())
+    results = []
+
+    thread = threading.Thread(target=lambda: results.append(store.get("Senegal", "linear", 3, "standard", data_path)))
+    thread.start()
+    thread.join()
+
+    assert results[0]["horizon_days"] == 3
+    assert store.stats()["hits"] == 1
+
+
+def test_runs_are_recorded_per_source(store, data_path):
+    assert store.last_run(data_path) is None
+
+    store.record_run(data_path, {"finished_at": "2021-01-02T03:00:00", "computed": 3})
+
+    run = store.last_run(os.path.relpath(data_path))
+    assert run["computed"] == 3
+    assert len(run["source_fingerprint"]) == 16
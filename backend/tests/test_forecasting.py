@@ -0,0 +1,113 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from forecasting import (MAX_LAG, CompiledPipeline, TreeEnsemble, history_from_rows, parse_tree_ensemble,
+                         recursive_forecast)
+
+# Format de `toDebugString` d'un RandomForestRegressionModel Spark ML
+DEBUG_STRING = """RandomForestRegressionModel: uid=rfr_1234, numTrees=2, numFeatures=2
+  Tree 0 (weight 1.0):
+    If (feature 0 <= 1.5)
+     Predict: 10.0
+    Else (feature 0 > 1.5)
+     If (feature 1 <= -0.25)
+      Predict: 20.0
+     Else (feature 1 > -0.25)
+      Predict: 30.0
+  Tree 1 (weight 1.0):
+    Predict: 5.0
+"""
+
+
+def test_parse_tree_ensemble_reads_splits_and_leaves():
+    first, second = parse_tree_ensemble(DEBUG_STRING)
+
+    assert first["feature"] == [0, -1, 1, -1, -1]
+    assert first["threshold"] == [1.5, 0.0, -0.25, 0.0, 0.0]
+    assert first["left"] == [1, -1, 3, -1, -1]
+    assert first["right"] == [2, -1, 4, -1, -1]
+    assert first["value"] == [0.0, 10.0, 0.0, 20.0, 30.0]
+    assert first["depth"] == 2
+    assert second == {"feature": [-1], "threshold": [0.0], "left": [-1], "right": [-1],
+                      "value": [5.0], "depth": 0}
+
+
+def test_parsed_ensemble_follows_spark_split_convention():
+    ensemble = TreeEnsemble(parse_tree_ensemble(DEBUG_STRING), [0.5, 0.5])
+    X = np.array([[1.5, 0.0], [2.0, -0.25], [2.0, 1.0]])
+
+    # Valeur égale au seuil -> fils gauche
+    np.testing.assert_allclose(ensemble.predict(X), [7.5, 12.5, 17.5])
+
+
+def test_parse_tree_ensemble_rejects_unknown_input():
+    with pytest.raises(ValueError):
+        parse_tree_ensemble("LinearRegressionModel: uid=lr_1, numFeatures=2")
+    with pytest.raises(ValueError):
+        parse_tree_ensemble("Tree 0 (weight 1.0):\n If (feature 0 in {1.0,2.0})\n Predict: 1.0")
+
+
+def test_compiled_pipeline_round_trips_through_arrays():
+    ensemble = TreeEnsemble(parse_tree_ensemble(DEBUG_STRING), [1.0, 0.1])
+    pipeline = CompiledPipeline(["a", "b"], mean=[1.0, 0.0], std=[0.5, 0.0], ensemble=ensemble)
+    restored = CompiledPipeline.from_arrays(pipeline.to_arrays())
+    X = np.array([[0.0, 3.0], [2.0, -1.0], [5.0, 9.0]])
+
+    assert restored.feature_cols == ["a", "b"]
+    np.testing.assert_allclose(restored.predict(X), pipeline.predict(X))
+    # Écart-type nul : la feature standardisée vaut 0 (feature 1 <= -0.25 jamais vrai)
+    np.testing.assert_allclose(pipeline.predict(X), [10.5, 30.5, 30.5])
+
+
+def test_linear_pipeline_round_trips_through_arrays():
+    pipeline = CompiledPipeline(["a", "b"], mean=[0.0, 0.0], std=[1.0, 2.0], coefficients=[1.0, 2.0],
+                                intercept=3.0)
+    restored = CompiledPipeline.from_arrays(pipeline.to_arrays())
+
+    np.testing.assert_allclose(restored.predict([[1.0, 4.0]]), [8.0])
+
+
+def test_history_from_rows_keeps_the_last_lags_in_order():
+    rows = [{"date": date(2021, 1, day), "new_cases": day, "new_deaths": None} for day in range(20, 0, -1)]
+
+    history = history_from_rows(rows)
+
+    assert history["date"] == date(2021, 1, 20)
+    assert history["new_cases"].tolist() == list(range(20 - MAX_LAG + 1, 21))
+    assert history["new_deaths"].tolist() == [0.0] * MAX_LAG
+    assert "stringency_index" not in history
+
+
+def test_recursive_forecast_feeds_predictions_back_as_lags():
+    history = {"date": "2021-01-31", "new_cases": np.arange(1.0, 15.0), "new_deaths": np.full(14, 2.0)}
+    feature_cols = ["cases_lag_1", "cases_lag_7", "deaths_lag_1"]
+
+    predictions = recursive_forecast(history, feature_cols, lambda X: X[:, 0] + X[:, 2], horizon=3)
+
+    assert [p["date"] for p in predictions] == ["2021-02-01", "2021-02-02", "2021-02-03"]
+    # J+1 = 14 + 2, puis chaque prédiction devient le lag 1 du jour suivant (décès prolongés)
+    assert [p["prediction"] for p in predictions] == [16.0, 18.0, 20.0]
+
+
+def test_recursive_forecast_uses_lags_in_feature_order():
+    history = {"date": date(2021, 6, 30), "new_cases": np.arange(1.0, 15.0)}
+    seen = []
+
+    def predict(X):
+        seen.append(X[0].tolist())
+        return np.zeros(1)
+
+    recursive_forecast(history, ["cases_lag_14", "cases_lag_1", "stringency_lag_1"], predict, horizon=2)
+
+    # Séries absentes -> 0 ; au 2e pas le lag 14 a avancé d'un jour et le lag 1 est la prédiction
+    assert seen == [[1.0, 14.0, 0.0], [2.0, 0.0, 0.0]]
+
+
+def test_recursive_forecast_clips_negative_predictions():
+    history = {"date": "2021-01-31", "new_cases": np.ones(14)}
+
+    predictions = recursive_forecast(history, ["seasonal_sin", "seasonal_cos"], lambda X: -np.ones(1), horizon=2)
+
+    assert [p["prediction"] for p in predictions] == [0.0, 0.0]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+def _wait(job, timeout=5.0):
+    with job.changed:
+        assert job.changed.wait_for(lambda: job.done, timeout=timeout)
+    return job
+
+
+def test_job_runs_and_records_result():
+    manager = JobManager(max_workers=1, queue_size=4)
+    job, deduplicated = manager.submit("predict", {"country": "Senegal"}, lambda: {"ok": True})
+
+    assert not deduplicated
+    assert _wait(job).status == "succeeded"
+    assert job.result == {"ok": True}
+    assert job.to_dict()["result"] == {"ok": True}
+
+
+def test_failed_job_keeps_the_error():
+    manager = JobManager(max_workers=1, queue_size=4)
+
+    def boom():
+        raise ValueError("Pays inconnu")
+
+    job, _ = manager.submit("predict", {"country": "Atlantis"}, boom)
+
+    assert _wait(job).status == "failed"
+    assert job.error == "Pays inconnu"
+
+
+def test_identical_in_flight_jobs_are_deduplicated():
+    manager = JobManager(max_workers=1, queue_size=4)
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {"n": len(calls)}
+
+    first, _ = manager.submit("predict", {"country": "Senegal", "horizon": 7}, slow)
+    second, deduplicated = manager.submit("predict", {"horizon": 7, "country": "Senegal"}, slow)
+    other, other_dedup = manager.submit("predict", {"country": "Kenya", "horizon": 7}, slow)
+    release.set()
+
+    assert deduplicated and second is first
+    assert not other_dedup and other is not first
+    _wait(first)
+    _wait(other)
+    assert len(calls) == 2
+    assert manager.stats()["deduplicated"] == 1
+
+
+def test_finished_job_is_not_reused():
+    manager = JobManager(max_workers=1, queue_size=4)
+    first, _ = manager.submit("predict", {"country": "Senegal"}, lambda: {"run": 1})
+    _wait(first)
+    # Le job quitte la table des jobs en cours juste après son dernier changement d'état
+    deadline = time.time() + 5
+    while first.dedup_key in manager._in_flight and time.time() < deadline:
+        time.sleep(0.001)
+
+    second, deduplicated = manager.submit("predict", {"country": "Senegal"}, lambda: {"run": 2})
+
+    assert not deduplicated
+    assert _wait(second).result == {"run": 2}
+
+
+def test_queue_limit_rejects_new_jobs():
+    manager = JobManager(max_workers=1, queue_size=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return {}
+
+    running, _ = manager.submit("predict", {"n": 0}, blocking)
+    assert started.wait(5)
+    queued, _ = manager.submit("predict", {"n": 1}, blocking)
+
+    with pytest.raises(JobQueueFull):
+        manager.submit("predict", {"n": 2}, blocking)
+    # Un doublon d'un job en attente reste accepté : il ne consomme pas de place
+    assert manager.submit("predict", {"n": 1}, blocking) == (queued, True)
+
+    release.set()
+    _wait(running)
+    _wait(queued)
+    assert manager.stats()["rejected"] == 1
+    assert manager.stats()["jobs"]["succeeded"] == 2
+
+
+def test_finished_jobs_are_pruned_after_retention():
+    manager = JobManager(max_workers=1, queue_size=4, retention=0)
+    job, _ = manager.submit("predict", {"country": "Senegal"}, lambda: {})
+    _wait(job)
+    job.finished_at -= 1
+
+    manager.submit("predict", {"country": "Kenya"}, lambda: {})
+
+    assert manager.get(job.id) is None
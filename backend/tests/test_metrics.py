@@ -0,0 +1,73 @@
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, StageTimer
+
+
+def test_counter_renders_help_type_and_labelled_samples():
+    counter = Counter("sen_test_total", "Compteur de test", ("model",))
+    counter.inc(model="linear")
+    counter.inc(2, model="linear")
+    counter.inc(model="random_forest")
+
+    assert counter.render() == [
+        "# HELP sen_test_total Compteur de test",
+        "# TYPE sen_test_total counter",
+        'sen_test_total{model="linear"} 3.0',
+        'sen_test_total{model="random_forest"} 1.0',
+    ]
+    assert counter.total() == 4.0
+
+
+def test_label_values_are_escaped():
+    gauge = Gauge("sen_test_gauge", "Jauge", ("country",))
+    gauge.set(1, country='Côte "d\'Ivoire"\\\n')
+
+    assert gauge.render()[-1] == 'sen_test_gauge{country="Côte \\"d\'Ivoire\\"\\\\\\n"} 1.0'
+
+
+def test_unlabelled_metric_and_label_mismatch():
+    gauge = Gauge("sen_test_ready", "Prêt")
+    gauge.set(1)
+
+    assert gauge.render()[-1] == "sen_test_ready 1.0"
+    with pytest.raises(ValueError):
+        gauge.set(1, status="ok")
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("sen_test_seconds", "Durées", ("stage",), buckets=(1.0, 0.1))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="fit")
+
+    assert histogram.render()[2:] == [
+        'sen_test_seconds_bucket{stage="fit",le="0.1"} 2',
+        'sen_test_seconds_bucket{stage="fit",le="1.0"} 3',
+        'sen_test_seconds_bucket{stage="fit",le="+Inf"} 4',
+        'sen_test_seconds_sum{stage="fit"} 3.65',
+        'sen_test_seconds_count{stage="fit"} 4',
+    ]
+
+
+def test_registry_runs_collectors_before_rendering():
+    registry = MetricsRegistry()
+    gauge = registry.register(Gauge("sen_test_entries", "Entrées"))
+    registry.add_collector(lambda: gauge.set(7))
+
+    def broken():
+        raise RuntimeError("JVM arrêtée")
+
+    registry.add_collector(broken)
+
+    assert registry.render() == "# HELP sen_test_entries Entrées\n# TYPE sen_test_entries gauge\nsen_test_entries 7.0\n"
+
+
+def test_stage_timer_accumulates_repeated_stages():
+    timer = StageTimer()
+    timer.lap("load")
+    timer.lap("fit")
+    timer.lap("fit")
+
+    timings = timer.report("local", "linear")
+
+    assert list(timings) == ["load", "fit", "total"]
+    assert timings["total"] >= timings["load"] + timings["fit"] - 1e-3
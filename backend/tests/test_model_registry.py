@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+
+from cleaning import CLEANING_VERSION
+from forecasting import CompiledPipeline
+from model_registry import ModelRegistry, make_model_key
+
+
+def _forecaster(intercept=0.0):
+    return CompiledPipeline(["cases_lag_1"], np.zeros(1), np.ones(1), coefficients=np.ones(1), intercept=intercept)
+
+
+def _key(country="Senegal", fingerprint="v1", params="p1"):
+    return make_model_key(country, "linear", "standard", "src", fingerprint, params)
+
+
+def test_entries_are_reloaded_from_disk(tmp_path):
+    ModelRegistry(str(tmp_path)).put(_key(), None, {"trained_at": "2021-01-01T00:00:00"}, _forecaster(2.0))
+
+    entry = ModelRegistry(str(tmp_path)).get(_key())
+
+    assert entry["model"] is None
+    assert entry["forecaster"].predict([[1.0]])[0] == 3.0
+    assert entry["metadata"]["model_key"] == list(_key())
+
+
+def test_put_prunes_older_versions_of_the_same_model(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.put(_key(fingerprint="v1"), None, {"trained_at": "2021-01-01T00:00:00"}, _forecaster())
+    registry.put(_key(country="Kenya"), None, {"trained_at": "2021-01-01T00:00:00"}, _forecaster())
+    registry.put(_key(fingerprint="v2", params="p2"), None, {"trained_at": "2021-01-02T00:00:00"}, _forecaster())
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 2
+    assert [name.split("-")[0] for name in names] == ["Kenya", "Senegal"]
+    assert ModelRegistry(str(tmp_path)).get(_key(fingerprint="v1")) is None
+    latest_key, _ = ModelRegistry(str(tmp_path)).find_latest("Senegal", "linear", "standard", "src")
+    assert latest_key == _key(fingerprint="v2", params="p2")
+
+
+def test_put_keeps_newer_entries(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.put(_key(fingerprint="v2"), None, {"trained_at": "2021-01-02T00:00:00"}, _forecaster())
+    registry.put(_key(fingerprint="v1"), None, {"trained_at": "2021-01-01T00:00:00"}, _forecaster())
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert ModelRegistry(str(tmp_path)).find_latest("Senegal", "linear", "standard", "src")[0] == _key(fingerprint="v2")
+
+
+def test_lock_for_is_stable_per_key(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+
+    assert registry.lock_for(_key()) is registry.lock_for(_key())
+
+
+def test_find_latest_skips_models_from_another_cleaning_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.put(_key(fingerprint="v1"), None, {"trained_at": "2021-01-01T00:00:00"}, _forecaster())
+    entry_dir = registry._entry_dir(_key(fingerprint="v1"))
+    metadata_path = os.path.join(entry_dir, "metadata.json")
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    # Modèle enregistré avant le versionnage du nettoyage
+    metadata.pop("cleaning_version")
+    with open(metadata_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+
+    assert ModelRegistry(str(tmp_path)).find_latest("Senegal", "linear", "standard", "src") is None
+    assert registry.get(_key(fingerprint="v1"))["metadata"]["cleaning_version"] == CLEANING_VERSION
+    assert registry.find_latest("Senegal", "linear", "standard", "src")[0] == _key(fingerprint="v1")
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from forecasting import CompiledPipeline, TreeEnsemble, constant_tree
+from local_model import LinearModel, linear_sufficient_stats
+from model_updates import UPDATE_TREES, _update_regressor, stats_to_metadata
+
+FEATURES = ["cases_lag_1", "cases_lag_7"]
+
+
+def _data(n, seed):
+    rng = np.random.default_rng(seed)
+    Z = rng.normal(size=(n, len(FEATURES)))
+    return Z, 3.0 * Z[:, 0] - Z[:, 1] + 5.0 + rng.normal(scale=0.1, size=n)
+
+
+def _forest(n_trees):
+    trees = [constant_tree(float(i)) for i in range(n_trees)]
+    ensemble = TreeEnsemble(trees, np.full(n_trees, 1.0 / n_trees))
+    return CompiledPipeline(FEATURES, np.zeros(2), np.ones(2), ensemble=ensemble)
+
+
+@pytest.mark.parametrize("n_trees", [1, 20, 100])
+def test_forest_update_keeps_size_and_most_old_trees(n_trees):
+    Z, y = _data(200, seed=0)
+    metadata = {"params": {"numTrees": n_trees, "maxDepth": 3, "minInstancesPerNode": 1}}
+
+    updated, _ = _update_regressor(_forest(n_trees), metadata, "random_forest", Z[-10:], y[-10:], Z, y)
+
+    trees = updated.ensemble.trees
+    replaced = max(1, min(UPDATE_TREES, n_trees // 2))
+    assert len(trees) == n_trees
+    assert [tree["value"] for tree in trees[:n_trees - replaced]] == [[float(i)] for i in range(replaced, n_trees)]
+    np.testing.assert_allclose(updated.ensemble.weights, 1.0 / n_trees)
+
+
+def test_tree_updates_are_deterministic():
+    Z, y = _data(200, seed=1)
+    metadata = {"params": {"numTrees": 40, "maxDepth": 3, "minInstancesPerNode": 1}, "updates_since_full": 2}
+
+    first, _ = _update_regressor(_forest(40), metadata, "random_forest", Z[-10:], y[-10:], Z, y)
+    second, _ = _update_regressor(_forest(40), metadata, "random_forest", Z[-10:], y[-10:], Z, y)
+
+    np.testing.assert_array_equal(first.predict(Z), second.predict(Z))
+
+
+def test_linear_update_matches_a_full_fit():
+    Z, y = _data(300, seed=2)
+    old_stats = linear_sufficient_stats(Z[:250], y[:250])
+    old = LinearModel(reg_param=0.01).fit_stats(old_stats)
+    forecaster = CompiledPipeline(FEATURES, np.zeros(2), np.ones(2), coefficients=old.coef_, intercept=old.intercept_)
+    metadata = {"params": {"regParam": 0.01}, "linear_stats": stats_to_metadata(old_stats)}
+
+    updated, fields = _update_regressor(forecaster, metadata, "linear", Z[250:], y[250:], Z, y)
+
+    full = LinearModel(reg_param=0.01).fit(Z, y)
+    np.testing.assert_allclose(updated.coefficients, full.coef_)
+    assert updated.intercept == pytest.approx(full.intercept_)
+    assert fields["linear_stats"]["n"] == 300
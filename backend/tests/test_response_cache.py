@@ -0,0 +1,121 @@
+import json
+import time
+
+import response_cache
+import tuning
+from response_cache import ResponseCache
+
+
+def _key(country="Senegal", fingerprint="v1", horizon=14, data_path="/data/owid.csv", version="p1-c2",
+         model_type="linear"):
+    return (country, model_type, horizon, "standard", data_path, fingerprint, version)
+
+
+def test_get_returns_a_copy():
+    cache = ResponseCache(capacity=4, ttl=0, root_dir=None)
+    cache.put(_key(), {"predictions": [1, 2]})
+
+    first = cache.get(_key())
+    first["predictions"].append(3)
+
+    assert cache.get(_key()) == {"predictions": [1, 2]}
+    assert cache.stats()["hits"] == 2
+
+
+def test_new_fingerprint_invalidates_same_country_and_file():
+    cache = ResponseCache(capacity=8, ttl=0, root_dir=None)
+    cache.put(_key(fingerprint="v1", horizon=7), {"v": 1})
+    cache.put(_key(fingerprint="v1", horizon=14), {"v": 1})
+    cache.put(_key(country="Kenya", fingerprint="v1"), {"v": 1})
+    cache.put(_key(fingerprint="v1", data_path="/data/other.csv"), {"v": 1})
+
+    cache.put(_key(fingerprint="v2", horizon=14), {"v": 2})
+
+    assert cache.get(_key(fingerprint="v1", horizon=7)) is None
+    assert cache.get(_key(fingerprint="v1", horizon=14)) is None
+    assert cache.get(_key(country="Kenya", fingerprint="v1")) == {"v": 1}
+    assert cache.get(_key(fingerprint="v1", data_path="/data/other.csv")) == {"v": 1}
+    assert cache.get(_key(fingerprint="v2", horizon=14)) == {"v": 2}
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_expired_entries_are_dropped():
+    cache = ResponseCache(capacity=4, ttl=60, root_dir=None)
+    cache.put(_key(), {"v": 1})
+    stored_at, payload = cache._entries[_key()]
+    cache._entries[_key()] = (stored_at - 120, payload)
+
+    assert cache.get(_key()) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = ResponseCache(capacity=2, ttl=0, root_dir=None)
+    cache.put(_key(horizon=1), {"h": 1})
+    cache.put(_key(horizon=2), {"h": 2})
+    cache.get(_key(horizon=1))
+    cache.put(_key(horizon=3), {"h": 3})
+
+    assert cache.get(_key(horizon=2)) is None
+    assert cache.get(_key(horizon=1)) == {"h": 1}
+    assert cache.get(_key(horizon=3)) == {"h": 3}
+
+
+def test_disk_entries_are_shared_between_instances(tmp_path):
+    writer = ResponseCache(capacity=4, ttl=0, root_dir=str(tmp_path))
+    writer.put(_key(), {"v": 1})
+
+    reader = ResponseCache(capacity=4, ttl=0, root_dir=str(tmp_path))
+    assert reader.get(_key()) == {"v": 1}
+
+
+def test_expired_disk_entries_are_removed(tmp_path):
+    writer = ResponseCache(capacity=4, ttl=0, root_dir=str(tmp_path))
+    writer.put(_key(), {"v": 1})
+    path = writer._entry_path(_key())
+
+    reader = ResponseCache(capacity=4, ttl=1e-9, root_dir=str(tmp_path))
+    time.sleep(0.01)
+    assert reader.get(_key()) is None
+    assert not (tmp_path / path.split("/")[-1]).exists()
+
+
+def test_response_key_carries_the_cleaning_version(tmp_path, monkeypatch):
+    data_path = tmp_path / "owid.csv"
+    data_path.write_text("location,date,new_cases\n", encoding="utf-8")
+
+    key = response_cache.make_response_key("Senegal", "linear", 7, "standard", str(data_path))
+    monkeypatch.setattr(response_cache, "CLEANING_VERSION", response_cache.CLEANING_VERSION + 1)
+
+    assert key[:5] == ("Senegal", "linear", 7, "standard", str(data_path))
+    assert response_cache.make_response_key("Senegal", "linear", 7, "standard", str(data_path)) != key
+    assert response_cache.make_response_key("Senegal", "linear", 7, "standard", str(tmp_path / "missing.csv")) is None
+
+
+def test_new_model_version_invalidates_only_that_model():
+    cache = ResponseCache(capacity=8, ttl=0, root_dir=None)
+    cache.put(_key(version="p1-c2", horizon=7), {"v": 1})
+    cache.put(_key(version="p1-c2", model_type="random_forest"), {"v": 1})
+
+    cache.put(_key(version="p2-c2", horizon=14), {"v": 2})
+
+    assert cache.get(_key(version="p1-c2", horizon=7)) is None
+    assert cache.get(_key(version="p1-c2", model_type="random_forest")) == {"v": 1}
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_response_key_follows_the_tuned_params(tmp_path, monkeypatch):
+    monkeypatch.setattr(tuning, "TUNING_DIR", str(tmp_path / "tuning"))
+    monkeypatch.setattr(tuning, "USE_TUNED_PARAMS", True)
+    data_path = tmp_path / "owid.csv"
+    data_path.write_text("location,date,new_cases\n", encoding="utf-8")
+
+    default_key = response_cache.make_response_key("Senegal", "linear", 7, "standard", str(data_path))
+    (tmp_path / "tuning").mkdir()
+    with open(tuning.tuning_path("Senegal"), "w", encoding="utf-8") as f:
+        json.dump({"models": {"linear": {"params": {"regParam": 1.0}}}}, f)
+    tuned_key = response_cache.make_response_key("Senegal", "linear", 7, "standard", str(data_path))
+
+    assert tuned_key[:6] == default_key[:6]
+    assert tuned_key[6] != default_key[6]
+    assert response_cache.make_response_key("Senegal", "xgboost", 7, "standard", str(data_path)) is None
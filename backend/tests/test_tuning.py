@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+import tuning
+from tuning import DEFAULT_PARAMS, SEARCH_SPACES, candidate_params, params_hash, resolve_params
+
+
+def _grid_size(model_type):
+    size = 1
+    for values in SEARCH_SPACES[model_type].values():
+        size *= len(values)
+    return size
+
+
+@pytest.mark.parametrize("model_type", sorted(DEFAULT_PARAMS))
+def test_grid_covers_the_space_with_defaults_first(model_type):
+    candidates = candidate_params(model_type, "grid")
+
+    assert candidates[0] == DEFAULT_PARAMS[model_type]
+    assert len({params_hash(params) for params in candidates}) == len(candidates)
+    # Les valeurs par défaut font partie de la grille : elles ne sont pas dupliquées
+    assert len(candidates) == _grid_size(model_type)
+
+
+def test_random_draws_are_seeded_and_bounded():
+    first = candidate_params("gradient_boost", "random", n_trials=5, seed=7)
+
+    assert first == candidate_params("gradient_boost", "random", n_trials=5, seed=7)
+    assert first != candidate_params("gradient_boost", "random", n_trials=5, seed=8)
+    assert first[0] == DEFAULT_PARAMS["gradient_boost"]
+    assert 5 <= len(first) <= 6
+    assert len(candidate_params("linear", "random", n_trials=50)) == _grid_size("linear")
+
+
+def test_halving_uses_the_full_grid_unless_trials_are_given():
+    assert candidate_params("random_forest", "halving") == candidate_params("random_forest", "grid")
+    assert len(candidate_params("random_forest", "halving", n_trials=4)) <= 5
+
+
+def test_resolve_params_fills_defaults_and_rejects_unknown_names():
+    assert resolve_params("random_forest", {"maxDepth": 5}) == {"numTrees": 100, "maxDepth": 5,
+                                                                "minInstancesPerNode": 1}
+    with pytest.raises(ValueError):
+        resolve_params("random_forest", {"learningRate": 0.1})
+    with pytest.raises(ValueError):
+        resolve_params("xgboost")
+
+
+def test_tuned_params_reads_the_search_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(tuning, "TUNING_DIR", str(tmp_path))
+    monkeypatch.setattr(tuning, "USE_TUNED_PARAMS", True)
+    with open(tuning.tuning_path("Côte d'Ivoire"), "w", encoding="utf-8") as f:
+        json.dump({"models": {"linear": {"params": {"regParam": 0.1}},
+                              "random_forest": {"params": {"numTrees": 20, "unknown": 1}}}}, f)
+
+    assert os.path.basename(tuning.tuning_path("Côte d'Ivoire")) == "Côte_d_Ivoire-standard.json"
+    assert tuning.tuned_params("Côte d'Ivoire", "linear") == {"regParam": 0.1}
+    # Fichier invalide pour ce modèle ou recherche absente : valeurs par défaut
+    assert tuning.tuned_params("Côte d'Ivoire", "random_forest") == DEFAULT_PARAMS["random_forest"]
+    assert tuning.tuned_params("Senegal", "linear") == DEFAULT_PARAMS["linear"]
+
+    monkeypatch.setattr(tuning, "USE_TUNED_PARAMS", False)
+    assert tuning.tuned_params("Côte d'Ivoire", "linear") == DEFAULT_PARAMS["linear"]
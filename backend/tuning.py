@@ -0,0 +1,356 @@
+"""
+Recherche d'hyperparamètres par pays.
+
+Les hyperparamètres des régresseurs (régularisation, nombre et profondeur des
+arbres, pas du boosting) sont évalués sur la validation à origine glissante du
+backtesting (`make_origins`, fold le plus récent d'abord) : le score d'un
+essai est la RMSE à un pas moyenne sur ses folds.
+
+- `grid` : toutes les combinaisons de `SEARCH_SPACES` ;
+- `random` : `n_trials` combinaisons tirées au hasard dans la grille ;
+- `halving` : successive halving, tous les candidats sont évalués sur le fold
+  le plus récent puis seul le meilleur 1/`eta` passe aux folds suivants.
+
+Les essais tournent en parallèle (un pool FAIR par pays sous Spark). Un essai
+de forêt ou de boosting dont la RMSE partielle dépasse `SEN_TUNING_PRUNE_RATIO`
+fois celle du meilleur essai terminé est arrêté avant ses derniers folds.
+
+Les hyperparamètres par défaut font toujours partie des essais et le gagnant
+n'est retenu que s'il fait mieux. Il est écrit dans
+`.sen_cache/tuning/<pays>-<nettoyage>.json`, que `predict_cases` relit
+automatiquement (`tuned_params`) ; le hash des hyperparamètres fait partie de
+la clé du registre des modèles.
+
+Usage :
+    python tuning.py --countries Senegal,France --models random_forest,gradient_boost --method halving
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cleaning import CLEANING_LEVELS
+from sources import CACHE_DIR, dataset_fingerprint
+
+TUNING_DIR = os.path.join(CACHE_DIR, "tuning")
+TUNING_WORKERS = int(os.environ.get("SEN_TUNING_WORKERS", "2"))
+TUNING_PRUNE_RATIO = float(os.environ.get("SEN_TUNING_PRUNE_RATIO", "1.5"))
+USE_TUNED_PARAMS = os.environ.get("SEN_USE_TUNED_PARAMS", "true").lower() in ("1", "true", "yes")
+
+METHODS = ("grid", "random", "halving")
+
+# Noms des paramètres Spark ML ; local_model les traduit pour scikit-learn
+DEFAULT_PARAMS: Dict[str, Dict] = {
+    'linear': {'regParam': 0.01},
+    'random_forest': {'numTrees': 100, 'maxDepth': 10, 'minInstancesPerNode': 1},
+    'gradient_boost': {'maxIter': 100, 'maxDepth': 6, 'stepSize': 0.1},
+}
+
+SEARCH_SPACES: Dict[str, Dict[str, List]] = {
+    'linear': {'regParam': [0.0, 0.001, 0.01, 0.1, 1.0]},
+    'random_forest': {'numTrees': [20, 50, 100], 'maxDepth': [5, 8, 10, 12], 'minInstancesPerNode': [1, 5]},
+    'gradient_boost': {'maxIter': [20, 50, 100], 'maxDepth': [3, 4, 6], 'stepSize': [0.05, 0.1, 0.2]},
+}
+
+# Modèles dont les essais peu prometteurs sont arrêtés avant la fin de leurs folds
+_PRUNABLE = ('random_forest', 'gradient_boost')
+
+_TUNED_CACHE: Dict[str, Tuple[float, Dict]] = {}
+_TUNED_LOCK = threading.Lock()
+
+
+def resolve_params(model_type: str, params: Optional[Dict] = None) -> Dict:
+    """Hyperparamètres complets : valeurs par défaut du modèle complétées par `params`."""
+    if model_type not in DEFAULT_PARAMS:
+        raise ValueError(f"Model type '{model_type}' not supported. Use 'linear', 'random_forest', or 'gradient_boost'.")
+    unknown = set(params or {}) - set(DEFAULT_PARAMS[model_type])
+    if unknown:
+        raise ValueError(f"Hyperparamètres inconnus pour {model_type}: {sorted(unknown)}")
+    return dict(DEFAULT_PARAMS[model_type], **(params or {}))
+
+
+def params_hash(params: Dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+
+
+def tuning_path(country: str, cleaning_level: str = 'standard') -> str:
+    slug = "".join(c if c.isalnum() else "_" for c in country)
+    return os.path.join(TUNING_DIR, f"{slug}-{cleaning_level}.json")
+
+
+def load_tuning(country: str, cleaning_level: str = 'standard') -> Optional[Dict]:
+    """Configuration réglée du pays (relue seulement quand le fichier change)."""
+    path = tuning_path(country, cleaning_level)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _TUNED_LOCK:
+        cached = _TUNED_CACHE.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _TUNED_LOCK:
+        _TUNED_CACHE[path] = (mtime, config)
+    return config
+
+
+def tuned_params(country: str, model_type: str, cleaning_level: str = 'standard') -> Dict:
+    """Hyperparamètres de (pays, modèle, nettoyage) : ceux de la dernière recherche, sinon par défaut."""
+    params = None
+    if USE_TUNED_PARAMS:
+        config = load_tuning(country, cleaning_level) or {}
+        params = (config.get("models", {}).get(model_type) or {}).get("params")
+    try:
+        return resolve_params(model_type, params)
+    except ValueError as e:
+        if params is None:
+            raise
+        logging.warning(f"[Tuning] Ignoring tuned params for {country}/{model_type}: {e}")
+        return resolve_params(model_type)
+
+
+def _grid(model_type: str) -> List[Dict]:
+    space = SEARCH_SPACES[model_type]
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def candidate_params(model_type: str, method: str, n_trials: Optional[int] = None, seed: int = 42) -> List[Dict]:
+    """Combinaisons à essayer, les hyperparamètres par défaut en premier.
+
+    `random` tire `n_trials` (10) combinaisons ; `halving` part de toute la
+    grille, ou de `n_trials` combinaisons tirées si précisé.
+    """
+    default = resolve_params(model_type)
+    candidates = _grid(model_type)
+    if method == 'random' or (method == 'halving' and n_trials):
+        candidates = random.Random(seed).sample(candidates, min(n_trials or 10, len(candidates)))
+    return [default] + [params for params in candidates if params != default]
+
+
+def _mean_rmse(trial: Dict) -> Optional[float]:
+    values = [fold["metrics"]["rmse"] for fold in trial["folds"].values() if fold["metrics"].get("rmse") is not None]
+    return float(np.mean(values)) if values else None
+
+
+def _search_model(executor: ThreadPoolExecutor, run_fold, model_type: str, n_folds: int,
+                  method: str, n_trials: Optional[int], eta: int, seed: int) -> Dict:
+    """Recherche pour un modèle ; `run_fold(model_type, params, fold)` évalue un fold."""
+    trials = [{"trial": i, "params": params, "folds": {}, "status": "pending"}
+              for i, params in enumerate(candidate_params(model_type, method, n_trials, seed))]
+    lock = threading.Lock()
+    best = [math.inf]
+
+    def run_trial(trial: Dict, folds: int) -> Dict:
+        """Évalue `trial` sur ses `folds` premiers folds ; l'arrête s'il est nettement moins bon."""
+        try:
+            for fold in range(folds):
+                if fold not in trial["folds"]:
+                    trial["folds"][fold] = run_fold(model_type, trial["params"], fold)
+                score = _mean_rmse(trial)
+                with lock:
+                    threshold = TUNING_PRUNE_RATIO * best[0]
+                if model_type in _PRUNABLE and fold < folds - 1 and score is not None and score > threshold:
+                    trial["status"] = "pruned"
+                    return trial
+            trial["status"] = "complete"
+            score = _mean_rmse(trial)
+            if folds == n_folds and score is not None:
+                with lock:
+                    best[0] = min(best[0], score)
+        except Exception as e:
+            logging.error(f"[Tuning] {model_type} trial {trial['trial']} failed: {e}")
+            trial.update(status="failed", error=str(e))
+        return trial
+
+    if method == 'halving':
+        rungs = sorted({min(n_folds, eta ** i) for i in range(n_folds) if eta ** i < n_folds} | {n_folds})
+        alive = trials
+        for folds in rungs:
+            list(executor.map(lambda trial: run_trial(trial, folds), alive))
+            if folds == n_folds:
+                break
+            ranked = sorted((trial for trial in alive if trial["status"] == "complete"), key=_mean_rmse)
+            keep = ranked[:max(1, math.ceil(len(ranked) / eta))]
+            # Les valeurs par défaut vont jusqu'au bout : le gagnant leur est comparé
+            if trials[0] in ranked and trials[0] not in keep:
+                keep.append(trials[0])
+            for trial in ranked:
+                if trial not in keep:
+                    trial["status"] = "halved"
+            alive = keep
+    else:
+        list(executor.map(lambda trial: run_trial(trial, n_folds), trials))
+
+    complete = [trial for trial in trials
+                if trial["status"] == "complete" and len(trial["folds"]) == n_folds and _mean_rmse(trial) is not None]
+    default = trials[0] if trials[0] in complete else None
+    winner = min(complete, key=_mean_rmse) if complete else None
+    adopted = winner is not None and (default is None or _mean_rmse(winner) < _mean_rmse(default))
+    chosen = winner if adopted else default
+
+    def fit_seconds(trial: Optional[Dict]) -> Optional[float]:
+        if trial is None:
+            return None
+        return round(float(np.mean([fold["fit_seconds"] for fold in trial["folds"].values()])), 3)
+
+    return {
+        "params": chosen["params"] if chosen is not None else resolve_params(model_type),
+        "tuned": adopted,
+        "rmse": _mean_rmse(chosen) if chosen is not None else None,
+        "default_rmse": _mean_rmse(default) if default is not None else None,
+        "fit_seconds": fit_seconds(chosen),
+        "default_fit_seconds": fit_seconds(default),
+        "status_counts": {status: sum(1 for trial in trials if trial["status"] == status)
+                          for status in ("complete", "pruned", "halved", "failed")},
+        "trials": [{
+            "trial": trial["trial"],
+            "params": trial["params"],
+            "status": trial["status"],
+            "folds": len(trial["folds"]),
+            "mean_rmse": _mean_rmse(trial),
+            "fit_seconds": round(sum(fold["fit_seconds"] for fold in trial["folds"].values()), 3),
+            **({"error": trial["error"]} if "error" in trial else {}),
+        } for trial in trials],
+    }
+
+
+def _write_tuning(path: str, results: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def tune_country(country: str, model_types: Tuple[str, ...] = ('linear', 'random_forest', 'gradient_boost'),
+                 data_path: str = "owid-covid-data.csv", cleaning_level: str = 'standard',
+                 method: str = 'random', n_trials: Optional[int] = None, n_origins: int = 3,
+                 horizon: int = 14, eta: int = 3, seed: int = 42,
+                 max_workers: Optional[int] = None, write: bool = True) -> Dict:
+    """Recherche d'hyperparamètres d'un pays ; écrit et retourne la configuration retenue.
+
+    Args:
+        country: Nom du pays
+        model_types: Modèles à régler
+        method: 'grid', 'random' ou 'halving'
+        n_trials: Combinaisons tirées (random : 10 par défaut ; halving : toute la grille)
+        n_origins: Folds de validation (origines glissantes, expanding)
+        horizon: Jours évalués après chaque origine (1-30)
+        eta: Facteur de réduction du successive halving
+        max_workers: Essais évalués en parallèle (défaut: SEN_TUNING_WORKERS)
+        write: Écrire la configuration lue par `predict_cases`
+
+    Returns:
+        Dict avec, par modèle, les hyperparamètres retenus, leur score face aux
+        valeurs par défaut et le détail des essais
+    """
+    from backtesting import MODEL_TYPES, _country_features, _run_fold, make_origins
+    from forecasting import MAX_LAG
+    from spark_model import get_spark, run_in_scheduler_pool
+
+    if method not in METHODS:
+        raise ValueError(f"Méthode inconnue: {method}. Utiliser {METHODS}")
+    unknown = [m for m in model_types if m not in MODEL_TYPES]
+    if unknown:
+        raise ValueError(f"Modèles non supportés: {unknown}")
+    if not (1 <= horizon <= 30) or n_origins < 1 or eta < 2:
+        raise ValueError("horizon doit être entre 1 et 30, n_origins >= 1 et eta >= 2")
+
+    started = time.time()
+    sdf, pdf, feature_cols = _country_features(country, data_path, cleaning_level)
+    spark = get_spark() if sdf is not None else None
+    try:
+        # Le fold le plus récent d'abord : c'est lui qui sert au halving et à l'élagage
+        origins = make_origins(len(pdf), n_origins, horizon, min_train=max(2 * MAX_LAG, 60))[::-1]
+
+        def run_fold(model_type: str, params: Dict, fold: int) -> Dict:
+            return run_in_scheduler_pool(spark, f"tune_{country}", _run_fold, sdf, pdf, feature_cols,
+                                         model_type, fold, origins[fold], horizon, None, params)
+
+        workers = max(1, max_workers or TUNING_WORKERS)
+        models = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tuning") as executor:
+            for model_type in model_types:
+                model_started = time.time()
+                models[model_type] = _search_model(executor, run_fold, model_type, len(origins),
+                                                   method, n_trials, eta, seed)
+                models[model_type]["elapsed_seconds"] = round(time.time() - model_started, 2)
+                logging.info(f"[Tuning] {country}/{model_type}: {models[model_type]['params']} "
+                             f"(RMSE {models[model_type]['rmse']} vs {models[model_type]['default_rmse']})")
+    finally:
+        if sdf is not None:
+            sdf.unpersist()
+
+    results = {
+        "country": country,
+        "cleaning_level": cleaning_level,
+        "dataset_fingerprint": dataset_fingerprint(data_path),
+        "search": {
+            "method": method,
+            "n_trials": n_trials,
+            "n_origins": len(origins),
+            "horizon": horizon,
+            "eta": eta,
+            "seed": seed,
+        },
+        "models": models,
+        "elapsed_seconds": round(time.time() - started, 2),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    if write:
+        # Les modèles non réglés par cette recherche gardent leur configuration précédente
+        previous = load_tuning(country, cleaning_level) or {}
+        saved = dict(results, models=dict(previous.get("models", {}), **models))
+        _write_tuning(tuning_path(country, cleaning_level), saved)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres par pays")
+    parser.add_argument("--countries", help="Pays séparés par des virgules (défaut: pays configurés)")
+    parser.add_argument("--models", default="linear,random_forest,gradient_boost", help="Modèles à régler")
+    parser.add_argument("--data", default="owid-covid-data.csv", help="Chemin du CSV OWID")
+    parser.add_argument("--cleaning-level", default="standard", choices=CLEANING_LEVELS)
+    parser.add_argument("--method", default="random", choices=METHODS)
+    parser.add_argument("--trials", type=int, help="Combinaisons tirées (random, halving)")
+    parser.add_argument("--origins", type=int, default=3, help="Folds de validation")
+    parser.add_argument("--horizon", type=int, default=14, help="Jours évalués par origine")
+    parser.add_argument("--eta", type=int, default=3, help="Facteur de réduction du halving")
+    parser.add_argument("--workers", type=int, help="Essais en parallèle")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dry-run", action="store_true", help="Ne pas écrire la configuration")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from spark_model import get_configured_countries
+
+    countries = args.countries.split(",") if args.countries else get_configured_countries()
+    print(f"{'Pays':<16} {'Modèle':<16} {'RMSE défaut':>12} {'RMSE réglé':>12} {'fit (s)':>9}  Hyperparamètres")
+    for name in countries:
+        res = tune_country(name, tuple(args.models.split(",")), args.data, args.cleaning_level, args.method,
+                           args.trials, args.origins, args.horizon, args.eta, args.seed, args.workers,
+                           write=not args.dry_run)
+        for model, entry in res["models"].items():
+            print(f"{name:<16} {model:<16} {entry['default_rmse'] or float('nan'):>12.2f} "
+                  f"{entry['rmse'] or float('nan'):>12.2f} {entry['fit_seconds'] or float('nan'):>9.2f}  "
+                  f"{entry['params'] if entry['tuned'] else 'défaut'}")
@@ -0,0 +1,11 @@
+"""
+Point d'entrée WSGI : gunicorn -c gunicorn.conf.py wsgi:app
+
+Chaque worker importe ce module après le fork : l'application est construite
+ici (warmup de Spark en arrière-plan) et non à l'import de `app`, que les
+scripts et le hook `on_starting` de gunicorn importent sans effet de bord.
+"""
+
+from app import create_app
+
+app = create_app()